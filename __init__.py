@@ -405,6 +405,29 @@ class trix(object):
 		return cls.process(cls.innerpath(innerPath), *a, **k)
 	
 	
+	# P-MAP
+	@classmethod
+	def pmap(cls, path, iterable, workers=None, chunksize=None, **k):
+		"""
+		Map the function at module.function `path` over `iterable` in
+		`workers` processes (default: one per cpu), sending `chunksize`
+		items at a time. Returns a `util.pmap.PMap` object; iterate it for
+		results (in order, unless kwarg `ordered` is False).
+		
+		Pass kwarg `reduce` (and, optionally, `initial`) to have results
+		reduced to a single value, which is returned instead.
+		
+		>>> list(trix.pmap("math.factorial", range(1000), 4))
+		>>> trix.pmap("math.sqrt", range(1000), reduce=operator.add)
+		"""
+		reduce = k.pop('reduce', None)
+		initial = [k.pop('initial')] if 'initial' in k else []
+		pm = cls.ncreate(
+				'util.pmap.PMap', path, iterable, workers, chunksize, **k
+			)
+		return pm.reduce(reduce, *initial) if reduce else pm
+	
+	
 	# ---- process/thread creation -----
 	
 	# PID
@@ -790,6 +813,7 @@ nvalue     = trix.nvalue
 path       = trix.path
 npath      = trix.npath
 pid        = trix.pid
+pmap       = trix.pmap
 popen      = trix.popen
 process    = trix.process
 proxify    = trix.proxify
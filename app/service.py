@@ -9,9 +9,26 @@ from ..util.event import *
 from ..util.runner import *
 from ..util.wrap import *
 from ..util.xqueue import *
+from ..util.frameq import FrameQueue
+from ..net.handler import Handler
+from concurrent import futures
+import functools, itertools
 
 
 SERVICES_NCONFIG = "app/config/service/en.service.conf"
+SERVICE_WORKERS = 1 # default number of worker threads per service
+
+#
+# NETWORK MODE
+#  - Requests and replies are framed by util.frameq. The pickle and
+#    marshal codecs pass any python objects, but decoding them lets a
+#    peer run code, so they must be enabled with config `trust`.
+#
+SERVICES_CODEC = 'json'
+SERVICES_HOST = '127.0.0.1' # listen on this host only, by default
+SERVICES_UNSAFE = ('pickle', 'marshal')
+SERVICES_CONNECTIONS = 2  # RemoteServices connection pool size
+SERVICES_MAXIDLE = 3600   # seconds before an idle client is dropped
 
 
 #
@@ -22,11 +39,20 @@ class Services(Runner):
 	Container for various services.
 	
 	Services warp a single object and make use of it to perform 
-	actions and return results.
+	actions and return results. Each service's config dict may set 
+	"workers" - the number of threads handling its requests (default:
+	SERVICE_WORKERS).
+	
+	Given a "port" (in config or kwargs), Services also listens for
+	`RemoteServices` clients, so that several processes may share one
+	set of service objects. It listens on SERVICES_HOST unless given
+	a "host". Optional "codec" and "maxidle" values apply to these
+	connections; The "pickle" codec also requires "trust" to be True.
 	
 	# start services...
 	from trix.app.service import *
 	s = Services()
+	s = Services(port=9999)           # ...available to other processes
 	"""
 	
 	# INIT
@@ -36,8 +62,13 @@ class Services(Runner):
 		if not config:
 			raise Exception ("Services: Config required.")
 		
+		# requests are handled by each service's workers; don't poll
+		k.setdefault('evented', True)
 		Runner.__init__(self, config, **k)
 		
+		# check the network codec before any services start
+		codec = servicecodec(self.config)
+		
 		self.__services = {}
 		
 		serviceConfDict = config['services']
@@ -54,16 +85,19 @@ class Services(Runner):
 				n_create = sconfig['ncreate']
 				n_config = sconfig.get('nconfig')
 				realconf = [trix.nconfig(n_config)]
-			elif "ncreate" in sconfig:
+			elif "create" in sconfig:
 				o_create = sconfig['create']
 				o_config = sconfig.get('config')
-				realconf = [trix.config(o_config)]
+				realconf = [trix.config(o_config)] if o_config else []
 			else:
 				realconf = [serviceConfDict]
 			
 			# Create the object.
 			try:
-				sobject = trix.ncreate(n_create, *realconf)
+				if o_create:
+					sobject = trix.create(o_create, *realconf)
+				else:
+					sobject = trix.ncreate(n_create, *realconf)
 			except Exception as ex:
 				raise type(ex)(xdata(
 					n_create=n_create, n_config=n_config, o_create=o_create,
@@ -71,7 +105,27 @@ class Services(Runner):
 				))
 			
 			# create, store, and start the service object
-			self.__services[sid] = Service(sid, sobject)
+			self.__services[sid] = Service(
+					sid, sobject, sconfig.get('workers', SERVICE_WORKERS)
+				)
+		
+		#
+		# NETWORK MODE
+		#  - With a port, a selector-mode Server passes each request from
+		#    a RemoteServices client to the service it names.
+		#
+		self.__server = None
+		if self.config.get('port') is not None:
+			self.__server = trix.ncreate('net.server.Server', dict(
+					host=self.config.get('host', SERVICES_HOST),
+					port=self.config['port']
+				), selector=True, 
+					nhandler='app.service.ServiceHandler', handlerk=dict(
+						services=self, wbuffer=False, 
+						codec=codec,
+						maxidle=self.config.get('maxidle', SERVICES_MAXIDLE)
+					)
+				).starts()
 		
 		#
 		# Start running the Services io loop (in a thread!)
@@ -84,12 +138,43 @@ class Services(Runner):
 	def services(self):
 		return self.__services.keys()
 	
-	
-	# SERVICES - IO
-	def io(self):
-		# give each service a chance to handle messages
-		for s in self.__services:
-			self.__services[s].handle_io()
+	# SERVICES - PORT
+	@property
+	def port(self):
+		"""The port RemoteServices clients connect to; None if none."""
+		return self.__server.port if self.__server else None
+	
+	
+	# SERVICES - STOP
+	def stop(self):
+		"""Stop listening and each service's workers, then stop running."""
+		if self.__server:
+			self.__server.shutdown()
+		for sid in self.__services:
+			self.__services[sid].shutdown()
+		Runner.stop(self)
+	
+	
+	# SERVICES - STATUS
+	def status(self):
+		"""Return a status dict."""
+		r = Runner.status(self)
+		r['services'] = {
+			sid : self.__services[sid].status() for sid in self.__services
+		}
+		if self.__server:
+			r['port'] = self.port
+			r['clients'] = len(self.__server.handlers)
+		return r
+	
+	
+	# SERVICES - SUBMIT
+	def submit(self, serviceid, e):
+		"""
+		Queue Event `e` for the `serviceid` service; Returns a Future 
+		that resolves to `e` once its reply (or error) is set.
+		"""
+		return self.__service(serviceid).submit(e)
 	
 	
 	# SERVICES - CONNECT
@@ -98,38 +183,21 @@ class Services(Runner):
 		Pass `serviceid` string. Returns a new ServiceConnect object that 
 		gives access to the service's features.
 		
-		Pass an event object to ServiceConnect using the `request` method
-		and poll `replies` to receive events in the same order as they
-		were given. Check `Event.reply` (or Event.error) for the result.
+		Call the ServiceConnect to wait for a reply, or use its `request`
+		method to get a Future instead. Either way, check `Event.reply` 
+		(or Event.error) for the result.
 		"""
-		#
-		# all you have to do is add a queue pair to the id'd service
-		# and send the same queue pair to the connection object, then,
-		# of course, call the services's `handle_io` method
-		# frequently.
-		#
+		# create and return a ServiceConnect object
+		return ServiceConnect(self.__service(serviceid))
+	
+	
+	def __service(self, serviceid):
 		if not serviceid in self.__services:
 			raise KeyError("No such service.", xdata(
 					error="err-connect-fail", message="no-such-service",
 					serviceid=serviceid
 				))
-			
-		# Get the service we're connecting to...
-		s = self.__services[serviceid]
-		
-		#
-		# The ServiceConnect gets REAL Queues, so when they go away 
-		# (eg, when the ServiceConnect object is deleted) the server 
-		# will know it (because of a Reference Error) and will remove
-		# the pair form its list.
-		#
-		realQPair = p = [Queue(), Queue()]
-		
-		# add the queue proxy pair to the requested Service object
-		s.addqueues([trix.proxify(p[0]), trix.proxify(p[1])])
-		
-		# create and return a ServiceConnect object
-		return ServiceConnect(s.serviceid, realQPair)
+		return self.__services[serviceid]
 	
 	
 
@@ -159,16 +227,25 @@ class Service(ServiceIO):
 	background and are always accessed to a ServiceConnect object that
 	is obtained by calling the `Services.connect()` method.
 	
+	Requests wait in a queue for the next free worker thread. With 
+	more than one worker, the wrapped object's methods must be safe to
+	call from several threads at once.
+	
 	See the ServiceConnect help for usage notes/examples.
 	"""
-	def __init__(self, serviceid, sobject):
+	def __init__(self, serviceid, sobject, workers=SERVICE_WORKERS):
 		ServiceIO.__init__(self)
 		
 		self.__starttime = time.time()
 		self.__serviceid = serviceid
 		self.__object = sobject
 		self.__wrapper = Wrap(sobject)
-		self.__qpairs = []
+		self.__queue = Queue()
+		self.__workers = int(workers)
+		self.__handled = 0
+		self.__hlock = thread.allocate_lock() # workers count `handled`
+		for i in range(self.__workers):
+			trix.start(self.__work)
 	
 	
 	@property
@@ -189,38 +266,62 @@ class Service(ServiceIO):
 		"""Time in seconds (float) since this services' creation."""
 		return time.time() - self.__starttime
 	
+	@property
+	def workers(self):
+		"""Number of worker threads handling requests."""
+		return self.__workers
 	
-	# SERVICE - ADD QUEUES
-	def addqueues(self, qproxypair):
-		"""To be called by the owning Services object."""
-		self.__qpairs.append(qproxypair)
 	
+	# SERVICE - STATUS
+	def status(self):
+		"""Return a status dict."""
+		return dict(
+				workers=self.__workers, pending=self.__queue.qsize(), 
+				handled=self.__handled, uptime=self.uptime
+			)
 	
-	# SERVICE - HANDLE IO
-	def handle_io(self):
-		"""To be called only by the owning Services object."""
-		
-		for queues in self.__qpairs:
+	
+	# SERVICE - SUBMIT
+	def submit(self, e):
+		"""
+		Queue Event `e` for handling; Returns a Future that resolves to
+		`e` once its reply (or error) is set.
+		"""
+		f = futures.Future()
+		self.__queue.put((e, f))
+		return f
+	
+	
+	# SERVICE - SHUTDOWN
+	def shutdown(self):
+		"""Stop the workers once queued requests are handled."""
+		for i in range(self.__workers):
+			self.__queue.put(None)
+		self.__workers = 0
+	
+	
+	def __work(self):
+		#
+		# Each worker blocks on the queue until a request arrives, then
+		# sets the event's reply (or error) and resolves its Future.
+		#
+		while True:
+			item = self.__queue.get()
+			if item is None:
+				return
+			
+			e, f = item
+			if not f.set_running_or_notify_cancel():
+				continue # cancelled; eg, the caller timed out
+			
 			try:
-				qin, qout = queues
-				
-				# pop an event request from the Queue
-				e = qin.get_nowait()
-				
-				# execute the command
 				e.reply = self.handle_request(e)
-				
-				# Set the reply and return the event to the caller via the
-				# out-queue (which is the client's in-queue).
-				qout.put(e)
-			
-			except Empty:
-				pass
-			except ReferenceError:
-				self.__qpairs.remove(queues)
 			except Exception:
-				e.error = xdata(qin=qin,qout=qout,e=e.dict)
-				qout.put(e) # report the error!
+				e.error = xdata(service=self.serviceid, e=e.dict)
+				
+			with self.__hlock:
+				self.__handled += 1
+			f.set_result(e)
 	
 	
 	# SERVICE - HANDLE REQUEST
@@ -266,8 +367,9 @@ class ServiceConnect(ServiceIO):
 	its own set of queues by which requests are sent and results 
 	received (as Event objects).
 	
-	ServiceConnect objects are obtained by calling `Services.connect`.
-	There's never a reason (nor a practical use) for creating a
+	ServiceConnect objects are obtained by calling `Services.connect`
+	(or `RemoteServices.connect`, to reach a Services object in another
+	process). There's never a reason (nor a practical use) for creating a
 	ServiceConnect object directly.
 	
 	# EXAMPLE
@@ -293,20 +395,14 @@ class ServiceConnect(ServiceIO):
 	
 	CallTimeout = 9
 	
-	def __init__(self, serviceid, queues):
+	def __init__(self, service):
 		"""
 		ServiceConnect must always be created by calling the 
 		`Service.connect()` method.
 		"""
 		ServiceIO.__init__(self)
-		
-		#
-		# The same queues in the opposite order; what's in for the 
-		# service is out for the client (and vice versa). These are
-		# the real queues - Service only holds proxies.
-		#
-		self.__qout, self.__qin = queues
-		self.__sid = serviceid
+		self.__service = service
+		self.__sid = service.serviceid
 	
 	
 	def __call__(self, cmd, *a, **k):
@@ -314,25 +410,27 @@ class ServiceConnect(ServiceIO):
 		Create and pass an event to the Service. Wait for and return the
 		reply. Raise if there's an exception.
 		"""
-		c = Event(cmd, *a, **k)
-		self.__qout.put(c)
-		
 		# don't let this block the program forever. Default: 9 sec
 		tout = trix.kpop(k, 'service_connect_timeout')
 		tout = tout.get('service_connect_timeout', self.CallTimeout)
-		tin = time.time()
 		
-		# loop until result (or timeout)
-		r = None
-		while not r:
-			try:
-				r = self.__qin.get_nowait()
-				if r:
-					return r
-				time.sleep(0.01)
-			except Empty:
-				if time.time() - tin > tout:
-					raise Exception("ServiceConnect Timeout", tout)
+		f = self.request(cmd, *a, **k)
+		try:
+			return f.result(tout)
+		except futures.TimeoutError:
+			f.cancel()
+			raise Exception("ServiceConnect Timeout", tout)
+	
+	
+	def request(self, cmd, *a, **k):
+		"""
+		Pass a request to the Service without waiting; Returns a Future
+		that resolves to the event, with its reply (or error) set.
+		
+		>>> f = c.request('getnets')
+		>>> f.add_done_callback(lambda f: print(f.result().reply))
+		"""
+		return self.__service.submit(Event(cmd, *a, **k))
 	
 	
 	def __getattr__(self, name):
@@ -367,3 +465,279 @@ class SCCaller(object):
 
 
 
+
+
+
+
+
+#
+# Return the codec named by `config`, making sure codecs that can run
+# code when decoding are only used when they're trusted.
+#
+def servicecodec(config):
+	codec = config.get('codec', SERVICES_CODEC)
+	if (codec in SERVICES_UNSAFE) and not config.get('trust'):
+		raise ValueError("err-service-codec", xdata(
+				codec=codec, reason="untrusted-codec", require=['trust']
+			))
+	return codec
+
+
+
+
+#
+# --------- SERVICE HANDLER -----------------
+#
+class ServiceHandler(Handler):
+	"""
+	Handles one RemoteServices connection to a listening `Services`
+	object. Each request frame holds a service id, args and kwargs; 
+	its reply is framed with the same request id and sent as soon as
+	the service's worker is done with it, so replies to requests that
+	were pipelined together may be sent in any order.
+	"""
+	
+	def __init__(self, sock, **k):
+		"""Receives the Services object as handlerk `services`."""
+		self.__services = k.pop('services')
+		self.__fq = FrameQueue(k.get('codec', SERVICES_CODEC))
+		Handler.__init__(self, sock, **k)
+	
+	
+	def handledata(self, data):
+		"""Submit each complete request to the service it names."""
+		self.__fq.feed(data)
+		for rid, req in self.__fq:
+			try:
+				sid, argv, kwargs = req
+				f = self.__services.submit(sid, Event(*argv, **kwargs))
+			except Exception as ex:
+				self.__send(rid, dict(reply=None, error=dict(
+						error="err-service-fail", python=str(ex), request=req
+					)))
+			else:
+				f.add_done_callback(functools.partial(self.__reply, rid))
+	
+	
+	def __reply(self, rid, f):
+		# called by the service's worker thread
+		e = f.result()
+		self.__send(rid, dict(reply=e.reply, error=e.error))
+	
+	
+	def __send(self, rid, r):
+		try:
+			frame = self.__fq.frame(rid, r)
+		except Exception as ex:
+			frame = self.__fq.frame(rid, dict(reply=None, error=dict(
+					error="err-service-fail", reason="reply-encode-fail",
+					python=str(ex)
+				)))
+		try:
+			self.send(frame)
+		except Exception:
+			pass # the client's gone
+
+
+
+
+
+#
+# --------- REMOTE SERVICES -----------------
+#
+class RemoteServices(Runner):
+	"""
+	Client for a `Services` object listening on a port, probably in
+	another process. Requests are spread over a small pool of 
+	persistent connections and sent without waiting for replies to 
+	earlier ones; Each request's Future is resolved when the reply 
+	with its request id arrives.
+	
+	>>> rs = trix.ncreate('app.service.RemoteServices', 9999)
+	>>> c = rs.connect('irclog')       # a ServiceConnect, as usual
+	>>> c.getnets().reply
+	>>> rs.shutdown()
+	"""
+	
+	def __init__(self, config=None, **k):
+		"""
+		Pass the port (or a dict with "port" and, optionally, "host") of
+		a listening Services object. Optional config/kwargs:
+		 * connections : connections to keep (default: SERVICES_CONNECTIONS)
+		 * codec       : must match the server's (default: SERVICES_CODEC)
+		 * trust       : must be True to use the pickle or marshal codec
+		"""
+		config = dict(config) if isinstance(config, dict) else dict(
+				port=config
+			)
+		
+		# replies are read when a connection's socket is ready
+		k.setdefault('evented', True)
+		Runner.__init__(self, config, **k)
+		
+		self.__codec = servicecodec(self.config)
+		self.__cons = [None] * int(
+				self.config.get('connections', SERVICES_CONNECTIONS)
+			)
+		self.__pending = {} # rid -> (future, event, connection index)
+		self.__rids = itertools.count(1)
+		self.__next = 0
+		self.__lock = thread.allocate_lock()
+		self.start()
+	
+	
+	@property
+	def pending(self):
+		"""Number of requests awaiting replies."""
+		return len(self.__pending)
+	
+	
+	# REMOTE SERVICES - CONNECT
+	def connect(self, serviceid):
+		"""
+		Return a ServiceConnect for the remote `serviceid` service. An
+		unknown serviceid isn't detected until a request's error is set.
+		"""
+		return ServiceConnect(RemoteService(self, serviceid))
+	
+	
+	# REMOTE SERVICES - SUBMIT
+	def submit(self, serviceid, e):
+		"""
+		Send Event `e` to the `serviceid` service; Returns a Future that
+		resolves to `e` once its reply (or error) is set.
+		"""
+		f = futures.Future()
+		with self.__lock:
+			rid = next(self.__rids) & 0xFFFFFFFF
+			i = self.__next
+			self.__next = (i + 1) % len(self.__cons)
+			con, fq = self.__cons[i] or self.__open(i)
+			self.__pending[rid] = (f, e, i)
+		
+		try:
+			con.send(fq.frame(rid, [serviceid, e.argv, e.kwargs]))
+		except Exception:
+			with self.__lock:
+				self.__pending.pop(rid, None)
+			self.post(self.__drop, i, con)
+			raise
+		return f
+	
+	
+	# REMOTE SERVICES - STOP
+	def stop(self):
+		"""Stop running; Close connections, failing pending requests."""
+		Runner.stop(self)
+		for i, c in enumerate(list(self.__cons)):
+			if c:
+				self.__drop(i, c[0])
+	
+	
+	# REMOTE SERVICES - STATUS
+	def status(self):
+		"""Return a status dict."""
+		r = Runner.status(self)
+		r['pending'] = self.pending
+		r['connections'] = len([c for c in self.__cons if c])
+		return r
+	
+	
+	#
+	# CONNECTIONS
+	#  - Connections open as they're first needed (or needed again, 
+	#    after being lost). Their sockets are registered by the run 
+	#    loop, which reads replies as they arrive.
+	#
+	def __open(self, i):
+		con = trix.ncreate('util.sock.sockcon.sockcon', {
+				k : self.config[k] for k in ('host', 'port') if k in self.config
+			})
+		self.__cons[i] = (con, FrameQueue(self.__codec))
+		self.post(self.__watch, i, con)
+		return self.__cons[i]
+	
+	
+	def __watch(self, i, con):
+		c = self.__cons[i]
+		if c and (c[0] is con):
+			self.register(con.socket.fileno(), 
+					functools.partial(self.__readevent, i, con)
+				)
+	
+	
+	def __readevent(self, i, con, fileobj, events):
+		try:
+			data = con.recv(con.buflen)
+			if data is None:
+				return
+			if not data:
+				raise ConnectionError("err-service-connection", xdata(
+						reason="connection-closed"
+					))
+			fq = self.__cons[i][1]
+			fq.feed(data)
+			for rid, r in fq:
+				with self.__lock:
+					f, e, ci = self.__pending.pop(rid, (None, None, None))
+				if f and f.set_running_or_notify_cancel():
+					e.reply = r.get('reply')
+					e.error = r.get('error')
+					f.set_result(e)
+		except Exception:
+			self.__drop(i, con)
+	
+	
+	def __drop(self, i, con):
+		#
+		# Close the connection and fail the requests still waiting for
+		# its replies.
+		#
+		with self.__lock:
+			c = self.__cons[i]
+			if not (c and (c[0] is con)):
+				return
+			self.__cons[i] = None
+			lost = [rid for rid in self.__pending if self.__pending[rid][2]==i]
+			lost = [self.__pending.pop(rid) for rid in lost]
+		
+		try:
+			self.unregister(con.socket.fileno())
+		except Exception:
+			pass
+		try:
+			con.shutdown()
+		except Exception:
+			pass
+		
+		for f, e, ci in lost:
+			if f.set_running_or_notify_cancel():
+				f.set_exception(ConnectionError("err-service-connection",
+						xdata(reason="connection-lost", e=e.dict)
+					))
+
+
+
+
+#
+# --------- REMOTE SERVICE -----------------
+#
+class RemoteService(ServiceIO):
+	"""
+	Stands in for a Service in another process, passing requests made
+	by a ServiceConnect to the RemoteServices object that created it.
+	"""
+	
+	def __init__(self, remote, serviceid):
+		ServiceIO.__init__(self)
+		self.__remote = remote
+		self.__serviceid = serviceid
+	
+	@property
+	def serviceid(self):
+		"""The remote service's identifier."""
+		return self.__serviceid
+	
+	def submit(self, e):
+		"""Send Event `e` to the remote service; Returns a Future."""
+		return self.__remote.submit(self.__serviceid, e)
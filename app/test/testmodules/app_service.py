@@ -0,0 +1,65 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from ....app.service import *
+
+
+ss = Services({"services" : {
+	"count" : {"create" : "collections.Counter"},
+	"wait"  : {"create" : "threading.Event", "workers" : 3}
+}})
+try:
+	# calls wait for the reply
+	c = ss.connect("count")
+	c.update("abcab")
+	assert(c.most_common(1).reply == [('a', 2)])
+	
+	# requests resolve futures, handled by each service's workers
+	w = ss.connect("wait")
+	t = time.time()
+	ff = [w.request("wait", 0.3) for i in range(3)]
+	assert([f.result(2).reply for f in ff] == [False]*3)
+	assert(time.time() - t < 0.6)
+	
+	got = []
+	w.request("is_set").add_done_callback(lambda f: got.append(f.result()))
+	time.sleep(0.05)
+	assert(got[0].reply == False)
+	assert(ss.status()['services']['wait']['handled'] == 4)
+	
+	# errors are set on the event
+	assert(c.nosuchmethod().error)
+	
+	# network mode; replies come as each is ready
+	ns = Services({"services" : {
+		"wait" : {"create" : "threading.Event", "workers" : 3}
+	}}, port=0)
+	rs = RemoteServices(ns.port)
+	try:
+		w = rs.connect("wait")
+		got = []
+		for t in (0.3, 0.2, 0.1):
+			f = w.request("wait", t)
+			f.add_done_callback(lambda f: got.append(f.result().argv[1]))
+		f.result(2)
+		time.sleep(0.3)
+		assert(got == [0.1, 0.2, 0.3])
+		assert(w.is_set().reply == False)
+		assert(rs.connect("nosuchservice").is_set().error)
+		assert(ns.status()['clients'] == 2)
+	finally:
+		rs.shutdown()
+		ns.shutdown()
+	
+	# codecs that can run code must be trusted
+	try:
+		Services({"services" : {}}, port=0, codec='pickle')
+		assert(False)
+	except ValueError:
+		pass
+
+finally:
+	ss.shutdown()
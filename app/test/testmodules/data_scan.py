@@ -0,0 +1,50 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under
+# the terms of the GNU Affero General Public License.
+#
+
+from ....data.scan import *
+
+
+#
+# CHUNK SCANNER
+#  - Same results as Scanner, whatever the chunk sizes.
+#
+lines = [
+	'do [1, "two", {3:{4: "the number four"}}]',
+	'  x "q w" (a (b) c) d',
+	'a\\ b "it\\"s" f(x) [a]b c　d',
+	'a b c'
+]
+for line in lines:
+	r = Scanner(line).split()
+	assert(ChunkScanner(line).split() == r)
+	for n in (1, 2, 5):
+		chunks = [line[i:i+n] for i in range(0, len(line), n)]
+		assert(ChunkScanner(chunks).split() == r)
+
+assert(ChunkScanner('"q w" x [a [b]').split() == ['"q w"', 'x', '[a [b]'])
+assert(ChunkScanner(' abc_1 99 ').scanid() == 'abc_1')
+assert(ChunkScanner('123 ').scandigits() == '123')
+assert(ChunkScanner('abacab').scantoc() == 'aba')
+
+
+#
+# TOKENS
+#  - Streams are read in chunks; Items may span them.
+#
+import io
+from ....util.lineq import *
+
+text = 'do [1, "two é", {3:{4: "the four"}}] \\"q 日本 "a b"'
+r = Scanner(text).split()
+for n in (1, 3, 64):
+	assert(list(Scanner.tokens(text, n)) == r)
+	assert(list(Scanner.tokens(io.StringIO(text), n)) == r)
+	assert(list(Scanner.tokens(io.BytesIO(text.encode('utf_8')), n)) == r)
+	assert(list(Scanner.tokens(Buffer(text), n)) == r)
+
+q = LineQueue()
+q.feed('a "b c"\r\nd')
+assert(list(Scanner.tokens(q)) == ['a', '"b c"', '\r\n'])
@@ -0,0 +1,64 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under
+# the terms of the GNU Affero General Public License.
+#
+
+from ....data.udata import *
+from ....data.udata.utable import *
+from array import array
+import tempfile
+
+#
+# LOOKUPS
+#
+assert(udata.properties('a') == ['ASCII_Hex_Digit', 'Hex_Digit'])
+assert(udata.properties(' ') == ['Pattern_White_Space', 'White_Space'])
+assert(udata.linebreak('a') == 'AL')
+assert(udata.linebreak(' ') == 'SP')
+assert(udata.block('c') == 'Basic Latin')
+assert(udata.block(chr(0x0400)) == 'Cyrillic')
+assert(udata.bracket('(') == ('o', ')'))
+assert(udata.bracket('a') == None)
+
+# ranges that cross block boundaries
+assert('Other_Alphabetic' in udata.properties(chr(0x08F0)))
+assert(udata.linebreak(chr(0x2A700)) == 'ID')
+
+
+#
+# CACHE
+#
+d = tempfile.mkdtemp()
+try:
+	p = os.path.join(d, UTABLE_FILE)
+	t = utable.load(p)
+	assert(os.path.exists(p))
+	t = utable.load(p)
+	assert(t.sig == utable.signature())
+	assert(isinstance(t.props.leaves, memoryview)) # mapped, not built
+	assert(t.linebreak(chr(0x3041)) == 'CJ')
+	assert(t.bracketpair('[') == ('o', ']'))
+	assert(t.properties(chr(0x08F0)) == udata.properties(chr(0x08F0)))
+	del(t)
+finally:
+	if os.path.exists(p):
+		os.remove(p)
+	os.rmdir(d)
+
+
+#
+# WHOLE STRINGS
+#
+t = udata.table()
+assert(udata.categories("Hi there", spans=True) == [
+		(0, 1, 'Lu'), (1, 2, 'Ll'), (2, 3, 'Zs'), (3, 8, 'Ll')
+	])
+assert(udata.categories("") == array('B'))
+
+s = "(a) Ωλ 日本\U0001F600"
+ids = udata.linebreaks(s)
+assert([t.lbnames[i] for i in ids] == [udata.linebreak(c) for c in s])
+assert(udata.blocks(s, spans=True)[-2:] == [
+		(7, 9, 'CJK Unified Ideographs'), (9, 10, 'Emoticons')
+	])
@@ -0,0 +1,26 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from ....net.aio import *
+
+
+#
+# NET.AIO
+#  - Echo through the asyncio Server/Handler using an asyncio Connect.
+#
+async def test_aio():
+	s = await Server(0).start()
+	try:
+		c = await Connect(s.port).connect()
+		await c.writeline("TEST")
+		assert(await c.readline() == "TEST\r\n")
+		assert(len(s.handlers) == 1)
+		assert(s.query('handlers')['reply'][0]['peer'] == c.addr)
+		await c.close()
+	finally:
+		await s.stop()
+
+asyncio.run(test_aio())
@@ -0,0 +1,96 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from .... import *
+import urllib.request
+
+
+#
+# NET.HANDLER.HHTTP
+#  - Serve the example content; check whole-file and range replies.
+#
+s = trix.ncreate("net.server.Server", 0, selector=True, 
+		nhandler="net.handler.hhttp.HandleHttp", handlerk={'compressmin':0}
+	).starts()
+try:
+	url = "http://127.0.0.1:%i/index.html" % s.port
+	index = trix.npath("net/handler/hhttp/example/index.html")
+	content = index.reader(mode='rb').read()
+	
+	r = urllib.request.urlopen(url)
+	assert(r.status == 200)
+	assert(r.read() == content)
+	
+	# the client's copy is current; expect 304
+	try:
+		urllib.request.urlopen(urllib.request.Request(url, 
+				headers={'If-None-Match':r.headers['ETag']}
+			))
+		assert(False)
+	except urllib.error.HTTPError as ex:
+		assert(ex.code == 304)
+	
+	r = urllib.request.urlopen(urllib.request.Request(url, 
+			headers={'Range':'bytes=1-4'}
+		))
+	assert(r.status == 206)
+	assert(r.headers['Content-Range'] == "bytes 1-4/%i" % len(content))
+	assert(r.read() == content[1:5])
+	
+	# compressed reply
+	r = urllib.request.urlopen(urllib.request.Request(url, 
+			headers={'Accept-Encoding':'gzip'}
+		))
+	assert(r.headers['Content-Encoding'] == 'gzip')
+	assert(trix.module('gzip').decompress(r.read()) == content)
+	
+	# pipelined requests, the second split across two sends
+	c = trix.ncreate("net.connect.Connect", s.port)
+	c.write("GET / HTTP/1.1\r\nHost: x\r\n\r\nGET / HTTP/1.1\r\n")
+	time.sleep(0.1)
+	c.write("Host: x\r\n\r\n")
+	time.sleep(0.2)
+	assert(c.read(8192).count("HTTP/1.1 200 OK") == 2)
+
+finally:
+	s.stop()
+
+# handlers with different cache limits don't share a cache
+from ....net.handler.hhttp import HandleHttp, FileCache
+c1 = HandleHttp.filecache(cachefile=10)
+assert(c1.status()['filemax'] == 10)
+assert(HandleHttp.filecache(cachefile=10) is c1)
+assert(HandleHttp.filecache(cachefile=20) is not c1)
+assert(HandleHttp.filecache(cache=False) is None)
+c2 = FileCache()
+assert(HandleHttp.filecache(cache=c2) is c2)
+
+
+#
+# NET.HTTPREQ
+#  - Reject bad lengths (400) and bodies over maxbody (413).
+#
+from ....net.httpreq import *
+
+def httperr(data, **k):
+	try:
+		p = httpparser(**k)
+		p.feed(data)
+		p.readrequest()
+	except HttpError as ex:
+		return ex.status
+
+head = b"POST / HTTP/1.1\r\nHost: x\r\n"
+assert(httperr(head + b"Content-Length: -5\r\n\r\n") == '400')
+assert(httperr(head + b"Content-Length: +5\r\n\r\n") == '400')
+assert(httperr(head + b"Content-Length: 9\r\n\r\n", maxbody=8) == '413')
+assert(httperr(head + b"Transfer-Encoding: chunked\r\n\r\n-5\r\n") == '400')
+assert(httperr(head + b"Transfer-Encoding: chunked\r\n\r\n9\r\n",
+		maxbody=8) == '413')
+assert(httperr(head + b"Transfer-Encoding: chunked\r\n\r\n" + b"0"*2000,
+		maxhead=1024) == '400')
+assert(httperr(head + b"Transfer-Encoding: chunked\r\n\r\n0\r\n" + 
+		b"X: y\r\n"*200, maxhead=1024) == '400')
@@ -0,0 +1,154 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from .... import *
+
+
+#
+# NET.SERVER - SELECTOR MODE
+#  - The default Handler is an echo server; it should reply just the
+#    same when the server waits on a selector.
+#
+s = trix.ncreate("net.server.Server", 0, selector=True).starts()
+try:
+	c = trix.ncreate("net.connect.Connect", s.port)
+	c.write("TEST\r\n")
+	
+	time.sleep(0.1)
+	assert(c.read() == "TEST\r\n")
+	assert(len(s.handlers) == 1)
+	
+	# a closed peer is dropped without waiting for `maxidle`
+	c.shutdown()
+	time.sleep(0.1)
+	assert(len(s.handlers) == 0)
+
+finally:
+	s.shutdown()
+
+
+#
+# NET.SERVER - PRE-FORK WORKERS
+#  - Two worker processes share the port; replies come from either.
+#
+s = trix.ncreate("net.server.Server", 0, workers=2, selector=True)
+s.start()
+try:
+	time.sleep(1.5)
+	cc = [trix.ncreate("net.connect.Connect", s.port) for i in range(4)]
+	for c in cc:
+		c.write("TEST\r\n")
+	
+	time.sleep(0.3)
+	assert([c.read() for c in cc] == ["TEST\r\n"]*4)
+	assert(len(s.query('handlers')['reply']) == 4)
+	assert(len(s.status()['workers']) == 2)
+
+finally:
+	s.stop()
+
+
+#
+# NET.SERVER - HANDLER POOL
+#  - A slow handler must not delay replies on other connections, and
+#    each connection's replies must arrive in order.
+#
+class SlowEcho(trix.nvalue("net.handler.Handler")):
+	def handledata(self, data):
+		if data.startswith(b"SLOW"):
+			time.sleep(0.5)
+		self.socket.send(data)
+
+s = trix.ncreate("net.server.Server", 0, handler=SlowEcho, 
+		handler_pool=2, selector=True
+	).starts()
+try:
+	c1 = trix.ncreate("net.connect.Connect", s.port)
+	c2 = trix.ncreate("net.connect.Connect", s.port)
+	c1.write("SLOW\r\n")
+	time.sleep(0.1)
+	c1.write("NEXT\r\n")
+	c2.write("FAST\r\n")
+	
+	time.sleep(0.2)
+	assert(c2.read() == "FAST\r\n")
+	assert(not c1.read())
+	
+	time.sleep(0.5)
+	assert(c1.read() == "SLOW\r\nNEXT\r\n")
+	assert(s.status()['server']['pool']['size'] == 2)
+
+finally:
+	s.stop()
+	s.shutdown()
+
+
+#
+# NET.SERVER - IDLE TIMEOUT
+#  - Handlers idle past `maxidle` are dropped by their idle timer; one
+#    that keeps receiving data is kept.
+#
+s = trix.ncreate("net.server.Server", 0, selector=True, 
+		handlerk={'maxidle':0.3}
+	).starts()
+try:
+	c1 = trix.ncreate("net.connect.Connect", s.port)
+	c2 = trix.ncreate("net.connect.Connect", s.port)
+	for i in range(3):
+		time.sleep(0.15)
+		c2.write("TEST\r\n")
+	
+	time.sleep(0.1)
+	assert(len(s.handlers) == 1)
+	assert(c2.read())
+
+finally:
+	s.stop()
+	s.shutdown()
+
+
+#
+# NET.SERVER - BUFFERED WRITES
+#  - A reply larger than the socket buffers arrives intact, while the
+#    server goes on answering other connections.
+#
+class BigEcho(trix.nvalue("net.handler.Handler")):
+	def handledata(self, data):
+		if data.startswith(b"BIG"):
+			data = b"x" * 2**22
+		self.send(data)
+
+s = trix.ncreate("net.server.Server", 0, handler=BigEcho, 
+		handlerk={'highwater':2**16}, selector=True
+	).starts()
+try:
+	c1 = trix.ncreate("net.connect.Connect", s.port)
+	c2 = trix.ncreate("net.connect.Connect", s.port)
+	c1.write("BIG")
+	time.sleep(0.2)
+	
+	h = [h for h in s.handlers if h.pending][0]
+	assert(h.full)
+	
+	c2.write("TEST\r\n")
+	time.sleep(0.2)
+	assert(c2.read() == "TEST\r\n")
+	
+	n = 0
+	t = time.time() + 10
+	while (n < 2**22) and (time.time() < t):
+		n += len(c1.read(2**16) or '')
+	assert(n == 2**22)
+	assert(h.pending == 0)
+	
+	# handlers count bytes and handling time
+	assert(h.bytesout == 2**22)
+	assert(h.handled == 1)
+	assert(s.status()['server']['bytesin'] == 9)
+
+finally:
+	s.stop()
+	s.shutdown()
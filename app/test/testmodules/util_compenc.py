@@ -26,6 +26,8 @@ assert(zlib.decode(b"x\x9cKLJ\x06\x00\x02M\x01'") == b"abc")
 assert(bz2.encode(b"abc") == b'BZh91AY&SYd\x8c\xbbs\x00\x00\x00\x01\x008\x00 \x00!\x98\x19\x84aw$S\x85\t\x06H\xcb\xb70')
 assert(bz2.decode(b'BZh91AY&SYd\x8c\xbbs\x00\x00\x00\x01\x008\x00 \x00!\x98\x19\x84aw$S\x85\t\x06H\xcb\xb70') == b"abc")
 
+assert(gzip.decode(gzip.encode(b"abc")) == b"abc")
+
 assert(compact("abc") == b'eJxLTEoGAAJNASc=')
 assert(expand(b'eJxLTEoGAAJNASc=') == b'abc')
 
@@ -0,0 +1,33 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from ....util.frameq import *
+
+
+for codec in FRAME_CODECS:
+	f = FrameQueue(codec)
+	b = f.frame(7, {'a': [1, 2]}) + f.frame(8, 'x')
+	
+	# partial frames wait for the rest
+	f.feed(b[:5])
+	assert(f.readframe() == None)
+	
+	f.feed(b[5:] + b'REST')
+	assert(list(f) == [(7, {'a': [1, 2]}), (8, 'x')])
+	assert(f.rest() == b'REST')
+
+# bytes pass intact with marshal and pickle
+f = FrameQueue('marshal')
+f.feed(f.frame(1, b'\x00\xff'))
+assert(f.readframe() == (1, b'\x00\xff'))
+
+# oversize frames are refused
+f = FrameQueue('json', maxframe=4)
+try:
+	f.frame(1, "too long")
+	raise Exception("frame-size-not-checked")
+except FrameError:
+	pass
@@ -0,0 +1,28 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from .... import *
+import math, operator
+
+
+# results come in order, or as completed
+r = list(trix.pmap("math.factorial", range(12), 2, 3))
+assert(r == [math.factorial(i) for i in range(12)])
+
+r = trix.pmap("math.sqrt", iter(range(50)), 2, 4, ordered=False)
+assert(sorted(r) == [math.sqrt(i) for i in range(50)])
+
+# reduce
+assert(trix.pmap("operator.neg", range(10), 2, reduce=operator.add) == -45)
+
+# function errors are raised; chunks from crashed workers are retried
+for fn in ["math.sqrt", "os._exit"]:
+	try:
+		list(trix.pmap(fn, [-1], 1, retries=1))
+		raise Exception("pmap-must-raise")
+	except trix.nvalue("util.pmap.PMapError") as ex:
+		x = ex.args[1]['xdata']
+		assert(x['reason'] == 'function-failed' or x['tries'] == 2)
@@ -30,3 +30,96 @@ finally:
 		p.shutdown()
 
 
+
+
+#
+# PROCESS POOL
+#  - A pooled Process launches in a warm interpreter, and goes back to
+#    the pool when stopped.
+#
+pool = trix.ncreate("util.process.ProcessPool", 1)
+try:
+	time.sleep(1)
+	assert(pool.idle == 1)
+	
+	p = pool.process("trix.net.server.Server", 0).launch('run')
+	time.sleep(0.2)
+	status = p.rstatus()
+	port = status.get("reply", {}).get("server", {}).get("port")
+	c = trix.ncreate("net.connect.Connect", port)
+	c.write("TEST\r\n")
+	
+	time.sleep(0.5)
+	assert(c.read() == "TEST\r\n")
+	
+	pid = p.pid
+	p.stop()
+	time.sleep(1)
+	assert(pool.idle == 1)
+	assert(pool.status()['reused'] == 1)
+	
+	p = pool.process("trix.net.server.Server", 0).launch('run')
+	assert(p.pid == pid)
+	time.sleep(0.2)
+	assert(p.rstatus()['reply']['server']['port'])
+	p.stop()
+
+finally:
+	pool.shutdown()
+
+
+#
+# FRAMED CONTROL CHANNEL
+#  - Queries from several threads at once each get their own reply.
+#
+p = trix.nprocess("net.server.Server", 0, framed='pickle').launch('run')
+try:
+	time.sleep(1)
+	assert(p.query('ping')['reply'] == 'pong')
+	assert(p.frames.codec == 'pickle')
+	
+	replies = []
+	def q():
+		replies.append(p.query('status'))
+	
+	for i in range(4):
+		trix.start(q)
+	assert(p.query('handlers')['query'] == 'handlers')
+	
+	time.sleep(0.5)
+	assert(len(replies) == 4)
+	assert(all([r['query'] == 'status' for r in replies]))
+
+finally:
+	p.shutdown()
+
+
+#
+# BLOCKING QUERIES
+#  - Queries wait on the control socket; `aquery` returns a Future.
+#
+p = trix.nprocess("net.server.Server", 0).launch('run')
+try:
+	t = time.process_time()
+	f = p.aquery('ping')
+	assert(p.query('ping')['reply'] == 'pong')
+	assert(f.result(3)['reply'] == 'pong')
+	assert(time.process_time() - t < 0.5)
+
+finally:
+	p.shutdown()
+
+
+#
+# SHARED MEMORY RING
+#  - The remote Runner attaches to the ring created at launch.
+#
+p = trix.nprocess("net.server.Server", 0, ring=2**16).launch('run')
+try:
+	time.sleep(0.5)
+	assert(p.ring.capacity == 2**16)
+	assert(p.rstatus()['reply']['runner']['ring'] == p.ring.name)
+
+finally:
+	p.stop()
+	assert(p.ring is None)
@@ -0,0 +1,46 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from ....util.reactor import *
+
+
+class Counter(Runner):
+	count = 0
+	def io(self):
+		self.count += 1
+
+
+r = Reactor().starts()
+try:
+	# a runner with nothing registered is stepped every `sleep` seconds
+	c = Counter(sleep=0.05).attach(r)
+	c.start()
+	
+	# servers are stepped when their sockets are ready
+	s = trix.ncreate("net.server.Server", 0, selector=True).attach(r)
+	s.start()
+	assert(s.selector is r.selector)
+	assert(len(r.runners) == 2)
+	
+	cc = trix.ncreate("net.connect.Connect", s.port)
+	cc.write("TEST\r\n")
+	time.sleep(0.3)
+	assert(cc.read() == "TEST\r\n")
+	assert(3 < c.count < 10)
+	
+	# stopped runners are set aside until started again
+	s.stop()
+	assert(r.runners == [c])
+	s.start()
+	cc.write("TEST\r\n")
+	time.sleep(0.1)
+	assert(cc.read() == "TEST\r\n")
+
+finally:
+	r.stop()
+	s.shutdown()
+
+assert(not r.runners)
@@ -63,3 +63,64 @@ assert(not r.running)
 assert(not r.threaded)
 
 
+
+
+#
+# EVENTS
+#  - A runner with a registered socket waits for it (not sleeping),
+#    and is woken by `post()` from other threads.
+#
+import socket
+
+a, b = socket.socketpair()
+got = []
+
+r = TestRunner(encoding='utf_8', output=o)
+r.register(a, lambda f, e: got.append(f.recv(64)))
+r.start()
+try:
+	time.sleep(0.1)
+	b.send(b"X")
+	time.sleep(0.02)
+	assert(got == [b"X"])
+	
+	r.post(got.append, "posted")
+	time.sleep(0.02)
+	assert(got[-1] == "posted")
+	
+	r.after(0.01, got.append, "timer")
+	time.sleep(0.05)
+	assert(got[-1] == "timer")
+
+finally:
+	r.shutdown()
+	a.close()
+	b.close()
+
+
+
+
+#
+# STATS
+#  - Each runner times its io passes; 'profile' queries run steps
+#    under cProfile.
+#
+r = TestRunner(encoding='utf_8', output=o, sleep=0.01)
+r.start()
+try:
+	assert(r.query('profile start')['reply'] == True)
+	time.sleep(0.1)
+	assert(r.query('profile')['reply'] == True)
+	lines = r.query('profile stop 5')['reply']
+	assert([x for x in lines if 'function calls' in x])
+	assert(r.query('profile stop')['error'] == 'not-profiling')
+	
+	st = r.query('stats')['reply']
+	assert(st['times']['io']['count'] > 5)
+	assert(r.status()['stats']['times']['io']['max'] > 0)
+	assert(r.query('stats reset')['reply'] == True)
+	assert('io' not in r.stats.dict()['times'] or 
+			r.stats.histogram('io').count < 3
+		)
+finally:
+	r.shutdown()
@@ -0,0 +1,46 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from .... import *
+from ....util.shmring import *
+
+
+r = ShmRing(size=64)
+w = ShmRing(r.name)
+try:
+	assert(w.capacity == 64)
+	assert(r.peek() == None)
+	
+	# raw bytes and encoded records
+	w.write(b"abc")
+	w.put({'a': [1, 2]})
+	mv = r.peek()
+	assert(isinstance(mv, memoryview) and (mv == b"abc"))
+	mv.release()
+	r.advance()
+	assert(r.get() == {'a': [1, 2]})
+	assert(r.pending == 0)
+	
+	# records wrap to the start; a full ring makes the writer wait
+	for i in range(20):
+		assert(w.write(b"%05i" % i * 3, 1))
+		assert(r.read() == b"%05i" % i * 3)
+	
+	n = 0
+	while w.write(b"%02i" % n * 5, 0.05):
+		n += 1
+	assert(n >= 3)
+	assert([bytes(x) for x in r.records()] == [b"%02i"%i*5 for i in range(n)])
+	
+	try:
+		w.write(b"x"*64)
+		raise Exception("ring-must-refuse-oversize-records")
+	except ValueError:
+		pass
+
+finally:
+	w.close()
+	r.close()
@@ -0,0 +1,48 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms 
+# of the GNU Affero General Public License.
+#
+
+from ....util.timers import *
+
+
+calls = []
+
+t = Timers()
+t1 = t.after(0.05, calls.append, 1)
+t2 = t.after(0.05, calls.append, 2)
+t3 = t.every(0.05, calls.append, 3)
+t.cancel(t2)
+
+assert(t.run() == 0)
+assert(0.0 < t.timeout(1.0) <= 0.05)
+
+time.sleep(0.06)
+assert(t.run() == 2)
+assert(calls == [1, 3])
+assert(not t1.active)
+assert(t3.active)
+
+time.sleep(0.06)
+t.run()
+assert(calls == [1, 3, 3])
+
+t.cancel(t3)
+time.sleep(0.06)
+assert(t.run() == 0)
+assert(t.timeout(1.0) == 1.0)
+
+
+#
+# RUNNER
+#  - Timed callbacks are called from the run loop.
+#
+r = trix.ncreate("util.runner.Runner", sleep=0.01)
+r.every(0.02, calls.append, 4)
+r.start()
+try:
+	time.sleep(0.1)
+	assert(calls.count(4) >= 2)
+finally:
+	r.shutdown()
@@ -13,4 +13,5 @@ Param    = NLoader("data.param", "Param")
 
 # important subpackage classes
 Scanner  = NLoader("data.scan", "Scanner")
+ChunkScanner = NLoader("data.scan.chunk", "ChunkScanner")
 ScanQuery = NLoader("data.udata.query", "ScanQuery")
@@ -6,6 +6,7 @@
 
 from ..udata.charinfo import *
 from ...util.stream.buffer import *
+from .chunk import ChunkScanner, CHUNK_SIZE
 
 
 class Scanner(object):
@@ -15,6 +16,25 @@ class Scanner(object):
 	Escape = "\\"
 	BufSize = 2048
 	
+	@classmethod
+	def tokens(cls, stream, chunk_size=CHUNK_SIZE, **k):
+		"""
+		Generator: Yields the items `split()` would return for the text
+		of `stream`, which is read `chunk_size` at a time. Items (eg, 
+		quoted text) may span chunks. See `ChunkScanner.chunks` for the
+		kinds of stream accepted, and keyword arguments.
+		
+		NOTE: As with `split()`, line endings are not white space, so
+		      they're collected in (or as) items.
+		
+		>>> f = trix.ncreate('fs.file.File', path)
+		>>> for token in Scanner.tokens(f.reader()):
+		...   print (token)
+		"""
+		chunks = ChunkScanner.chunks(stream, chunk_size, **k)
+		return ChunkScanner(chunks, **k).tokens()
+	
+	
 	def __init__(self, iterable_text, **k):
 		"""Pass anything iterable that produces unicode characters."""
 		self.__escape = k.get('escape', self.Escape)
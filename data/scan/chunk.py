@@ -0,0 +1,491 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under
+# the terms of the GNU Affero General Public License.
+#
+
+from ..udata.charinfo import *
+from ...util.stream import Stream
+from ...util.lineq import LineQueue
+import re, codecs
+
+
+CHUNK_SIZE = 2**16  # characters (or bytes) read from a stream at once
+
+
+#
+# CHAR CLASSES
+#  - Regex char classes matching the same chars as the charinfo
+#    properties Scanner tests, built from the udata tables the first
+#    time each is needed.
+#
+class charclass(object):
+	"""Regex char classes for `ChunkScanner`."""
+	
+	__cache = {}
+	
+	@classmethod
+	def get(cls, name):
+		"""Return the char class (a regex string) named `name`."""
+		try:
+			return cls.__cache[name]
+		except KeyError:
+			cls.__cache[name] = cls.__cc(getattr(cls, name)())
+			return cls.__cache[name]
+	
+	@classmethod
+	def chars(cls, ranges):
+		"""Generate each char in a list of (first, last) ranges."""
+		for a, b in ranges:
+			for i in range(a, b+1):
+				yield unichr(i)
+	
+	@classmethod
+	def __cc(cls, ranges):
+		r = []
+		for a, b in ranges:
+			r.append(re.escape(unichr(a)))
+			if b > a:
+				r.append('-' + re.escape(unichr(b)))
+		return ''.join(r)
+	
+	
+	# CLASSES
+	#  - each returns a list of (first, last) codepoint ranges
+	
+	@classmethod
+	def zs(cls):
+		"""Category 'Zs' (ci.cat == 'Zs')."""
+		return udata.table().ranges('category', ['Zs'])
+	
+	@classmethod
+	def space(cls):
+		"""White space (ci.space)."""
+		t = udata.table()
+		return [(ord(c), ord(c)) for c in cls.chars(cls.zs()) if (
+				unicodedata.bidirectional(c) == 'WS'
+			) and ('White_Space' in t.properties(c))]
+	
+	@classmethod
+	def digit(cls):
+		"""Chars with a non-zero digit value (ci.dig)."""
+		t = udata.table()
+		return [(ord(c), ord(c)) for c in cls.chars(
+				t.ranges('category', ['Nd', 'No'])
+			) if unicodedata.digit(c, 0)]
+	
+	@classmethod
+	def ident(cls):
+		"""Letters, digits, and connectors (ci.alphanum or ci.connector)."""
+		return udata.table().ranges('category', ['Lu', 'Ll', 'Nd', 'Pc'])
+	
+	@classmethod
+	def quote(cls):
+		"""Quotation marks (ci.linebreak == 'QU')."""
+		return udata.table().ranges('linebreak', ['QU'])
+
+
+
+
+#
+# CHUNK SCANNER
+#
+class ChunkScanner(object):
+	"""
+	Scan text held in string chunks, giving the same results as
+	`Scanner` but matching runs of chars with precompiled regular
+	expressions instead of stepping through `charinfo` objects.
+	
+	Pass a string or any iterable that produces strings (of any
+	length). Scans may span chunks; They're read only as needed.
+	
+	>>> s = ChunkScanner('do [1, "two", {3:{4: "the number four"}}]')
+	>>> s.split()    # ['do', '[1, "two", {3:{4: "the number four"}}]']
+	"""
+	
+	@classmethod
+	def chunks(cls, stream, chunk_size=CHUNK_SIZE, **k):
+		"""
+		Generator: Yields the text of `stream` in chunks of up to 
+		`chunk_size`. Pass a string, a `Reader`, `Buffer` or other trix
+		Stream, a `LineQueue` (whose queued lines are yielded), a file or
+		socket, or any iterable of strings. Bytes are decoded (by kwarg
+		`encoding`, or the stream's) a chunk at a time, so multibyte
+		chars may span chunks.
+		"""
+		if isinstance(stream, basestring):
+			yield stream
+			return
+		elif isinstance(stream, LineQueue):
+			for line in stream.lines:
+				yield line
+			return
+		
+		#
+		# Read trix Streams' inner streams directly, holding on to the 
+		# Stream itself (a Buffer's file is truncated when it's deleted).
+		#
+		f = stream
+		if isinstance(stream, Stream):
+			k = dict(stream.ek, **k)
+			f = stream.stream
+		
+		read = getattr(f, 'read', None) or getattr(f, 'recv', None)
+		if read:
+			items = iter(lambda: read(chunk_size), read(0)[:0])
+		else:
+			items = iter(f)
+		
+		dec = None
+		for x in items:
+			if isinstance(x, bytes):
+				if not dec:
+					dec = codecs.getincrementaldecoder(
+							k.get('encoding', DEF_ENCODE)
+						)(k.get('errors', 'strict'))
+				x = dec.decode(x)
+			yield x
+		if dec:
+			yield dec.decode(b'', True)
+	
+	Escape = "\\"
+	
+	def __init__(self, text, **k):
+		"""Pass a string, or an iterable of strings."""
+		self.__escape = k.get('escape', self.Escape)
+		if isinstance(text, basestring):
+			self.__buf = text
+			self.__chunks = iter(())
+		else:
+			self.__buf = ''
+			self.__chunks = iter(text)
+		self.__pos = 0
+		
+		# patterns, compiled for this scanner's escape char
+		self.__rx = {}
+	
+	
+	#
+	# CHARACTERS
+	#
+	@property
+	def char(self):
+		"""Return the current character."""
+		c = self.__peek()
+		if c is None:
+			raise StopIteration()
+		return c
+	
+	@property
+	def c(self):
+		"""Return a charinfo object for the current character."""
+		ci = charinfo(self.char)
+		ci.next()
+		return ci
+	
+	@property
+	def cc(self):
+		"""Move forward one and return the charinfo object, or None."""
+		if self.__peek() is not None:
+			self.__pos += 1
+		if self.__peek() is not None:
+			return self.c
+	
+	@property
+	def eof(self):
+		"""True once the end of text is reached."""
+		return self.__peek() is None
+	
+	@property
+	def esc(self):
+		"""The escape character. Default: '\\' (backslash)."""
+		return self.__escape
+	
+	
+	#
+	# BASE SCAN METHODS
+	#  - As with Scanner, `collect` and `ignore` test each char with
+	#    `fn(charinfo)`. They're slow; The methods below them don't
+	#    use them.
+	#
+	def collect(self, fn):
+		"""Collect each character that matches the criteria of `fn`."""
+		r = []
+		ci = self.c
+		while fn(ci):
+			if ci.c != self.__escape:
+				r.append(ci.c)
+			else:
+				ci = self.cc
+				if ci is None:
+					break
+				r.append(ci.c)
+			ci = self.cc
+			if ci is None:
+				break
+		return ''.join(r)
+	
+	def ignore(self, fn):
+		"""Pass all characters for which executable `fn` returns True."""
+		ci = self.c
+		while ci and fn(ci):
+			ci = self.cc
+	
+	
+	#
+	# CONVENIENCE METHODS
+	#
+	def passend(self):
+		"""Pass existing white space, then any endlines."""
+		self.passwhite()
+		self.__run(self.__pattern('lineend'))
+	
+	def passwhite(self):
+		"""Pass any white space."""
+		if (self.__pos >= len(self.__buf)) and not self.__more():
+			raise StopIteration()
+		self.__run(self.__pattern('space'))
+	
+	def scandigits(self):
+		"""Scan numeric digits."""
+		if self.eof:
+			raise StopIteration()
+		return self.__collect(self.__pattern('digit'))
+	
+	def scanid(self):
+		"""
+		Collect the next sequence of characters that match the rules for
+		an "identifier": a letter followed by any number of letters,
+		digits, or underscores (cat=='Pc').
+		"""
+		self.passwhite()
+		if not unicodedata.digit(self.char, 0):
+			return self.__collect(self.__pattern('ident'))
+	
+	def scanto(self, char):
+		"""Collect all text to the given character `c`."""
+		if self.eof:
+			raise StopIteration()
+		return self.__collect(self.__pattern('to', char))
+	
+	def scantoc(self):
+		"""
+		Collect the current character and all characters up to and
+		including its next occurrence.
+		
+		>>> ChunkScanner("abacab").scantoc() # "aba"
+		"""
+		c = self.char
+		self.__pos += 1
+		r = c + self.scanto(c)
+		if not self.eof:
+			r += self.char
+			self.__pos += 1
+		return r
+	
+	
+	#
+	# COMPLEX METHODS
+	#
+	def scan(self):
+		"""
+		Pass white space then scan one item - either bidi/quote or a
+		single string that contains no space characters.
+		"""
+		self.passwhite()
+		return self.__item()
+	
+	def split(self):
+		"""
+		Split text on white characters, except those included in a bidi
+		enclosure or quotes, where whitespace is included in the result.
+		"""
+		r = []
+		try:
+			v = True
+			while v:
+				self.passwhite()
+				v = self.__item()
+				if v:
+					r.append(v)
+		except StopIteration:
+			pass
+		return r
+	
+	def tokens(self):
+		"""
+		Generator: Yields, one at a time, the items `split` would return.
+		"""
+		try:
+			while True:
+				self.passwhite()
+				v = self.__item()
+				if not v:
+					return
+				yield v
+		except StopIteration:
+			return
+	
+	def scanbidi(self):
+		"""
+		Scan through bidi open/close characters, until the first bidi
+		character is matched; Returns None if the current character is
+		not a bracket.
+		"""
+		self.passwhite()
+		br = self.char
+		pair = self.__kind(br)
+		if pair and (pair != 'q'):
+			end = pair[1]
+			rx = self.__pattern('bidi', br, end)
+			
+			r = [br]
+			self.__pos += 1
+			ct = 1
+			while ct > 0:
+				m = rx.search(self.__buf, self.__pos)
+				if not m:
+					r.append(self.__buf[self.__pos:])
+					self.__pos = len(self.__buf)
+					if not self.__more():
+						break
+				else:
+					r.append(self.__buf[self.__pos:m.end()])
+					self.__pos = m.end()
+					ct += 1 if m.group() == br else -1
+			return ''.join(r)
+	
+	def scanquote(self):
+		"""
+		Scan a quoted string, including its quote characters; Returns
+		None if the current character is not a quote.
+		"""
+		self.passwhite()
+		q = self.char
+		if self.__kind(q) == 'q':
+			self.__pos += 1
+			if self.eof:
+				return q
+			r = q + self.scanto(q)
+			if not self.eof:
+				r += self.char
+				self.__pos += 1
+			return r
+	
+	
+	#
+	# INTERNAL
+	#
+	__kinds = {}
+	
+	@classmethod
+	def __kind(cls, c):
+		# Return 'q' for a quote, the udata.bracket pair for a bracket,
+		# or None; Remembered for each char.
+		try:
+			return cls.__kinds[c]
+		except KeyError:
+			q = re.match("[%s]" % charclass.get('quote'), c)
+			k = cls.__kinds[c] = 'q' if q else udata.bracket(c)
+			return k
+	
+	def __item(self):
+		# Scan a quote, bracketed text, or token (as `scan` does, but
+		# without passing white space first).
+		k = self.__kind(self.char)
+		if k == 'q':
+			return self.scanquote()
+		elif k:
+			return self.scanbidi()
+		return self.__collect(self.__pattern('token'))
+	
+	def __peek(self):
+		# Return the current char, or None at the end of text.
+		if self.__pos < len(self.__buf) or self.__more():
+			return self.__buf[self.__pos]
+	
+	def __more(self):
+		#
+		# Replace the (fully scanned) buffer with the next chunk that's
+		# not empty; Return False if there is none.
+		#
+		for chunk in self.__chunks:
+			if chunk:
+				self.__buf = chunk
+				self.__pos = 0
+				return True
+		return False
+	
+	def __run(self, rx):
+		# Pass (and return) the run of chars matching `rx` (which must
+		# match at any position), reading chunks as needed.
+		m = rx.match(self.__buf, self.__pos)
+		self.__pos = m.end()
+		if self.__pos < len(self.__buf):
+			return m.group()
+		
+		r = [m.group()]
+		while self.__more():
+			m = rx.match(self.__buf, self.__pos)
+			r.append(m.group())
+			self.__pos = m.end()
+			if self.__pos < len(self.__buf):
+				break
+		return ''.join(r)
+	
+	def __collect(self, rx):
+		#
+		# Collect the run of chars matching pattern `rx`, as given by
+		# `__pattern`. Where the run continues with the escape char, it
+		# is dropped and the char following it is collected, whatever
+		# it is.
+		#
+		rx, escapes = rx
+		r = [self.__run(rx)]
+		while escapes and (self.__peek() == self.__escape):
+			self.__pos += 1
+			if self.__peek() is None:
+				break
+			r.append(self.__buf[self.__pos])
+			self.__pos += 1
+			r.append(self.__run(rx))
+		return ''.join(r)
+	
+	def __pattern(self, key, *chars):
+		#
+		# Return the compiled pattern for `key` (and `chars`). For the
+		# runs collected by `__collect`, that's a tuple: the pattern -
+		# which stops at the escape char - and whether the escape char
+		# is one the run would otherwise include.
+		#
+		k = (key,) + chars
+		try:
+			return self.__rx[k]
+		except KeyError:
+			pass
+		
+		if key == 'lineend':
+			r = re.compile("[\r\n\x85]*")
+		elif key == 'space':
+			r = re.compile("[%s]*" % charclass.get('space'))
+		elif key == 'bidi':
+			r = re.compile("[%s]" % ''.join(re.escape(c) for c in chars))
+		else:
+			if key == 'to':
+				p = "[^%s]" % re.escape(chars[0])
+			elif key == 'token':
+				p = "[^%s]" % charclass.get('zs')
+			else:
+				p = "[%s]" % charclass.get(key)
+			
+			esc = self.__escape
+			escapes = bool(esc and re.match(p, esc))
+			if not escapes:
+				r = (re.compile(p + '*'), False)
+			elif p.startswith('[^'):
+				r = (re.compile("[^%s%s]*" % (re.escape(esc), p[2:-1])), True)
+			else:
+				r = (re.compile("(?:(?!%s)%s)*" % (re.escape(esc), p)), True)
+		
+		self.__rx[k] = r
+		return r
@@ -7,10 +7,28 @@
 #
 
 from ... import *
-from .blocks import BLOCKS
-from .brackets import BRACKETPAIRS
-from .proplist import PROPERTIES
-import bisect
+
+
+#
+# DATA
+#  - The unicode data modules are large, and lookups no longer need
+#    them (see `udata.table`), so they're imported only on request.
+#  - As attributes of this module (eg, `udata.BLOCKS`), they're loaded
+#    when first used; `from trix.data.udata import *` doesn't include
+#    them. Import them from their modules instead; eg,
+#    `from trix.data.udata.blocks import BLOCKS`.
+#
+UDATA_LAZY = dict(
+		BLOCKS = 'data.udata.blocks',
+		BRACKETPAIRS = 'data.udata.brackets',
+		PROPERTIES = 'data.udata.proplist'
+	)
+
+def __getattr__(name):
+	try:
+		return trix.nvalue(UDATA_LAZY[name], name)
+	except KeyError:
+		raise AttributeError(name)
 
 
 
@@ -32,13 +50,7 @@ class udata(object):
 		>>> udata.bracket('(')
 		('o', ')')
 		"""
-		i = ord(c)
-		x = bisect.bisect_left(BRACKETPAIRS, [i])
-		try:
-			BP = BRACKETPAIRS[x]
-			return (BP[2], unichr(BP[1])) if (BP and BP[0]==i) else None
-		except IndexError:
-			return None
+		return cls.table().bracketpair(c)
 	
 	
 	
@@ -54,20 +66,24 @@ class udata(object):
 		>>> udata.block('c')
 		'Basic Latin'
 		"""
-		i = ord(c)+1
-		x = bisect.bisect_left(BLOCKS, [[i]])
-		B = BLOCKS[x-1]
-		return B[1]
+		return cls.table().blockname(c)
 	
 	@classmethod
-	def blocks(cls):
-		"""Dict with block-name keys and range list values."""
+	def blocks(cls, text=None, spans=False):
+		"""
+		Dict with block-name keys and range list values. If `text` is
+		given, return the block ids of its chars instead (an array('H')
+		indexing `udata.table().blocknames`), or with `spans`, a list of
+		(start, end, blockname) runs.
+		"""
+		if text is not None:
+			return cls.table().classify('block', text, spans)
 		try:
 			return cls.__blocks
 		except AttributeError:
 			cls.__blocks = {}
 			cls.__blocknames = []
-			for b in BLOCKS:
+			for b in trix.nvalue('data.udata.blocks', 'BLOCKS'):
 				cls.__blocknames.append(b[1])
 				cls.__blocks[b[1]] = b[0]
 			return cls.__blocks
@@ -83,6 +99,23 @@ class udata(object):
 	
 	
 	
+	#
+	# TABLE
+	#
+	@classmethod
+	def table(cls):
+		"""
+		Returns the precomputed lookup tables (a `utable` object) behind
+		the `properties`, `linebreak`, `block`, and `bracket` methods.
+		"""
+		try:
+			return cls.__table
+		except AttributeError:
+			cls.__table = trix.nvalue('data.udata.utable.utable').load()
+			return cls.__table
+	
+	
+	
 	#
 	# PROPERTIES
 	#
@@ -107,7 +140,30 @@ class udata(object):
 	@classmethod
 	def properties(cls, c):
 		"""List of all properties of the given char `c`."""
-		return cls.propfast().get(c)
+		return cls.table().properties(c)
+	
+	# CATEGORIES
+	@classmethod
+	def categories(cls, text, spans=False):
+		"""
+		General category ids of each char in `text`, as an array('B')
+		indexing `udata.table().catnames`; With `spans`, a list of 
+		(start, end, category) runs.
+		
+		>>> udata.categories("Hi there", spans=True)
+		[(0, 1, 'Lu'), (1, 2, 'Ll'), (2, 3, 'Zs'), (3, 8, 'Ll')]
+		"""
+		return cls.table().classify('category', text, spans)
+	
+	# LINEBREAKS
+	@classmethod
+	def linebreaks(cls, text, spans=False):
+		"""
+		Linebreak class ids of each char in `text`, as an array('B')
+		indexing `udata.table().lbnames`; With `spans`, a list of 
+		(start, end, linebreak) runs.
+		"""
+		return cls.table().classify('linebreak', text, spans)
 	
 	# PROP-ALIAS
 	@classmethod
@@ -122,9 +178,8 @@ class udata(object):
 	# LINE-BREAK PROPERTY (CODE)
 	@classmethod
 	def linebreak(cls, c):
-		return cls.breakfast().get(c)
-		#linebreak = trix.nmodule('data.udata.linebreak')
-		#return linebreak.find_linebreak_property(ord(c))
+		"""Linebreak property code of char `c`, or None."""
+		return cls.table().linebreak(c)
 	
 	
 	
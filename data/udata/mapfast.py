@@ -18,12 +18,15 @@ class mapfast(object):
 	Builds an index from a unicode data dict with keys that are strings
 	(such as property names) and values that are lists of either single
 	integers or integer pairs (ranges).
+	
+	Each block's index is built the first time a char in that block is
+	looked up, so creating a mapfast object costs next to nothing.
 	"""
 	
 	@property
 	def blocks(self):
 		"""The data for all blocks/properties."""
-		return self.__fblocks
+		return self.fblocks
 	
 	@classmethod
 	def gblocks(cls):
@@ -42,8 +45,6 @@ class mapfast(object):
 		self.__keys = sorted(self.__dict.keys())
 		
 		self.__fblocks = {}
-		self.__addblocks()
-		self.__addprops()
 	
 	
 	@property
@@ -56,43 +57,50 @@ class mapfast(object):
 	
 	@property
 	def fblocks(self):
+		"""Dict of the index of every block; Builds any not yet built."""
+		for block in self.gblocks():
+			self.fblock(block)
 		return self.__fblocks
 	
 	
-	def __addblocks(self):
-		for block in self.gblocks():
-			self.__fblocks[block] = {}
+	def fblock(self, block):
+		"""The index of `block`, built on first use."""
+		try:
+			return self.__fblocks[block]
+		except KeyError:
+			self.__fblocks[block] = self.__addprops(block)
+			return self.__fblocks[block]
 	
 	
-	def __addprops(self):
+	def __addprops(self, block):
 		
-		for block in self.__fblocks.keys():
+		# get the range for this block
+		br = udata.blocks()[block]
+		brange = range(br[0],br[1]+1)
 			
-			# get the range for this block
-			br = udata.blocks()[block]
-			brange = range(br[0],br[1]+1)
+		#
+		# Loop through each property name; add a custom property list
+		# just for this particular block.
+		#
+		bprops = {}
+		for propname in self.keys: #eg, PROPERTIES.keys():
+			bprops[propname] = []
+			proplist = self.dict[propname]
+			for prop in proplist:
+				try:
+					p1 = prop[0]
+					pn = prop[1]
+					if (p1 in brange) and (pn in brange):
+						bprops[propname].append(prop)
+				except:
+					if prop in brange:
+						bprops[propname].append(prop)
 			
-			#
-			# Loop through each property name; add a custom property list
-			# just for this particular block.
-			#
+			# don't hang on to empty property sets
+			if not bprops[propname]:
+				del(bprops[propname])
 			
-			for propname in self.keys: #eg, PROPERTIES.keys():
-				self.__fblocks[block][propname] = []
-				proplist = self.dict[propname]
-				for prop in proplist:
-					try:
-						p1 = prop[0]
-						pn = prop[1]
-						if (p1 in brange) and (pn in brange):
-							self.__fblocks[block][propname].append(prop)
-					except:
-						if prop in brange:
-							self.__fblocks[block][propname].append(prop)
-				
-				# don't hang on to empty property sets
-				if not self.__fblocks[block][propname]:
-					del(self.__fblocks[block][propname])
+		return bprops
 
 
 	
@@ -106,11 +114,8 @@ class mapfast(object):
 		# find the block that contains the given codepoint
 		cblock = udata.block(c)
 		
-		# store the dict of all blocks/properties locally (for speed)
-		FB = self.fblocks
-		
-		# store the dict `bprops` locally (for speed)
-		bprops = FB[cblock]
+		# the dict of properties for this block (built on first use)
+		bprops = self.fblock(cblock)
 		
 		# gotta use int, not chr
 		x = ord(c)
@@ -149,7 +154,7 @@ class mapfast(object):
 		"""Display a (very long) list of block values in a fmt.Grid."""
 		
 		# loop through block names
-		for blockname in sorted(self.__fblocks.keys()):
+		for blockname in sorted(self.fblocks.keys()):
 			
 			# Print block name in all-caps
 			print ("\n\n#\n# %s\n#" % (blockname.upper()))
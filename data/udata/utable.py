@@ -0,0 +1,506 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under
+# the terms of the GNU Affero General Public License.
+#
+
+from ... import *
+from array import array
+import os, re, json, mmap, struct, itertools, unicodedata
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+UTABLE_FILE = "udata.table"   # cache file name, within DEF_CACHE
+UTABLE_VERSION = 3
+UTABLE_SHIFT = 8              # a page holds 2**UTABLE_SHIFT codepoints
+UTABLE_SIZE = 0x110000        # codepoints
+UTABLE_U16 = 'utf_16_le' if sys.byteorder == 'little' else 'utf_16_be'
+
+#
+# CACHE FILE
+#  - The magic bytes and the length of a JSON header, the header, 
+#    then the pages and leaves of each table (in native byte order),
+#    each starting on an 8-byte boundary. The header holds the
+#    signature, the name lists, and each table's [offset, length, 
+#    typecode] for pages and for leaves.
+#
+UTABLE_MAGIC = b'trix-utable\0'
+UTABLE_HEAD = struct.Struct('=12sI')
+UTABLE_TABLES = ('props', 'lbreak', 'block', 'bracket', 'cat')
+UTABLE_NAMES = (
+		'propnames', 'propsets', 'lbnames', 'blocknames', 'brackets',
+		'catnames'
+	)
+
+
+#
+# PAGE TABLE
+#
+class pagetable(object):
+	"""
+	A two-stage table holding a small integer for each codepoint. The
+	`pages` array gives, for each page of 256 codepoints, the offset
+	of that page's values in `leaves`; Identical pages (and most are)
+	are stored only once.
+	
+	>>> t = pagetable.build(array('B', bytes(UTABLE_SIZE)))
+	>>> t[0x41]
+	0
+	"""
+	
+	def __init__(self, pages, leaves):
+		"""
+		Pass `pages` and `leaves` arrays (or memoryviews cast to the
+		same types), as built by `build()`.
+		"""
+		self.pages = pages
+		self.leaves = leaves
+		self.typecode = getattr(leaves, 'typecode', None) or leaves.format
+	
+	def __getitem__(self, i):
+		return self.leaves[self.pages[i >> UTABLE_SHIFT] + (i & 0xFF)]
+	
+	
+	#
+	# LOOKUP
+	#  - Whole strings are looked up in C loops where possible: text
+	#    that's all in the first page (eg, ASCII) is translated by a
+	#    byte table; Otherwise NumPy does it, if it's installed.
+	#
+	def lookup(self, text):
+		"""Return an array of the value for each char of `text`."""
+		tc = self.typecode
+		if self.latin:
+			try:
+				b = text.encode('latin_1').translate(self.latin)
+				return array(tc, b if tc == 'B' else iter(b))
+			except UnicodeEncodeError:
+				pass
+		
+		if numpy is not None:
+			b = text.encode('utf_32_le', 'surrogatepass')
+			cp = numpy.frombuffer(b, numpy.uint32)
+			v = self.np[0][self.np[1][cp >> UTABLE_SHIFT] + (cp & 0xFF)]
+			return array(tc, v.tobytes())
+		
+		#
+		# Otherwise, str.translate maps each char to the char whose 
+		# ordinal is its value, looking up (and remembering) only those
+		# it hasn't seen before.
+		#
+		v = text.translate(self.xlat)
+		if tc == 'B':
+			return array('B', v.encode('latin_1'))
+		a = array(tc)
+		a.frombytes(v.encode(UTABLE_U16))
+		return a
+	
+	
+	@property
+	def latin(self):
+		"""
+		Byte translation table of values for the first page; None if any
+		are too large for a byte.
+		"""
+		try:
+			return self.__latin
+		except AttributeError:
+			try:
+				p = self.pages[0]
+				self.__latin = bytes(self.leaves[p:p+256].tolist())
+			except ValueError:
+				self.__latin = None
+			return self.__latin
+	
+	@property
+	def xlat(self):
+		"""A str.translate table of chars seen by `lookup()`."""
+		try:
+			return self.__xlat
+		except AttributeError:
+			self.__xlat = xlat(self)
+			return self.__xlat
+	
+	@property
+	def np(self):
+		"""The (leaves, pages) as NumPy arrays."""
+		try:
+			return self.__np
+		except AttributeError:
+			self.__np = (
+					numpy.frombuffer(self.leaves, self.typecode), 
+					numpy.frombuffer(self.pages, 'I')
+				)
+			return self.__np
+	
+	
+	@classmethod
+	def build(cls, values):
+		"""Build from an array holding the value for each codepoint."""
+		n = 1 << UTABLE_SHIFT
+		seen = {}
+		pages = array('I')
+		leaves = array(values.typecode)
+		for i in range(0, UTABLE_SIZE, n):
+			page = values[i:i+n]
+			key = page.tobytes()
+			if key not in seen:
+				seen[key] = len(leaves)
+				leaves.extend(page)
+			pages.append(seen[key])
+		return cls(pages, leaves)
+
+
+
+
+#
+# XLAT
+#
+class xlat(dict):
+	"""Maps ordinals to the char of their `pagetable` value, as needed."""
+	
+	def __init__(self, table):
+		self.table = table
+	
+	def __missing__(self, o):
+		c = self[o] = unichr(self.table[o])
+		return c
+
+
+
+
+#
+# U-TABLE
+#
+class utable(object):
+	"""
+	Precomputed property, linebreak, block, and bracket lookups for
+	every codepoint. Each lookup is a couple of array indexes, so it
+	takes the same (short) time for any character.
+	
+	Building the tables takes a second or so, so they're cached in the
+	DEF_CACHE directory. Use `utable.load()` (or udata.table()) to get
+	the cached copy; It's memory-mapped, so loading it takes next to
+	no time and doesn't import the (large) unicode data modules.
+	
+	>>> t = udata.table()
+	>>> t.properties('a')       # ['ASCII_Hex_Digit', 'Hex_Digit']
+	>>> t.linebreak('a')        # 'AL'
+	"""
+	
+	def __init__(self):
+		"""Build the tables. Call `utable.load()` instead."""
+		PROPERTIES = trix.nvalue('data.udata.proplist', 'PROPERTIES')
+		LINEBREAK = trix.nvalue('data.udata.linebreak', 'LINEBREAK')
+		BLOCKS = trix.nvalue('data.udata.blocks', 'BLOCKS')
+		BRACKETPAIRS = trix.nvalue('data.udata.brackets', 'BRACKETPAIRS')
+		
+		# PROPERTIES - each distinct set of properties gets an id
+		self.propnames = sorted(PROPERTIES.keys())
+		masks = self.__fill(array('Q', bytes(8*UTABLE_SIZE)), [
+				(1 << i, PROPERTIES[p]) for i, p in enumerate(self.propnames)
+			], True)
+		
+		ids = {0:0}
+		self.propsets = [()]
+		propids = array('H', bytes(2*UTABLE_SIZE))
+		for i, m in enumerate(masks):
+			if m:
+				if m not in ids:
+					ids[m] = len(self.propsets)
+					self.propsets.append(tuple(
+						p for b, p in enumerate(self.propnames) if m & (1 << b)
+					))
+				propids[i] = ids[m]
+		self.props = pagetable.build(propids)
+		
+		#
+		# LINEBREAK
+		#  - Id 0 is no class (None). Classes are filled in reverse, so
+		#    that (as with `udata.linebreak()`) the first class listing
+		#    a codepoint is the one it gets.
+		#
+		self.lbnames = [None] + sorted(LINEBREAK.keys())
+		self.lbreak = pagetable.build(self.__fill(
+				array('B', bytes(UTABLE_SIZE)), reversed([
+					(i, LINEBREAK[k]) for i, k in enumerate(self.lbnames) if k
+				])
+			))
+		
+		#
+		# BLOCKS
+		#  - As with `udata.block()`, codepoints between blocks get the
+		#    id of the block before them.
+		#
+		self.blocknames = [b[1] for b in BLOCKS]
+		blockids = array('H', bytes(2*UTABLE_SIZE))
+		for i, b in enumerate(BLOCKS):
+			end = BLOCKS[i+1][0][0] if (i+1 < len(BLOCKS)) else UTABLE_SIZE
+			blockids[b[0][0]:end] = array('H', [i]) * (end - b[0][0])
+		self.block = pagetable.build(blockids)
+		
+		# BRACKETS - id 0 is none; others index BRACKETPAIRS (plus one)
+		self.brackets = [None] + [
+				(bp[2], unichr(bp[1])) for bp in BRACKETPAIRS
+			]
+		brids = array('B', bytes(UTABLE_SIZE))
+		for i, bp in enumerate(BRACKETPAIRS):
+			brids[bp[0]] = i + 1
+		self.bracket = pagetable.build(brids)
+		
+		# CATEGORIES - general category (from unicodedata)
+		cats = [unicodedata.category(unichr(i)) for i in range(UTABLE_SIZE)]
+		self.catnames = sorted(set(cats))
+		ids = {c:i for i, c in enumerate(self.catnames)}
+		self.cat = pagetable.build(array('B', [ids[c] for c in cats]))
+	
+	
+	def __fill(self, values, items, bits=False):
+		#
+		# Set (or, with `bits`, OR in) the value of each codepoint in
+		# each (value, unicode_range_list) of `items`.
+		#
+		for v, rlist in items:
+			for r in rlist:
+				if isinstance(r, int):
+					r = (r, r)
+				if bits:
+					for i in range(r[0], r[1]+1):
+						values[i] |= v
+				else:
+					values[r[0]:r[1]+1] = array(values.typecode, [v]) * (
+							r[1] - r[0] + 1
+						)
+		return values
+	
+	
+	#
+	# LOOKUPS
+	#
+	def properties(self, c):
+		"""List of the properties of char `c`."""
+		return list(self.propsets[self.props[ord(c)]])
+	
+	def linebreak(self, c):
+		"""Linebreak class of char `c`, or None."""
+		return self.lbnames[self.lbreak[ord(c)]]
+	
+	def blockname(self, c):
+		"""Name of the block containing char `c`."""
+		return self.blocknames[self.block[ord(c)]]
+	
+	def bracketpair(self, c):
+		"""Open/close indicator and the bracket matching `c`, or None."""
+		return self.brackets[self.bracket[ord(c)]]
+	
+	def category(self, c):
+		"""General category of char `c`."""
+		return self.catnames[self.cat[ord(c)]]
+	
+	
+	#
+	# CLASSIFY
+	#  - Look up a whole string at once. Results are arrays of ids,
+	#    which index the `catnames`, `lbnames`, or `blocknames` lists.
+	#
+	def classify(self, kind, text, spans=False):
+		"""
+		Return an array of the `kind` ('category', 'linebreak', or
+		'block') id of each char in `text`. If `spans` is True, return
+		a list of (start, end, name) tuples - one for each run of chars
+		of the same kind - instead.
+		"""
+		table, names = self.__kind(kind)
+		ids = table.lookup(text)
+		return self.spans(ids, names) if spans else ids
+	
+	
+	def ranges(self, kind, names):
+		"""
+		Return a list of (first, last) codepoint ranges of the chars
+		whose `kind` ('category', 'linebreak', or 'block') is one of
+		`names`.
+		
+		>>> udata.table().ranges('category', ['Zs'])[:2]
+		[(32, 32), (160, 160)]
+		"""
+		table, allnames = self.__kind(kind)
+		ids = set(i for i, n in enumerate(allnames) if n in names)
+		n = 1 << UTABLE_SHIFT
+		
+		# identical pages share leaves, so each is searched only once
+		runs = {}
+		r = []
+		for i, p in enumerate(table.pages):
+			try:
+				pr = runs[p]
+			except KeyError:
+				leaf = array(table.typecode, table.leaves[p:p+n])
+				pr = runs[p] = [
+						(a, b-1) for a, b, v in self.spans(leaf) if v in ids
+					]
+			base = i << UTABLE_SHIFT
+			for a, b in pr:
+				if r and (r[-1][1] == base + a - 1):
+					r[-1] = (r[-1][0], base + b)
+				else:
+					r.append((base + a, base + b))
+		return r
+	
+	
+	def __kind(self, kind):
+		return {
+				'category'  : (self.cat, self.catnames),
+				'linebreak' : (self.lbreak, self.lbnames),
+				'block'     : (self.block, self.blocknames)
+			}[kind]
+	
+	
+	@classmethod
+	def spans(cls, ids, names=None):
+		"""
+		Return a list of (start, end, id) tuples for each run of equal
+		values in array `ids`; If `names` is given, it's indexed by id to
+		give the third item.
+		"""
+		if not ids:
+			return []
+		elif numpy is not None:
+			a = numpy.frombuffer(ids, ids.typecode)
+			starts = [0] + (numpy.flatnonzero(numpy.diff(a)) + 1).tolist()
+			r = zip(starts, starts[1:] + [len(a)], a[starts].tolist())
+		elif ids.typecode == 'B':
+			r = ((m.start(), m.end(), m.group()[0]) for m in 
+					re.finditer(b'(.)\\1*', ids.tobytes(), re.S)
+				)
+		else:
+			r, i = [], 0
+			for v, g in itertools.groupby(ids):
+				n = len(list(g))
+				r.append((i, i+n, v))
+				i += n
+		
+		if names:
+			return [(a, b, names[v]) for a, b, v in r]
+		return list(r)
+	
+	
+	
+	#
+	# CACHE
+	#
+	@classmethod
+	def load(cls, path=None):
+		"""
+		Return the tables from the cache file at `path` (default:
+		UTABLE_FILE in the DEF_CACHE directory). If it's missing or out
+		of date, the tables are built and cached there.
+		"""
+		path = path or cls.cachepath()
+		sig = cls.signature()
+		try:
+			t = cls.mmap(path)
+			if t.sig == sig:
+				return t
+		except Exception:
+			pass
+		
+		t = cls()
+		t.sig = sig
+		try:
+			t.save(path)
+		except Exception as ex:
+			trix.log("udata-table-cache-fail", path, type(ex), ex.args)
+		return t
+	
+	
+	@classmethod
+	def mmap(cls, path):
+		"""
+		Return the tables in the cache file at `path`, without checking
+		their signature; Each table is a view of the mapped file.
+		"""
+		with open(path, 'rb') as f:
+			mv = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+		
+		magic, n = UTABLE_HEAD.unpack_from(mv)
+		if magic != UTABLE_MAGIC:
+			raise ValueError("err-utable-load", xdata(
+					reason="bad-magic", path=path
+				))
+		
+		start = UTABLE_HEAD.size + n
+		head = json.loads(bytes(mv[UTABLE_HEAD.size:start]).decode('utf_8'))
+		t = cls.__new__(cls)
+		t.sig = tuple(head['sig'])
+		for name in UTABLE_NAMES:
+			setattr(t, name, [
+					tuple(x) if isinstance(x, list) else x for x in head[name]
+				])
+		for name in UTABLE_TABLES:
+			(po, pn, ptc), (lo, ln, ltc) = head['tables'][name]
+			po += start
+			lo += start
+			setattr(t, name, pagetable(
+					mv[po:po+pn].cast(ptc), mv[lo:lo+ln].cast(ltc)
+				))
+		return t
+	
+	
+	def save(self, path):
+		"""Write these tables to a cache file at `path`."""
+		data = []
+		tables = {}
+		pos = 0
+		for name in UTABLE_TABLES:
+			t = getattr(self, name)
+			tables[name] = []
+			for a, tc in ((t.pages, 'I'), (t.leaves, t.typecode)):
+				b = bytes(a)
+				tables[name].append([pos, len(b), tc])
+				data.append(b + bytes(-len(b) % 8))
+				pos += len(data[-1])
+		
+		head = dict(sig=self.sig, tables=tables)
+		for name in UTABLE_NAMES:
+			head[name] = getattr(self, name)
+		head = json.dumps(head).encode('utf_8')
+		head += b' ' * (-(UTABLE_HEAD.size + len(head)) % 8)
+		
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		tmp = "%s.%i" % (path, trix.pid())
+		with open(tmp, 'wb') as f:
+			f.write(UTABLE_HEAD.pack(UTABLE_MAGIC, len(head)))
+			f.write(head)
+			for b in data:
+				f.write(b)
+		os.replace(tmp, path)
+	
+	
+	@classmethod
+	def cachepath(cls):
+		"""Path to the default cache file."""
+		return os.path.join(os.path.expanduser(DEF_CACHE), UTABLE_FILE)
+	
+	
+	@classmethod
+	def signature(cls):
+		"""
+		Identifies the data the tables are built from; A cached copy with
+		any other signature is rebuilt. Where the data modules' sources
+		aren't available (eg, a .pyc-only or zipped install), the trix
+		version stands in for them.
+		"""
+		d = os.path.dirname(os.path.abspath(__file__))
+		r = [UTABLE_VERSION, unicodedata.unidata_version, sys.byteorder]
+		for m in ('blocks', 'brackets', 'linebreak', 'proplist'):
+			try:
+				st = os.stat(os.path.join(d, m + '.py'))
+				r.extend([st.st_size, int(st.st_mtime)])
+			except OSError:
+				r.extend([m, str(VERSION)])
+		return tuple(r)
@@ -0,0 +1,585 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from ..util.sock._sockurl import * # trix, sockconf, sockurl
+from ..util.enchelp import *
+from ..util.lineq import *
+import asyncio, socket
+
+
+AIO_HANDLER = trix.innerpath('net.aio.Handler')
+AIO_MAXIDLE = 300
+AIO_BUFFER  = 4096
+AIO_HOST    = '127.0.0.1'
+
+
+#
+# ASYNCIO NET STACK
+#  - These classes mirror net.server.Server, net.handler.Handler,
+#    net.handler.hlines.HandleLines, and net.connect.Connect, but run
+#    on an asyncio event loop rather than in Runner threads. Many
+#    thousands of connections can be served by a single thread, and
+#    trix servers can be embedded in asyncio-based applications.
+#
+#  - The threaded classes are unaffected; use whichever suits.
+#
+
+
+
+#
+# HANDLER
+#
+class Handler(EncodingHelper):
+	"""
+	Asyncio server connection handler; Default action: echo server.
+
+	Override the `handledata` coroutine to implement meaningful
+	functionality, just as with `trix.net.handler.Handler`.
+	"""
+
+	def __init__(self, reader, writer, **k):
+		"""
+		Receives the asyncio stream reader/writer pair and the Server
+		configuration's "handlerk" dict, passed as kwargs.
+		"""
+		k.setdefault('encoding', DEF_ENCODE)
+		EncodingHelper.__init__(self, k)
+
+		self.__config = k
+		self.__reader = reader
+		self.__writer = writer
+		self.__buflen = k.get('buflen', AIO_BUFFER)
+		self.__newl = k.get('newl', DEF_NEWL)
+		self.__maxidle = k.get('maxidle', AIO_MAXIDLE)
+		self.__lastrecv = time.time()
+		self.__eof = False
+
+
+	@property
+	def config(self):
+		"""Handler config, for reference."""
+		return self.__config
+
+	@property
+	def reader(self):
+		"""The asyncio StreamReader."""
+		return self.__reader
+
+	@property
+	def writer(self):
+		"""The asyncio StreamWriter."""
+		return self.__writer
+
+	@property
+	def buflen(self):
+		"""Read buffer length. Default: AIO_BUFFER (4096)"""
+		return self.__buflen
+
+	@property
+	def newl(self):
+		"""New-line character set; Eg, '\n', '\r', '\r\n'."""
+		return self.__newl
+
+	@property
+	def maxidle(self):
+		"""Max time to wait for data before dropping the connection."""
+		return self.__maxidle
+
+	@property
+	def lastrecv(self):
+		"""Time last data was received."""
+		return self.__lastrecv
+
+	@property
+	def countdown(self):
+		"""Time left until this handler times out."""
+		return self.maxidle - (time.time() - self.lastrecv)
+
+	@property
+	def eof(self):
+		"""True after the peer has closed its end of the connection."""
+		return self.__eof
+
+	@property
+	def addr(self):
+		"""Returns local address as tupel (addr,port)."""
+		return self.__writer.get_extra_info('sockname')
+
+	@property
+	def peer(self):
+		"""Returns remote address as tupel (addr,port)."""
+		return self.__writer.get_extra_info('peername')
+
+
+	# HANDLE
+	async def handle(self):
+		"""
+		Receive and handle data until the peer disconnects or the
+		connection is idle for `maxidle` seconds.
+		"""
+		try:
+			while not self.__eof:
+				try:
+					data = await asyncio.wait_for(
+							self.__reader.read(self.buflen), self.countdown
+						)
+				except asyncio.TimeoutError:
+					break
+
+				if data:
+					self.__lastrecv = time.time() # update for timeout
+					await self.handledata(data)
+				else:
+					self.__eof = True
+		finally:
+			await self.close()
+
+
+	# HANDLE DATA
+	async def handledata(self, data):
+		"""
+		OVERRIDE THIS METHOD!
+
+		This method is a placeholder. You must override it to implent
+		meaningful functionality (unless what you want is an echo server).
+		"""
+		if data:
+			await self.send(data)
+
+
+	# SEND
+	async def send(self, data):
+		"""Send `data` bytes; waits until the transport drains."""
+		if data:
+			self.__writer.write(data)
+			await self.__writer.drain()
+
+	# WRITE
+	async def write(self, text, **k):
+		"""Encode text to bytes and send."""
+		await self.send(text.encode(**self.extractEncoding(k)))
+
+	# WRITELINE
+	async def writeline(self, text, **k):
+		"""Write text, appending `self.newl` line ending."""
+		await self.write("%s%s" % (text, self.newl), **k)
+
+
+	# CLOSE
+	async def close(self):
+		"""Close the connection."""
+		try:
+			self.__writer.close()
+			await self.__writer.wait_closed()
+		except Exception:
+			pass
+
+
+
+
+#
+# HANDLE LINES
+#
+class HandleLines(Handler):
+	"""Asyncio Handler that queues received lines in a LineQueue."""
+
+	def __init__(self, *a, **k):
+		"""Pass encoding-related parameters. Default: DEF_ENCODE."""
+		k.setdefault('encoding', DEF_ENCODE)
+		Handler.__init__(self, *a, **k)
+
+		self.__lineq = LineQueue(**k) # trix.util.lineq
+
+		# Steal these methods directly from lineq
+		self.readlines = self.__lineq.readlines
+		self.readline = self.__lineq.readline
+		self.read = self.__lineq.read
+
+
+	@property
+	def q(self):
+		"""Use handler.q to read directly from the queue."""
+		return self.__lineq.q
+
+	@property
+	def lineq(self):
+		"""The LineQueue object that handles everything."""
+		return self.__lineq
+
+	@property
+	def fragment(self):
+		return self.__lineq.fragment
+
+
+	# HANDLE DATA
+	async def handledata(self, data):
+		"""Queue data, then pass each complete line to `handleline`."""
+		if data:
+			self.__lineq.feed(data)
+			for line in self.__lineq.readlines():
+				await self.handleline(line)
+
+
+	# HANDLE LINE
+	async def handleline(self, line):
+		"""
+		OVERRIDE THIS METHOD!
+
+		Called once for each complete line received. The default action
+		returns each line to the queue for retrieval by `readline`.
+		"""
+		self.__lineq.q.put(line)
+
+
+
+
+#
+# SERVER
+#
+class Server(sockurl):
+	"""Asyncio connection server."""
+
+	def __init__(self, config=None, **k):
+		"""
+		Pass config as a dict, url, address, or port, exactly as given
+		to `trix.net.server.Server` (or `sockserv`).
+
+		Optional additional params:
+		 - backlog : max waiting connections. default: socket.SOMAXCONN
+		 - host    : default: ''
+		 - port    : Port on which to listen. Default: 0 (random port)
+		 - handler : A type or type desc. Eg, "trix.net.aio.Handler"
+		 - nhandler: String spec, inner path. Eg, "net.aio.HandleLines"
+		 - handlerk: Kwargs passed to each new handler.
+		 - reuse   : True
+		"""
+		sockurl.__init__(self, config, **k)
+
+		self.config.setdefault('handler', AIO_HANDLER)
+
+		self.__handler = self._gethandlertype()
+		self.__handlerk = self.config.get('handlerk', {})
+		self.__handlers = []
+		self.__server = None
+		self.__port = None
+
+		# STATUS MESSAGES
+		self.messages = []
+
+
+	@property
+	def handler(self):
+		"""Handler type."""
+		return self.__handler
+
+	@property
+	def handlerk(self):
+		"""Kwargs sent to new handlers when they're created."""
+		return self.__handlerk
+
+	@property
+	def handlers(self):
+		"""Handler-list items."""
+		return self.__handlers
+
+	@property
+	def server(self):
+		"""The asyncio Server object, once started."""
+		return self.__server
+
+	@property
+	def port(self):
+		"""The listening port; available after `start()`."""
+		return self.__port
+
+	@property
+	def active(self):
+		"""True while the server is listening."""
+		return bool(self.__server and self.__server.is_serving())
+
+
+	#
+	# START
+	#
+	async def start(self):
+		"""Bind and start listening. Returns self."""
+		c = self.config
+		self.__server = await asyncio.start_server(
+				self.__accept, c.get('host') or None, c.get('port', 0) or 0,
+				family = trix.value("socket", c.get('family', 'AF_INET')),
+				backlog = c.get('backlog', socket.SOMAXCONN),
+				reuse_address = c.get('reuse', True)
+			)
+		self.__port = self.__server.sockets[0].getsockname()[1]
+		return self
+
+
+	#
+	# SERVE
+	#
+	async def serve(self):
+		"""Start (if necessary) and serve until cancelled or stopped."""
+		if not self.__server:
+			await self.start()
+		try:
+			await self.__server.serve_forever()
+		except asyncio.CancelledError:
+			pass
+
+
+	#
+	# RUN
+	#
+	def run(self):
+		"""Run a new event loop that serves until interrupted."""
+		try:
+			asyncio.run(self.serve())
+		except KeyboardInterrupt:
+			pass
+
+
+	#
+	# STOP
+	#
+	async def stop(self):
+		"""Stop listening and close all handler connections."""
+		if self.__server:
+			self.__server.close()
+			for h in list(self.__handlers):
+				await h.close()
+			await self.__server.wait_closed()
+
+
+	#
+	# ADD/REMOVE HANDLER
+	#
+	def addHandler(self, handler):
+		"""Add `handler` to the active handler list."""
+		self.handlers.append(handler)
+		self.messages.append(["handler-add", handler, handler.addr])
+
+	def removeHandler(self, handler):
+		"""Remove `handler` from the handler list."""
+		self.handlers.remove(handler)
+		self.messages.append(["handler-remove", handler, handler.peer])
+
+
+	# STATUS
+	def status(self):
+		"""Return a status dict."""
+		status = dict(server=dict(
+			active = self.active,
+			config = self.config,
+			handler = self.handler,
+			handlerk = self.handlerk,
+			handlers = len(self.handlers),
+			port = self.port
+		))
+		if len(self.messages):
+			status['messages'] = list(self.messages)
+			self.messages = []
+		return status
+
+
+	# QUERY
+	def query(self, q):
+		"""Answer 'ping', 'status', and 'handlers' queries."""
+		q = q.strip()
+		if q == 'ping':
+			return dict(query=q, reply='pong')
+		elif q == 'status':
+			return dict(query=q, reply=self.status())
+		elif q == 'handlers':
+			return dict(query=q, reply=[{
+					"addr"     : h.addr,
+					"peer"     : h.peer,
+					"maxidle"  : h.maxidle,
+					"lastrecv" : h.lastrecv,
+					"countdown": h.countdown
+				} for h in self.handlers])
+
+
+	#
+	# GET HANDLER TYPE
+	#
+	def _gethandlertype(self):
+		"""Utility for extracting the Handler type from config."""
+		c = self.config
+		x = c.get('nhandler')
+		if x:
+			return trix.nvalue(x)
+
+		x = c.get('handler', AIO_HANDLER)
+		try:
+			return trix.value(x)
+		except:
+			if not type(x) == type:
+				raise ValueError ("err-handler-type", xdata(
+					handler_type=type(x), require1=['str','type']
+				))
+			return x
+
+
+	# ACCEPT
+	async def __accept(self, reader, writer):
+		#
+		# Called by asyncio for each new connection; the handler's
+		# `handle` coroutine runs until the connection closes.
+		#
+		h = self.__handler(reader, writer, **self.handlerk)
+		self.addHandler(h)
+		try:
+			await h.handle()
+		except BaseException as ex:
+			self.messages.append([
+				"handler-err", h, type(ex), ex.args, xdata()
+			])
+		finally:
+			self.removeHandler(h)
+
+
+
+
+#
+# CONNECT
+#
+class Connect(sockurl, EncodingHelper):
+	"""
+	Asyncio client connection. Create, then await `connect()` before
+	reading or writing.
+
+	>>> c = await trix.ncreate("net.aio.Connect", 9999).connect()
+	>>> await c.writeline("Test")
+	>>> await c.readline()
+	"""
+
+	def __init__(self, config=None, **k):
+		"""
+		Pass socket connection params as given to `net.connect.Connect`,
+		plus buflen (int) and optional encoding and errors parameters.
+		"""
+		sockurl.__init__(self, config, **k)
+
+		# make sure connection has a host
+		if not self.config.get('host'):
+			self.config['host'] = AIO_HOST
+			self.url['host'] = AIO_HOST
+
+		self.config.setdefault('encoding', DEF_ENCODE)
+		EncodingHelper.__init__(self, self.config)
+
+		self.__buflen = self.config.get('buflen', AIO_BUFFER)
+		self.__newl = self.config.get('newl', DEF_NEWL)
+		self.__lineq = LineQueue(**self.config)
+		self.__reader = None
+		self.__writer = None
+
+
+	@property
+	def buflen(self):
+		"""Read buffer length. Default: AIO_BUFFER (4096)"""
+		return self.__buflen
+
+	@property
+	def newl(self):
+		"""New-line character set; Eg, '\n', '\r', '\r\n'."""
+		return self.__newl
+
+	@property
+	def lineq(self):
+		"""LineQueue used by `readline`."""
+		return self.__lineq
+
+	@property
+	def connected(self):
+		"""True once connected, until closed."""
+		return bool(self.__writer) and not self.__writer.is_closing()
+
+	@property
+	def addr(self):
+		"""Returns local address as tupel (addr,port)."""
+		return self.__writer.get_extra_info('sockname')
+
+	@property
+	def peer(self):
+		"""Returns remote address as tupel (addr,port)."""
+		return self.__writer.get_extra_info('peername')
+
+
+	# CONNECT
+	async def connect(self):
+		"""Open the connection; returns self."""
+		c = self.config
+		try:
+			self.__reader, self.__writer = await asyncio.wait_for(
+					asyncio.open_connection(c['host'], c.get('port')),
+					self.ctimeout
+				)
+		except Exception as ex:
+			raise type(ex)(ex.args, xdata(error="err-connect-fail",
+					config=self.config
+				))
+		return self
+
+
+	# CONTEXT
+	async def __aenter__(self):
+		if not self.__writer:
+			await self.connect()
+		return self
+
+	async def __aexit__(self, *a):
+		await self.close()
+
+
+	# RECV
+	async def recv(self, buflen=None):
+		"""Return received bytes; b'' at eof."""
+		return await self.__reader.read(buflen or self.buflen)
+
+	# READ
+	async def read(self, sz=None, **k):
+		"""Receive, decode, and return text."""
+		return self.decode(await self.recv(sz))
+
+	# READLINE
+	async def readline(self):
+		"""Return the next complete line, or None at eof."""
+		line = self.__lineq.readline()
+		while line is None:
+			data = await self.recv()
+			if not data:
+				return None
+			self.__lineq.feed(data)
+			line = self.__lineq.readline()
+		return line
+
+	# SEND
+	async def send(self, data):
+		"""Send `data` bytes; waits until the transport drains."""
+		self.__writer.write(data)
+		await self.__writer.drain()
+
+	# WRITE
+	async def write(self, text, **k):
+		"""Encode text to bytes and send."""
+		await self.send(text.encode(**self.extractEncoding(k)))
+
+	# WRITELINE
+	async def writeline(self, text, **k):
+		"""Write text, appending `self.newl` line ending."""
+		await self.write("%s%s" % (text, self.newl), **k)
+
+
+	# CLOSE
+	async def close(self):
+		"""Close the connection."""
+		if self.__writer:
+			try:
+				self.__writer.close()
+				await self.__writer.wait_closed()
+			except Exception:
+				pass
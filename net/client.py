@@ -165,8 +165,9 @@ class Client(Runner):
 	def remove(self, rmvlist):
 		"""
 		Remove any connections with `connid` matching an item in rmvlist.
-		Connection `shutdown()` method is called, then deleted from the
-		list. Any exceptions are ignored.
+		Any timer set to call the connection is cancelled, its `shutdown()`
+		method is called, then it's deleted from the list. Any exceptions
+		are ignored.
 		
 		When the list is empty, this Client will stop running unless the
 		`self.keepalive` property is True.
@@ -174,6 +175,12 @@ class Client(Runner):
 		for cname in rmvlist:
 			conn = self.__connections.get(cname)
 			if conn:
+				# stop any timer driving the connection (eg, pi_timer)
+				timer = getattr(conn, 'pi_timer', None)
+				if timer:
+					timer.cancel()
+					conn.pi_timer = None
+				
 				try:
 					conn.shutdown()
 				except:
@@ -30,6 +30,13 @@ class Handler(sockwrap):
 		"""
 		k.setdefault('buflen', HANDLER_BUFFER)
 		
+		#
+		# Sent data is buffered; the Server flushes it when the socket
+		# is writable, and stops reading from the peer while more than
+		# `highwater` bytes are waiting.
+		#
+		k.setdefault('wbuffer', True)
+		
 		# 
 		# INIT
 		#  - Receives a socket as produced by sockserv. DOES NOT store
@@ -51,6 +58,11 @@ class Handler(sockwrap):
 		# handler setup
 		self.__maxidle = k.get('maxidle', HANDLER_MAXIDLE)
 		self.__lastrecv = time.time()
+		self.__eof = False
+		
+		# handledata() calls, and their total time - kept by the Server
+		self.handled = 0
+		self.handletime = 0.0
 	
 	
 	@property
@@ -68,19 +80,22 @@ class Handler(sockwrap):
 		"""Time left until server shuts down this handler."""
 		return self.maxidle - (time.time() - self.lastrecv)
 	
+	@property
+	def eof(self):
+		"""True after the peer has closed its end of the connection."""
+		return self.__eof
+	
 	
 	# HANDLE
 	def handle(self):
 		"""
 		Receive and handle data. Default action is to 'echo'.
 		"""
+		data = None
 		try:
-			data = self.socket.recv(self.buflen)
+			data = self.receive()
 			if data:
-				self.__lastrecv = time.time() # update for timeout
 				self.handledata(data)
-		except socket.timeout as ex:
-			pass # Ignore Timeout
 		except BaseException as ex:
 			trix.log("Handler.handle FAIL!", 
 				data=data, ex=type(ex).__name__, xargs=ex.args
@@ -88,6 +103,30 @@ class Handler(sockwrap):
 			raise
 	
 	
+	# RECEIVE
+	def receive(self):
+		"""
+		Receive and return data from the socket, or None if there's none
+		waiting (or if the peer has closed the connection - see `eof`).
+		"""
+		try:
+			data = self.socket.recv(self.buflen)
+		except socket.timeout as ex:
+			return None # Ignore Timeout
+		
+		if data:
+			self.__lastrecv = time.time() # update for timeout
+			self.bytesin += len(data)
+			return data
+		
+		#
+		# A zero-length recv (as opposed to socket.timeout) means the
+		# peer closed the connection.
+		#
+		self.__eof = True
+		return None
+	
+	
 	# HANDLE DATA
 	def handledata(self, data):
 		"""
@@ -97,5 +136,5 @@ class Handler(sockwrap):
 		meaningful functionality (unless what you want is an echo server).
 		"""
 		if data:
-			self.socket.send(data)
+			self.send(data)
 
@@ -5,9 +5,41 @@
 #
 
 from time import gmtime, strftime
-from ....util import urlinfo, mime
+from ....util import urlinfo, compenc
 from ....net.handler import *
 from ....net.httpreq import *
+from email.utils import parsedate_tz, mktime_tz
+from .cache import *
+import os, copy
+
+
+HTTP_COMPRESSMIN = 256
+
+#
+# COMPRESSION
+#  - Content codings HandleHttp can apply, in order of preference, and 
+#    the mime types worth compressing.
+#
+HTTP_ENCODERS = [
+	('gzip', compenc.gzip.compress), 
+	('deflate', compenc.zlib.compress)
+]
+HTTP_COMPRESSIBLE = [
+	'text/', 'application/json', 'application/javascript', 
+	'application/xml', 'application/xhtml+xml', 'image/svg+xml', 
+	'application/x-javascript', 'application/rss+xml'
+]
+
+HTTP_REASON = {
+	'200' : "OK",
+	'206' : "Partial Content",
+	'304' : "Not Modified",
+	'400' : "Bad Request",
+	'404' : "Not Found",
+	'413' : "Content Too Large",
+	'416' : "Range Not Satisfiable",
+	'500' : "Internal Server Error"
+}
 
 
 #
@@ -21,6 +53,16 @@ class HandleHttp(Handler):
 	
 	WebContent = "net/handler/hhttp/example/"
 	
+	#
+	# FILE CACHE
+	#  - HandleHttp handlers given the same cache kwargs (cacheitems,
+	#    cachebytes, cachefile) share one FileCache, created when first
+	#    needed. Pass handler kwarg cache=False to disable caching, or 
+	#    cache=<FileCache> to give a Server's handlers a cache of their
+	#    own.
+	#
+	Caches = {}
+	
 	# INIT
 	def __init__(self, sock, **k):
 		
@@ -39,6 +81,59 @@ class HandleHttp(Handler):
 		# configurable header items
 		self.Server = k.get("Server", "trix/%s" % str(VERSION))
 		self.Connection = k.get("Connection", "keep-alive")
+		
+		self.contentType = "text/html"
+		
+		#
+		# REQUEST PARSER
+		#  - Received bytes accumulate here until each request (and its
+		#    body) is complete; pipelined requests are answered in order.
+		#
+		self.requests = httpparser(
+				k.get('maxhead', HTTP_MAXHEAD), k.get('maxbody', HTTP_MAXBODY)
+			)
+		self.request = None
+		self.replying = False
+		self.closing = False
+		self.lastModified = None
+		
+		# static content cache
+		self.cache = self.filecache(**k)
+		
+		#
+		# COMPRESSION
+		#  - Negotiated by Accept-Encoding. Precompressed "file.gz" 
+		#    sidecars are served when present and current; otherwise,
+		#    compressible cached content is compressed once per file
+		#    version. Pass compress=False to send identity bodies only.
+		#
+		self.compress = k.get('compress', True)
+		self.compressmin = k.get('compressmin', HTTP_COMPRESSMIN)
+	
+	
+	#
+	# FILE CACHE
+	#
+	@classmethod
+	def filecache(cls, **k):
+		"""
+		Return the FileCache for handler kwargs `k` - the one given as 
+		`cache`, or the one shared by handlers with the same cache 
+		kwargs - or None if `cache` is False.
+		"""
+		cache = k.get('cache', True)
+		if isinstance(cache, FileCache):
+			return cache
+		elif not cache:
+			return None
+		
+		key = tuple([
+				k.get(x) for x in ('cacheitems', 'cachebytes', 'cachefile')
+			])
+		try:
+			return HandleHttp.Caches[key]
+		except KeyError:
+			return HandleHttp.Caches.setdefault(key, FileCache(**k))
 	
 	
 	
@@ -47,11 +142,43 @@ class HandleHttp(Handler):
 	#
 	def handledata(self, data, **k):
 		"""
-		Received a request; process and return reply.
+		Received data; reply to each request it completes.
+		"""
+		if self.closing:
+			return
+		
+		self.requests.feed(data)
+		try:
+			for request in self.requests:
+				self.closing = not request.keepalive
+				self.handlerequest(request)
+				if self.closing:
+					break
+		except HttpError as ex:
+			self.closing = True
+			self.writeError(ex.status, xdata())
+		
+		#
+		# Once the last reply is sent on a non-persistent connection, 
+		# close the sending side. The peer then closes, and the server 
+		# removes this handler.
+		#
+		if self.closing:
+			self.finish()
+	
+	
+	#
+	# HANDLE REQUEST
+	#
+	def handlerequest(self, request):
+		"""
+		Process one complete request and write the reply.
 		"""
 		try:
 			#1 Parse Headers
-			self.request = httpreq(data)
+			self.request = request
+			self.replying = False
+			self.lastModified = None
 			
 			#2 Parse URL
 			self.uinfo = urlinfo.urlinfo(self.request.reqpath)
@@ -67,44 +194,286 @@ class HandleHttp(Handler):
 			if self.reqpath.isdir():
 				reqpath = self.reqpath.merge('index.html')
 			
-			#4 Check mime type
-			self.contentType = mime.Mime(reqpath).mimetype
+			#3 Requests must resolve to a file within the webroot
+			info = self.fileinfo(reqpath) if self.inroot(reqpath) else None
+			if not info:
+				self.writeError('404')
+				return
 			
-			#5 Load File Content
-			content = trix.path(reqpath).reader(encoding="utf_8").read()
+			#4 Mime type and modification date (from the cache)
+			self.contentType = info.mimetype
+			self.lastModified = info.lastmod
 			
-			#6 Generate Headers
-			clength = len(content.encode('utf_8'))
+			#5 Select a content-coding
+			info, encoding = self.encoded(info)
 			
-			#7 Write the response header and
-			gmt = strftime("%a, %d %b %Y %H:%M:%S +0000", gmtime())
-			head = self.head('200', clength)
+			#6 Let the client use its copy, if it's current
+			if self.notmodified(info):
+				self.write(self.head('304', info.size, [
+						"ETag: %s" % info.etag
+					] + self.varyheaders(encoding)) + "\r\n\r\n")
+				return
 			
-			#8 Send End Bytes
-			self.write(head + "\r\n\r\n" + content + "\r\n\r\n")
+			#7 Send headers and file content
+			self.sendfile(info, encoding)
 			
-		except BaseException as ex:
-			#print (ex, xdata())
-			self.writeError("500", xdata())
+		except BaseException:
+			#
+			# Once a reply's head is sent, an error page can't follow it;
+			# drop the connection so the client sees the reply is short.
+			#
+			if self.replying:
+				self.closing = True
+				try:
+					self.socket.shutdown(socket.SHUT_RDWR)
+				except Exception:
+					pass
+			else:
+				self.writeError("500", xdata())
 			raise
 	
 	
+	#
+	# IN-ROOT - Keep requests within webroot.
+	#
+	def inroot(self, path):
+		"""True if `path` is the webroot or is within it."""
+		root = self.webroot.path
+		path = os.path.abspath(path)
+		return (path == root) or path.startswith(root.rstrip(os.sep)+os.sep)
+	
+	
+	#
+	# FILE-INFO
+	#
+	def fileinfo(self, path):
+		"""
+		Return a `fileinfo` object for the file at `path` - from the
+		cache, if enabled - or None if there's no such file.
+		"""
+		if self.cache is not None:
+			return self.cache.get(path)
+		try:
+			if os.path.isfile(path):
+				return fileinfo(path, os.stat(path))
+		except OSError:
+			pass
+	
+	
+	#
+	# ENCODED
+	#
+	def encoded(self, info):
+		"""
+		Return a tuple: the `fileinfo` to send for `info`, and its 
+		content-coding (or None, for identity).
+		"""
+		if not self.compress or self.request.header('Range'):
+			return (info, None)
+		
+		accepted = self.acceptencoding()
+		if not accepted:
+			return (info, None)
+		
+		# precompressed sidecar
+		if 'gzip' in accepted:
+			gz = self.fileinfo(info.path + '.gz')
+			if gz and (gz.mtime >= info.mtime):
+				gz = copy.copy(gz)
+				gz.mimetype = info.mimetype
+				return (gz, 'gzip')
+		
+		# compress cached content, once per file version
+		if (self.cache is not None) and (info.data is not None) and (
+				info.size >= self.compressmin
+			) and self.compressible(info.mimetype):
+			coding = accepted[0]
+			v = self.cache.encoded(info, coding, dict(HTTP_ENCODERS)[coding])
+			if v.size < info.size:
+				return (v, coding)
+		
+		return (info, None)
+	
+	
+	#
+	# ACCEPT-ENCODING
+	#
+	def acceptencoding(self):
+		"""
+		Return the names of HTTP_ENCODERS codings the request's
+		Accept-Encoding header allows, best first.
+		"""
+		q = {}
+		for item in (self.request.header('Accept-Encoding') or '').split(','):
+			parts = item.strip().lower().split(';')
+			try:
+				qv = float(parts[1].split('=')[1]) if len(parts) > 1 else 1.0
+			except (IndexError, ValueError):
+				qv = 0.0
+			q[parts[0].strip()] = qv
+		
+		r = []
+		for coding, encoder in HTTP_ENCODERS:
+			qv = q.get(coding, q.get('*', 0.0))
+			if qv > 0:
+				r.append((qv, -len(r), coding))
+		return [x[2] for x in sorted(r, reverse=True)]
+	
+	
+	#
+	# COMPRESSIBLE
+	#
+	def compressible(self, mimetype):
+		"""True if content of `mimetype` is worth compressing."""
+		mimetype = (mimetype or '').lower()
+		for m in HTTP_COMPRESSIBLE:
+			if mimetype.startswith(m):
+				return True
+		return False
+	
+	
+	#
+	# VARY HEADERS
+	#
+	def varyheaders(self, encoding):
+		"""Content-Encoding and Vary header lines for a reply."""
+		h = []
+		if encoding:
+			h.append("Content-Encoding: %s" % encoding)
+		if self.compress:
+			h.append("Vary: Accept-Encoding")
+		return h
+	
+	
+	#
+	# NOT MODIFIED
+	#
+	def notmodified(self, info):
+		"""
+		True if the request's If-None-Match or If-Modified-Since header
+		shows that the client's copy of `info` is current.
+		"""
+		inm = self.request.header('If-None-Match')
+		if inm:
+			tags = [t.strip() for t in inm.split(',')]
+			return ('*' in tags) or (info.etag in tags) or (
+					('W/' + info.etag) in tags
+				)
+		
+		ims = self.request.header('If-Modified-Since')
+		if ims:
+			try:
+				return int(info.mtime) <= mktime_tz(parsedate_tz(ims))
+			except (TypeError, ValueError, OverflowError):
+				pass
+		return False
+	
+	
+	#
+	# SEND-FILE
+	#
+	def sendfile(self, info, encoding=None):
+		"""
+		Send the response head for `fileinfo` object `info`, then the
+		file content. Cached content is sent from memory; otherwise the
+		file is queued to be sent as the socket becomes writable (by the
+		zero-copy `os.sendfile()`, where available). A single-range
+		"Range" request header is honored with a 206 response.
+		
+		If `info` holds content encoded by a content-coding, pass the
+		coding's name as `encoding`.
+		"""
+		size = info.size
+		offset, count = 0, size
+		
+		result = '200'
+		headers = ["ETag: %s" % info.etag] + self.varyheaders(encoding)
+		rng = self.range(self.request.header('Range'), size)
+		if rng == False:
+			headers.append("Content-Range: bytes */%i" % size)
+			self.write(self.head('416', 0, headers) + "\r\n\r\n")
+			return
+		elif rng:
+			offset, count = rng[0], rng[1]-rng[0]+1
+			result = '206'
+			headers.append("Content-Range: bytes %i-%i/%i" % (
+					rng[0], rng[1], size
+				))
+		
+		# open an uncached file before anything's sent
+		f = None
+		if count and (self.request.method != 'HEAD') and (info.data is None):
+			f = open(info.path, 'rb')
+		
+		self.replying = True
+		try:
+			self.write(self.head(result, count, headers) + "\r\n\r\n")
+		except BaseException:
+			if f:
+				f.close()
+			raise
+		
+		if f:
+			# sent after any buffered data, without blocking the server
+			self.queuefile(f, offset, count)
+		
+		elif count and (self.request.method != 'HEAD'):
+			# cached content is buffered without copying
+			self.send(memoryview(info.data)[offset:offset+count])
+	
+	
+	#
+	# RANGE - Parse the Range header.
+	#
+	def range(self, header, size):
+		"""
+		Return an inclusive (first, last) byte-position tuple for a
+		single-range "bytes=" `header`, None if the whole file should be
+		sent, or False if the range can't be satisfied.
+		"""
+		if not header:
+			return None
+		try:
+			unit, spec = header.split("=", 1)
+			if (unit.strip() != 'bytes') or (',' in spec):
+				return None # only single byte-ranges are supported
+			first, last = [x.strip() for x in spec.split('-', 1)]
+			if not first:
+				# suffix range, eg "bytes=-500"
+				n = int(last)
+				if n <= 0:
+					return False
+				return (max(0, size-n), size-1) if size else False
+			first = int(first)
+			last = min(int(last), size-1) if last else size-1
+		except ValueError:
+			return None
+		
+		if (first >= size) or (last < first):
+			return False
+		return (first, last)
+	
+	
 	#
 	# HEAD - Generate head text.
 	#
-	def head(self, result, clength):
-		"""Return the head for the response."""
+	def head(self, result, clength, headers=None):
+		"""
+		Return the head for the response. Optional `headers` is a list
+		of additional header lines.
+		"""
 		gmt = strftime("%a, %d %b %Y %H:%M:%S +0000", gmtime())
 		head = "\r\n".join([
-			"HTTP/1.1 %s OK"     % result, 
+			"HTTP/1.1 %s %s"     % (result, HTTP_REASON.get(result, 'OK')),
 			"Date: %s"           % (gmt),
-			"Connection: %s"     % (self.Connection),
+			"Connection: %s"     % ('close' if self.closing else \
+			                        self.Connection),
 			"Server: %s"         % (self.Server),
 			"Accept-Ranges: bytes",
 			"Content-Type: %s"   % self.contentType,
 			"Content-Length: %i" % (clength),
-			"Last-Modified: %s"  % (gmt) # this should be the file mod date
-		])
+			"Last-Modified: %s"  % (self.lastModified or gmt)
+		] + list(headers or []))
 		return head
 	
 	
@@ -126,6 +495,10 @@ class HandleHttp(Handler):
 			
 			if errcode == '404':
 				w.write("<h1>404 File Not Found Error</h1>\r\n")
+			elif errcode == '400':
+				w.write("<h1>400 Bad Request</h1>\r\n")
+			elif errcode == '413':
+				w.write("<h1>413 Content Too Large</h1>\r\n")
 			else:
 				w.write("<h1>500 Internal Server Error</h1>\r\n")
 			w.write("<pre>\r\n")			
@@ -140,8 +513,9 @@ class HandleHttp(Handler):
 			w.write("</pre>\r\n</body></html>\r\n\r\n")
 			
 			# SEND the error page.
+			self.contentType = "text/html; charset=utf-8"
 			head = self.head(errcode, w.tell())
-			self.write("%s\r\n\r\n" % (head.encode('utf_8')))
+			self.write("%s\r\n\r\n" % (head))
 			
 			# read the response from the Buffer, b
 			self.write(b.read())
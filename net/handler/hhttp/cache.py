@@ -0,0 +1,205 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under
+# the terms of the GNU Affero General Public License.
+#
+
+from .... import *
+from ....util import mime
+from email.utils import formatdate
+from collections import OrderedDict
+import os, copy
+
+
+CACHE_ITEMS = 256         # max number of cached files
+CACHE_BYTES = 2**26       # max total bytes of cached content (64M)
+CACHE_FILEMAX = 2**20     # larger files are sent from disk (1M)
+
+
+#
+# FILE-INFO
+#
+class fileinfo(object):
+	"""
+	Stat results, mime type, strong ETag, and (for small files) the
+	content of one file.
+	"""
+	
+	def __init__(self, path, st, data=None):
+		"""Pass resolved `path`, its `os.stat` result, and any `data`."""
+		self.path = path
+		self.size = st.st_size
+		self.mtime = st.st_mtime
+		self.mtime_ns = st.st_mtime_ns
+		self.data = data
+		self.mimetype = mime.Mime(path).mimetype or \
+			"application/octet-stream"
+		self.etag = '"%x-%x"' % (self.size, self.mtime_ns)
+		self.lastmod = formatdate(self.mtime, usegmt=True)
+		self.variants = {}
+	
+	@property
+	def nbytes(self):
+		"""Bytes held by this item's data and its encoded variants."""
+		return len(self.data or b'') + sum(
+				[len(v.data) for v in self.variants.values()]
+			)
+	
+	def variant(self, encoding, data):
+		"""
+		Return a copy of this item holding `data`, the content encoded by
+		`encoding` (eg, 'gzip'), with its own ETag.
+		"""
+		v = copy.copy(self)
+		v.data = data
+		v.size = len(data)
+		v.variants = {}
+		v.etag = '%s-%s"' % (self.etag[:-1], encoding)
+		return v
+	
+	def current(self, st):
+		"""True if `st` (a fresh `os.stat` result) matches this item."""
+		return (st.st_size == self.size) and (st.st_mtime_ns==self.mtime_ns)
+
+
+
+
+#
+# FILE-CACHE
+#
+class FileCache(object):
+	"""
+	Bounded LRU cache of `fileinfo` objects keyed by resolved path.
+	Each lookup stats the file, so changed files are reloaded.
+	"""
+	
+	def __init__(self, **k):
+		"""
+		Optional kwargs:
+		 - cacheitems: max number of cached files (CACHE_ITEMS)
+		 - cachebytes: max total bytes of content held (CACHE_BYTES)
+		 - cachefile : files larger than this are not held (CACHE_FILEMAX)
+		"""
+		self.__maxitems = k.get('cacheitems', CACHE_ITEMS)
+		self.__maxbytes = k.get('cachebytes', CACHE_BYTES)
+		self.__filemax = k.get('cachefile', CACHE_FILEMAX)
+		self.__items = OrderedDict()
+		self.__bytes = 0
+		self.__lock = thread.allocate_lock()
+		self.hits = 0
+		self.misses = 0
+	
+	
+	@property
+	def bytes(self):
+		"""Total bytes of content currently held."""
+		return self.__bytes
+	
+	def __len__(self):
+		return len(self.__items)
+	
+	
+	def status(self):
+		"""Return a status dict."""
+		return dict(
+			items=len(self.__items), bytes=self.__bytes, hits=self.hits,
+			misses=self.misses, maxitems=self.__maxitems,
+			maxbytes=self.__maxbytes, filemax=self.__filemax
+		)
+	
+	
+	#
+	# GET
+	#
+	def get(self, path):
+		"""
+		Return a current `fileinfo` for the file at `path`, or None if
+		there's no such file.
+		"""
+		try:
+			st = os.stat(path)
+		except OSError:
+			self.discard(path)
+			return None
+		
+		if not os.path.isfile(path):
+			return None
+		
+		with self.__lock:
+			item = self.__items.get(path)
+			if item and item.current(st):
+				self.__items.move_to_end(path)
+				self.hits += 1
+				return item
+			self.misses += 1
+		
+		# load (outside the lock) and store
+		data = None
+		if st.st_size <= self.__filemax:
+			with open(path, 'rb') as f:
+				data = f.read()
+		item = fileinfo(path, st, data)
+		self.put(item)
+		return item
+	
+	
+	#
+	# PUT
+	#
+	def put(self, item):
+		"""Store `item`, evicting least-recently-used items as needed."""
+		with self.__lock:
+			self.__remove(item.path)
+			self.__items[item.path] = item
+			self.__bytes += item.nbytes
+			self.__evict()
+	
+	
+	#
+	# ENCODED
+	#
+	def encoded(self, item, encoding, encoder):
+		"""
+		Return the `encoding` variant of cached `item`, calling function
+		`encoder` with the item's data to create it if it doesn't yet 
+		exist. Variants are kept with the item, so they're discarded 
+		when the file changes.
+		"""
+		with self.__lock:
+			v = item.variants.get(encoding)
+			if v:
+				return v
+		
+		v = item.variant(encoding, encoder(item.data))
+		
+		with self.__lock:
+			# another thread may have made it meanwhile
+			if encoding in item.variants:
+				return item.variants[encoding]
+			if self.__items.get(item.path) is item:
+				item.variants[encoding] = v
+				self.__bytes += v.size
+				self.__evict()
+		return v
+	
+	
+	#
+	# DISCARD
+	#
+	def discard(self, path):
+		"""Remove any item cached for `path`."""
+		with self.__lock:
+			self.__remove(path)
+	
+	
+	def __remove(self, path):
+		old = self.__items.pop(path, None)
+		if old:
+			self.__bytes -= old.nbytes
+	
+	def __evict(self):
+		while (len(self.__items) > self.__maxitems) or (
+				self.__bytes > self.__maxbytes
+			):
+			path, old = self.__items.popitem(last=False)
+			self.__bytes -= old.nbytes
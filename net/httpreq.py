@@ -4,6 +4,24 @@
 # the terms of the GNU Affero General Public License.
 #
 
+from .. import *
+import re
+
+
+HTTP_MAXHEAD = 65536
+HTTP_MAXBODY = 2**24  # 16M
+
+
+#
+# ERRORS
+#  - Each has the HTTP status a server should reply with.
+#
+class HttpError(ValueError):
+	status = '400'
+
+class HttpTooLarge(HttpError):
+	status = '413'
+
 
 #
 # HTTP (REQUEST PARSER)
@@ -11,9 +29,13 @@
 class httpreq(object):
 	"""Simple HTTP request parser."""
 	
-	def __init__(self, requestBytes):
-		"""Receives requestBytes; loads properties with values."""
+	def __init__(self, requestBytes, body=b''):
+		"""
+		Receives requestBytes; loads properties with values. The request
+		body, if any, may be passed separately as `body` bytes.
+		"""
 		self.__bytes = requestBytes
+		self.__body = body
 		self.__text = requestBytes.decode('utf_8')
 		
 		# array of request lines
@@ -78,3 +100,201 @@ class httpreq(object):
 	def headers(self):
 		return self.__headers	
 	
+	@property
+	def body(self):
+		return self.__body
+	
+	def header(self, name, default=None):
+		"""Return the value of header `name`, ignoring case."""
+		try:
+			return self.__headers[name]
+		except KeyError:
+			name = name.lower()
+			for k in self.__headers:
+				if k.lower() == name:
+					return self.__headers[k]
+			return default
+	
+	@property
+	def keepalive(self):
+		"""
+		True if the connection should persist after this request; HTTP
+		1.1 defaults to persistent connections, earlier versions don't.
+		"""
+		c = (self.header('Connection') or '').lower()
+		if self.version == 'HTTP/1.1':
+			return c != 'close'
+		return c == 'keep-alive'
+
+
+
+
+#
+# HTTP REQUEST PARSER (INCREMENTAL)
+#
+class httpparser(object):
+	"""
+	Accumulates bytes received on one connection and splits them into
+	complete `httpreq` objects, in order. Request bodies are read by
+	Content-Length or "chunked" Transfer-Encoding.
+	
+	>>> p = httpparser()
+	>>> p.feed(b"GET / HTTP/1.1\r\nHost: x\r\n\r\nGET /a HTTP/1.1\r\n")
+	>>> [r.reqpath for r in p]
+	>>> p.feed(b"Host: x\r\n\r\n")
+	>>> p.readrequest().reqpath
+	"""
+	
+	def __init__(self, maxhead=HTTP_MAXHEAD, maxbody=HTTP_MAXBODY):
+		"""
+		Optional `maxhead` and `maxbody` limit the size of request heads
+		and of request bodies (HttpTooLarge is raised). Chunk-size lines
+		and chunked trailers are limited by `maxhead`, too.
+		"""
+		self.__maxhead = maxhead
+		self.__maxbody = maxbody
+		self.__buf = bytearray()
+		self.__reset()
+	
+	def __iter__(self):
+		"""Iterate complete requests; stops when more data is needed."""
+		r = self.readrequest()
+		while r:
+			yield r
+			r = self.readrequest()
+	
+	def __reset(self):
+		self.__head = None
+		self.__req = None
+		self.__need = None   # body byte count (or chunk size + CRLF)
+		self.__chunked = False
+		self.__trailer = False
+		self.__tlen = 0      # trailer byte count
+		self.__body = bytearray()
+	
+	@property
+	def pending(self):
+		"""Count of bytes received but not yet returned as requests."""
+		return len(self.__buf)
+	
+	
+	# FEED
+	def feed(self, data):
+		"""Append received `data` bytes."""
+		if data:
+			self.__buf.extend(data)
+	
+	
+	# READ REQUEST
+	def readrequest(self):
+		"""
+		Return the next complete `httpreq`, or None if more data is 
+		needed. Raises HttpError on a malformed request, or HttpTooLarge
+		if its body is larger than `maxbody`.
+		"""
+		buf = self.__buf
+		
+		# HEAD
+		if self.__req is None:
+			i = buf.find(b"\r\n\r\n")
+			if i < 0:
+				if len(buf) > self.__maxhead:
+					raise HttpError("err-http-head", xdata(
+							reason="head-too-large", maxhead=self.__maxhead
+						))
+				return None
+			
+			self.__head = bytes(buf[:i+4])
+			del buf[:i+4]
+			try:
+				self.__req = req = httpreq(self.__head)
+			except Exception as ex:
+				self.__reset()
+				raise HttpError("err-http-head", xdata(
+						reason="malformed-head", python=str(ex)
+					))
+			
+			te = (req.header('Transfer-Encoding') or '').lower()
+			if 'chunked' in te:
+				self.__chunked = True
+			else:
+				cl = (req.header('Content-Length') or '0').strip()
+				if not re.match('[0-9]+$', cl):
+					self.__reset()
+					raise HttpError("err-http-head", xdata(
+							reason="bad-content-length", length=cl
+						))
+				self.__need = int(cl)
+				if self.__need > self.__maxbody:
+					self.__reset()
+					raise HttpTooLarge("err-http-body", xdata(
+							reason="body-too-large", maxbody=self.__maxbody
+						))
+		
+		# BODY - CONTENT-LENGTH
+		if not self.__chunked:
+			if len(buf) < self.__need:
+				return None
+			self.__body = bytes(buf[:self.__need])
+			del buf[:self.__need]
+			return self.__complete()
+		
+		# BODY - CHUNKED
+		while True:
+			if self.__need is None:
+				# chunk-size line (or trailer line, after the last chunk)
+				i = buf.find(b"\r\n")
+				if i < 0:
+					if len(buf) > self.__maxhead:
+						self.__reset()
+						raise HttpError("err-http-body", xdata(
+								reason="chunk-line-too-large", maxhead=self.__maxhead
+							))
+					return None
+				line = bytes(buf[:i])
+				del buf[:i+2]
+				if self.__trailer:
+					if not line:
+						self.__body = bytes(self.__body)
+						return self.__complete()
+					self.__tlen += i + 2
+					if self.__tlen > self.__maxhead:
+						self.__reset()
+						raise HttpError("err-http-body", xdata(
+								reason="trailer-too-large", maxhead=self.__maxhead
+							))
+					continue
+				size = line.split(b';')[0].strip()
+				if not re.match(b'[0-9A-Fa-f]+$', size):
+					self.__reset()
+					raise HttpError("err-http-body", xdata(
+							reason="bad-chunk-size"
+						))
+				size = int(size, 16)
+				if len(self.__body) + size > self.__maxbody:
+					self.__reset()
+					raise HttpTooLarge("err-http-body", xdata(
+							reason="body-too-large", maxbody=self.__maxbody
+						))
+				if size:
+					self.__need = size + 2 # chunk data plus CRLF
+				else:
+					self.__trailer = True
+			else:
+				if len(buf) < self.__need:
+					return None
+				if buf[self.__need-2:self.__need] != b"\r\n":
+					self.__reset()
+					raise HttpError("err-http-body", xdata(
+							reason="bad-chunk-end"
+						))
+				self.__body.extend(buf[:self.__need-2])
+				del buf[:self.__need]
+				self.__need = None
+	
+	
+	def __complete(self):
+		req = httpreq(self.__head, self.__body)
+		self.__reset()
+		return req
+	
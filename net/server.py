@@ -7,6 +7,9 @@
 from ..util.sock.sockserv import *
 from ..util.runner import Runner
 from .handler import Handler
+import selectors, functools
+from concurrent import futures
+from collections import deque
 
 SERVER_SLEEP = 0.1
 SERVER_HANDLER = trix.innerpath('net.handler.Handler')
@@ -31,6 +34,13 @@ class Server(sockserv, Runner):
 		 - handler : A type or type desc. Eg, "trix.net.handler.Handler"
 		 - nhandler: String spec, inner path. Eg, "net.handler.Handler"
 		 - reuse   : True
+		 - selector: True to wait for socket events (see `Runner.register`)
+		             rather than sleep-polling every handler.
+		 - workers : Pre-fork mode; launch this many worker processes,
+		             each listening on the same port (SO_REUSEPORT). The
+		             handler must then be given as a string.
+		 - handler_pool: Run `handledata()` on a pool of this many
+		             threads so slow handlers don't stall the io loop.
 		 
 		 # Handler params
 		 - maxidle : timeout for idle handler connections. default: 5m
@@ -61,9 +71,11 @@ class Server(sockserv, Runner):
 		try:
 			config.setdefault('backlog', socket.SOMAXCONN)
 			config.setdefault('reuse', True)
+			self.__prefork(config)
 		except AttributeError:
 			k.setdefault('backlog', socket.SOMAXCONN)
 			k.setdefault('reuse', True)
+			self.__prefork(k)
 		
 		#
 		# SOCKSERV INIT
@@ -119,6 +131,47 @@ class Server(sockserv, Runner):
 		self.__handlers = []
 		self.__remove = []
 		
+		#
+		# IDLE TIMERS
+		#  - Each handler has a timer (see `Runner.timers`) set for when
+		#    it'd be idle past `maxidle`. When it fires, the handler is
+		#    dropped unless data's been received since; If so, the timer
+		#    is reset to the handler's new deadline.
+		#
+		self.__idle = {}
+		
+		#
+		# SELECTOR
+		#  - In selector mode, the listening socket and each handler's 
+		#    socket are registered with the Runner, whose loop waits 
+		#    until one is ready (or a timer is due) instead of sleeping.
+		#    Handlers ready in a pass are removed by the next `io()`.
+		#
+		self.__selected = bool(self.config.get('selector'))
+		self.__selfds = {}
+		self.__selev = {}
+		self.__flushq = deque() # appended by pool threads
+		self.__sremove = []
+		self.__sdrop = []
+		self.__workers = None
+		self.__wlock = thread.allocate_lock()
+		self.__restarts = 0
+		self.__bytesin = 0  # bytes handled by removed handlers
+		self.__bytesout = 0
+		if self.__selected and not self.config.get('workers'):
+			self.register(self.socket.fileno(), self.__acceptevent)
+		
+		#
+		# HANDLER POOL
+		#  - With `handler_pool`, the io loop only reads sockets; data is
+		#    passed to `handledata()` on a pool thread. Each handler's 
+		#    data is handled in the order received, one unit at a time.
+		#
+		self.__pool = None
+		self.__poolsize = int(self.config.get('handler_pool') or 0)
+		self.__pending = {}
+		self.__plock = thread.allocate_lock()
+		
 		# STATUS MESSAGES
 		self.messages = []
 		self.messageError = None
@@ -127,6 +180,22 @@ class Server(sockserv, Runner):
 	
 	
 	
+	#
+	# PRE-FORK
+	#
+	def __prefork(self, config):
+		#
+		# In pre-fork mode, this process only reserves the port; it binds
+		# with SO_REUSEPORT but never listens, so the kernel distributes
+		# connections among the worker processes alone.
+		#
+		if config.get('workers'):
+			config['reuseport'] = True
+			config['listen'] = False
+	
+	
+	
+	
 	#
 	# DELETE
 	#
@@ -166,6 +235,16 @@ class Server(sockserv, Runner):
 		"""Handler-list items."""
 		return self.__handlers
 	
+	@property
+	def workers(self):
+		"""List of worker Process objects (pre-fork mode), else None."""
+		return self.__workers
+	
+	@property
+	def pool(self):
+		"""The handler thread pool, or None when not in pool mode."""
+		return self.__pool
+	
 	@property
 	def remove(self):
 		"""Remove-list items"""
@@ -187,15 +266,32 @@ class Server(sockserv, Runner):
 			handlerk = self.handlerk,
 			handlers = self.handlers, #len(self.handlers),
 			iocount = self.iocount,
-			port = self.port
+			bytesin = self.__bytesin + sum(h.bytesin for h in self.handlers),
+			bytesout = self.__bytesout + sum(h.bytesout for h in self.handlers),
+			handlerstats = [dict(
+					addr=h.addr, handled=h.handled, handletime=h.handletime,
+					bytesin=h.bytesin, bytesout=h.bytesout
+				) for h in self.handlers],
+			port = self.port,
+			selector = type(self.selector).__name__ if self.selector \
+				else None
 		))
 		
+		if self.__poolsize:
+			status['server']['pool'] = dict(
+				size=self.__poolsize, pending=len(self.__pending)
+			)
+		
 		#
 		# messages/errors
 		#  - This needs to be buffered with a Buffer object; it could 
 		#    really fill up memory after a while if left as it currently
 		#    is.
 		#
+		if self.config.get('workers'):
+			status['workers'] = self.workerquery('status')
+			status['server']['restarts'] = self.__restarts
+		
 		if len(self.messages):
 			status['messages'] = list(self.messages)
 			self.messages = []
@@ -226,6 +322,14 @@ class Server(sockserv, Runner):
 		"""Add `handler` to the active handler list."""
 		#self.messages.append(["handler-add", handler])
 		self.handlers.append(handler)
+		self.__idle[handler] = self.timers.after(
+				handler.countdown, self.__idlecheck, handler
+			)
+		if self.__selected:
+			fd = handler.socket.fileno()
+			self.register(fd, functools.partial(self.__hevent, handler))
+			self.__selfds[handler] = fd
+			self.__selev[handler] = selectors.EVENT_READ
 		self.messages.append(["handler-add", handler, handler.addr])
 	
 	def removeHandler(self, handler):
@@ -233,6 +337,14 @@ class Server(sockserv, Runner):
 		#self.messages.append(["handler-remove", handler, handler.addr])
 		addr = handler.addr
 		self.handlers.remove(handler)
+		self.__bytesin += handler.bytesin
+		self.__bytesout += handler.bytesout
+		t = self.__idle.pop(handler, None)
+		if t:
+			self.timers.cancel(t)
+		if handler in self.__selfds:
+			self.unregister(self.__selfds.pop(handler))
+			self.__selev.pop(handler, None)
 		self.messages.append(["handler-remove", handler, addr])
 	
 	
@@ -282,6 +394,36 @@ class Server(sockserv, Runner):
 	#  - Override runner methods to implement Server needs.
 	#
 	
+	# OPEN
+	def open(self):
+		"""Launch worker processes, if configured to do so."""
+		if self.config.get('workers') and (self.__workers is None):
+			self.__workers = []
+			for i in range(int(self.config['workers'])):
+				self.__workers.append(self.__launchworker())
+		Runner.open(self)
+	
+	
+	# STOP
+	def stop(self):
+		"""Stop the run loop; shut down any worker processes."""
+		with self.__wlock:
+			workers = self.__workers or []
+			self.__workers = None
+		for w in workers:
+			try:
+				w.shutdown()
+			except Exception as ex:
+				trix.log("err-server-stop", "worker-shutdown-fail", 
+						str(ex), ex.args, pid=w.pid
+					)
+		
+		pool, self.__pool = self.__pool, None
+		if pool:
+			pool.shutdown(wait=False)
+		Runner.stop(self)
+	
+	
 	# DO NOT REMOVE THIS STUPID METHOD!
 	def run(self):
 		#
@@ -303,8 +445,16 @@ class Server(sockserv, Runner):
 		if not self.socket:
 			self.stop()
 		
+		elif self.config.get('workers'):
+			if self.__workers is not None:
+				self.superviseio()
+		
+		elif self.__selected:
+			self.selectio()
+		
 		else:
 			remove = []
+			drop = []
 			
 			# check for connection requests
 			try:
@@ -318,13 +468,25 @@ class Server(sockserv, Runner):
 				pass # ignore timeout
 			
 			
-			# call `handle()` on each handler
+			#
+			# call `handle()` on each handler; Buffered replies are sent
+			# first, and reading is skipped while too many are waiting.
+			#
 			for h in self.handlers:
-				if h.countdown < 0.0: 
-					remove.append(h)
-				else:
+				try:
+					if h.pending:
+						h.flush()
+				except BaseException as ex:
+					self.messages.append([
+						"handler-err", h, type(ex), ex.args, xdata()
+					])
+					drop.append(h)
+				
+				if (h not in self.remove) and (h not in drop) and (
+						not h.full
+					):
 					try:
-						h.handle()
+						self.handleio(h)
 					except BaseException as ex:
 						self.messages.append([
 							"handler-err", h, type(ex), ex.args, xdata()
@@ -348,12 +510,8 @@ class Server(sockserv, Runner):
 						"""
 			
 			# remove handlers marked for removal
-			for r in remove:
-				try:
-					self.removeHandler(r)
-				finally:
-					r.shutdown()
-					
+			self.__purge(remove)
+			self.__purge(drop, force=True)
 			
 			self.iocount += 1
 			
@@ -363,8 +521,279 @@ class Server(sockserv, Runner):
 	
 	
 	
+	#
+	# SELECT-IO
+	#
+	def selectio(self):
+		"""
+		Selector-mode io; Called after each wait for socket events. The
+		events themselves are handled by `__acceptevent()` and 
+		`__hevent()` (called by the Runner); Here, handlers found closed
+		(or failed) are removed, and those given buffered data by pool
+		threads start waiting for their sockets to become writable.
+		"""
+		flushq = self.__flushq
+		while flushq:
+			self.__reselect(flushq.popleft())
+		
+		# remove handlers marked for removal
+		remove, self.__sremove = self.__sremove, []
+		drop, self.__sdrop = self.__sdrop, []
+		self.__purge(remove)
+		self.__purge(drop, force=True)
+		
+		self.iocount += 1
+	
+	
+	def __acceptevent(self, fd, events):
+		# accept every waiting connection
+		while True:
+			try:
+				conn, addr = self.socket.accept()
+			except (socket.timeout, BlockingIOError):
+				break
+			self.addHandler(self.handler(conn, **self.handlerk))
+	
+	
+	def __hevent(self, h, fd, events):
+		#
+		# Handler `h`'s socket is ready; Send buffered data (if it's
+		# writable) and handle received data (if it's readable).
+		#
+		try:
+			if events & selectors.EVENT_WRITE:
+				try:
+					h.flush()
+				except BaseException:
+					self.__sdrop.append(h)
+					raise
+			if events & selectors.EVENT_READ:
+				self.handleio(h)
+				if h.eof:
+					self.__sremove.append(h)
+			self.__reselect(h)
+		except BaseException as ex:
+			self.messages.append([
+				"handler-err", h, type(ex), ex.args, xdata()
+			])
+	
+	
+	#
+	# HANDLE-IO
+	#
+	def handleio(self, h):
+		"""
+		Call `h.handle()` or, in pool mode, receive data from `h` and
+		queue it to be passed to `h.handledata()` on a pool thread.
+		"""
+		if not self.__poolsize:
+			n = h.bytesin
+			t = time.perf_counter()
+			h.handle()
+			if h.bytesin != n:
+				self.__handletime(h, time.perf_counter() - t) # got data
+		else:
+			data = h.receive()
+			if data:
+				self.__submit(h, data)
+	
+	
+	def __handletime(self, h, t):
+		# record the time `h` took to handle received data; pool threads
+		# must hold the pool lock
+		h.handled += 1
+		h.handletime += t
+		if self.stats:
+			self.stats.add('handle', t)
+	
+	
+	def __idlecheck(self, h):
+		#
+		# Called by `h`'s idle timer. Drop `h` if it's still idle, else 
+		# reset the timer to its new deadline.
+		#
+		if h in self.handlers:
+			countdown = h.countdown
+			if countdown > 0.0:
+				self.__idle[h] = self.timers.after(
+						countdown, self.__idlecheck, h
+					)
+			else:
+				# a peer that won't read its replies is dropped, too
+				self.__idle.pop(h, None)
+				self.__purge([h], force=True)
+				if h in self.handlers:
+					# still busy in the pool; check again later
+					self.__idle[h] = self.timers.after(
+							h.maxidle, self.__idlecheck, h
+						)
+	
+	
+	def busy(self, h):
+		"""
+		True if handler `h` has data waiting for (or in) the pool, or
+		buffered replies that have yet to be sent.
+		"""
+		return (h in self.__pending) or (h.pending > 0)
+	
+	
+	def __reselect(self, h):
+		#
+		# Set the selector events for `h`: EVENT_WRITE while it's got
+		# buffered data to send; EVENT_READ unless it's full (past its
+		# high-water mark) or waiting for removal.
+		#
+		if h not in self.__selfds:
+			return
+		
+		events = 0
+		if h.pending:
+			events |= selectors.EVENT_WRITE
+		if (not h.full) and (h not in self.remove):
+			events |= selectors.EVENT_READ
+		
+		if not events:
+			self.unregister(self.__selfds.pop(h))
+			self.__selev.pop(h, None)
+		elif events != self.__selev.get(h):
+			self.modify(self.__selfds[h], events)
+			self.__selev[h] = events
+	
+	
+	def __submit(self, h, data):
+		#
+		# Data is queued per handler; only the first item queued starts
+		# a pool task, which then handles the rest in order. This keeps
+		# replies to each socket in the order their requests arrived.
+		#
+		with self.__plock:
+			q = self.__pending.setdefault(h, [])
+			q.append(data)
+			if len(q) > 1:
+				return
+			if self.__pool is None:
+				self.__pool = futures.ThreadPoolExecutor(self.__poolsize)
+		self.__pool.submit(self.__work, h)
+	
+	
+	def __work(self, h):
+		while True:
+			with self.__plock:
+				data = self.__pending[h][0]
+			t = time.perf_counter()
+			try:
+				h.handledata(data)
+			except BaseException as ex:
+				self.messages.append([
+					"handler-err", h, type(ex), ex.args, xdata()
+				])
+			t = time.perf_counter() - t
+			with self.__plock:
+				self.__handletime(h, t)
+				q = self.__pending[h]
+				q.pop(0)
+				if not q:
+					del(self.__pending[h])
+					if h.pending:
+						self.__flushq.append(h)
+						self.wake()
+					return
+	
+	
+	def __purge(self, remove, force=False):
+		#
+		# Remove and shut down handlers in `remove`. Any that are still
+		# busy are kept in `self.remove` (and no longer read) until their
+		# pool work is done and their buffered replies are sent. With 
+		# `force`, unsent replies are dropped.
+		#
+		for r in list(self.remove):
+			if not self.busy(r):
+				self.remove.remove(r)
+				if r not in remove:
+					remove.append(r)
+		
+		for r in remove:
+			if r not in self.handlers:
+				pass # already removed
+			elif (r in self.__pending) or (r.pending and not force):
+				if r not in self.remove:
+					self.remove.append(r)
+					self.__reselect(r)
+			else:
+				if r in self.remove:
+					self.remove.remove(r)
+				try:
+					self.removeHandler(r)
+				finally:
+					r.shutdown()
+	
+	
+	#
+	# SUPERVISE-IO
+	#
+	def superviseio(self):
+		"""
+		Pre-fork mode io; Replace any worker process that has exited.
+		"""
+		with self.__wlock:
+			workers = self.__workers or []
+			for i, w in enumerate(workers):
+				if not w.active:
+					self.messages.append(["worker-exit", w.poll()])
+					try:
+						w.shutdown()
+					except Exception:
+						pass
+					workers[i] = self.__launchworker()
+					self.__restarts += 1
+		
+		self.iocount += 1
+		time.sleep(self.sleep)
+	
+	
+	#
+	# WORKER-QUERY
+	#
+	def workerquery(self, q):
+		"""
+		Send query `q` to each worker process; Return a list of dicts
+		containing each worker's pid and the reply (or error).
+		"""
+		r = []
+		for w in self.__workers or []:
+			try:
+				reply = w.query(q) or {}
+				r.append(dict(pid=w.pid, reply=reply.get('reply')))
+			except Exception as ex:
+				r.append(dict(pid=w.pid, error=[str(ex), ex.args]))
+		return r
+	
+	
+	def __launchworker(self):
+		#
+		# Each worker is a plain Server listening on this server's port
+		# with SO_REUSEPORT set.
+		#
+		config = trix.kcopy(self.config, [
+				k for k in self.config if k not in 
+				['workers', 'listen', 'CPORT', 'name']
+			])
+		config['port'] = self.port
+		config['reuseport'] = True
+		return trix.nprocess('net.server.Server', config).launch('run')
+	
+	
 	def query(self, q):
 			q = q.strip()
+			if q == 'handlers' and (self.__workers is not None):
+				r = []
+				for w in self.workerquery(q):
+					for h in w.get('reply') or []:
+						h['pid'] = w['pid']
+						r.append(h)
+				return dict(query=q, reply=r)
+			
 			if q == 'handlers':
 				r = []
 				e = []
@@ -46,6 +46,10 @@ class bz2():
 	encode = compress = Loader('bz2', 'compress')
 	decode = decompress = Loader('bz2', 'decompress')
 
+class gzip():
+	encode = compress = Loader('gzip', 'compress')
+	decode = decompress = Loader('gzip', 'decompress')
+
 
 #
 # FUNCTIONS
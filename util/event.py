@@ -262,7 +262,7 @@ class TextEvent(Event):
 #
 #
 class LineEvent(Event):
-	"""A Command-based event; Splits arguments using Scanner."""
+	"""A Command-based event; Splits arguments using ChunkScanner."""
 	
 	ARGPARSE = [
 		lambda x: int(float(x)) if float(x)==int(float(x)) else float(x),
@@ -302,7 +302,7 @@ class LineEvent(Event):
 		>>> e.arg(1)[2][3][4] # 'the number four'
 		"""
 		
-		s = Scanner(commandline)
+		s = ChunkScanner(commandline)
 		a = s.split()
 		r = []
 		try:
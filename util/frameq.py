@@ -0,0 +1,153 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from .. import *
+import struct, marshal, pickle
+
+
+FRAME_HEAD = struct.Struct('!II') # payload length, request id
+FRAME_MAX = 2**30                 # refuse larger frames
+FRAME_CODEC = 'json'
+
+
+class FrameError(ValueError): pass
+
+
+#
+# CODECS
+#  - Each codec is an (encode, decode) pair of functions converting
+#    between objects and bytes. Marshal and pickle are faster and pass
+#    bytes intact, but are only for trusted (eg, local) peers.
+#
+def _jencode(obj):
+	return trix.ncreate('fmt.JCompact').format(obj).encode('utf_8')
+
+FRAME_CODECS = {
+	'json'    : (_jencode, trix.jparse),
+	'marshal' : (marshal.dumps, marshal.loads),
+	'pickle'  : (
+			lambda obj: pickle.dumps(obj, pickle.HIGHEST_PROTOCOL),
+			pickle.loads
+		)
+}
+
+
+
+
+#
+# FRAME QUEUE
+#
+class FrameQueue(object):
+	"""
+	Length-prefixed message framing. Each frame is an 8-byte head -
+	payload length and request id - followed by the payload, an object
+	encoded by the named codec.
+	"""
+	
+	def __init__(self, codec=FRAME_CODEC, **k):
+		"""
+		Pass a codec name (a FRAME_CODECS key). Optional kwarg 'maxframe'
+		sets the largest acceptable payload size (default: FRAME_MAX).
+		"""
+		try:
+			self.__encode, self.__decode = FRAME_CODECS[codec]
+		except KeyError:
+			raise FrameError("err-frame-codec", xdata(
+					codec=codec, require1=sorted(FRAME_CODECS.keys())
+				))
+		
+		self.__codec = codec
+		self.__maxframe = k.get('maxframe', FRAME_MAX)
+		self.__buf = bytearray()
+		self.__pos = 0
+	
+	
+	@property
+	def codec(self):
+		"""The codec name."""
+		return self.__codec
+	
+	@property
+	def pending(self):
+		"""Number of bytes received but not yet read as frames."""
+		return len(self.__buf) - self.__pos
+	
+	
+	#
+	# FRAME
+	#
+	def frame(self, rid, obj):
+		"""Return bytes framing `obj` as request (or reply) id `rid`."""
+		payload = self.__encode(obj)
+		if len(payload) > self.__maxframe:
+			raise FrameError("err-frame-size", xdata(
+					size=len(payload), maxframe=self.__maxframe
+				))
+		return FRAME_HEAD.pack(len(payload), rid) + payload
+	
+	
+	#
+	# FEED
+	#
+	def feed(self, data):
+		"""Feed received bytes."""
+		if data:
+			self.__buf += data
+	
+	
+	#
+	# READ FRAME
+	#
+	def readframe(self):
+		"""
+		Return the next complete frame as a (rid, obj) tuple, or None if
+		no complete frame has been received.
+		"""
+		buf, pos = self.__buf, self.__pos
+		if len(buf) - pos < FRAME_HEAD.size:
+			return None
+		
+		size, rid = FRAME_HEAD.unpack_from(buf, pos)
+		if size > self.__maxframe:
+			raise FrameError("err-frame-size", xdata(
+					size=size, maxframe=self.__maxframe
+				))
+		
+		end = pos + FRAME_HEAD.size + size
+		if len(buf) < end:
+			return None
+		
+		payload = bytes(buf[pos+FRAME_HEAD.size:end])
+		
+		# discard consumed bytes only now and then
+		if end == len(buf):
+			del(buf[:])
+			self.__pos = 0
+		elif end > 65536:
+			del(buf[:end])
+			self.__pos = 0
+		else:
+			self.__pos = end
+		
+		return (rid, self.__decode(payload))
+	
+	
+	def __iter__(self):
+		f = self.readframe()
+		while f:
+			yield f
+			f = self.readframe()
+	
+	
+	#
+	# REST
+	#
+	def rest(self):
+		"""Remove and return any bytes not yet read as frames."""
+		data = bytes(self.__buf[self.__pos:])
+		del(self.__buf[:])
+		self.__pos = 0
+		return data
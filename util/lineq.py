@@ -142,6 +142,6 @@ class LineQueue(EncodingHelper):
 		while True:
 			try:
 				yield self.q.get_nowait()
-			except:
-				raise StopIteration()
+			except Empty:
+				return
 
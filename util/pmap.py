@@ -0,0 +1,280 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from .. import *
+from ..fmt import JCompact
+from .runner import Runner
+from .process import Process
+from .xqueue import *
+import os, functools, itertools
+
+
+PMAP_MAPPER = trix.innerpath('util.pmap.Mapper')
+PMAP_CHUNK = 64       # chunk size when the iterable's length is unknown
+PMAP_CODEC = 'pickle' # control channel codec for worker processes
+PMAP_RETRY = 2        # times to retry a chunk whose worker crashed
+PMAP_SLEEP = 0.01     # worker run loop sleep time
+PMAP_START = 30       # seconds to wait for a worker to start
+PMAP_TIMEOUT = 600    # seconds to wait for a chunk's results
+
+
+class PMapError(Exception): pass
+
+
+
+
+#
+# MAPPER
+#
+class Mapper(Runner):
+	"""
+	The remote side of `PMap`; Answers each 'map' query - a chunk of
+	items - with the list of results of calling function `fn` on each.
+	"""
+	
+	def __init__(self, fn, **k):
+		"""Pass the module.function path of the function to map."""
+		self.__fpath = fn
+		self.__fn = trix.value(fn)
+		k.setdefault('sleep', PMAP_SLEEP)
+		Runner.__init__(self, **k)
+	
+	
+	def run(self):
+		"""Answer queries until shut down."""
+		Runner.run(self)
+	
+	
+	def query(self, q):
+		"""Handle 'map' queries; Others are passed to Runner.query."""
+		if isinstance(q, (list, tuple)) and q and (q[0] == 'map'):
+			items = q[1]
+		elif isinstance(q, basestring) and q.startswith('map '):
+			items = trix.jparse(q[4:]) # text control channel
+		else:
+			return Runner.query(self, q)
+		
+		try:
+			return dict(query='map', reply=[self.__fn(x) for x in items])
+		except Exception as ex:
+			return dict(query='map', reply=None, error='map-fail',
+					fn=self.__fpath, xtype=type(ex).__name__,
+					xargs=[str(a) for a in ex.args]
+				)
+
+
+
+
+#
+# P-MAP
+#
+class PMap(object):
+	"""
+	Map a function over an iterable in worker processes. Chunks of
+	items are read from the iterable as workers need them, so it may
+	be a generator of any length.
+	
+	>>> pm = trix.ncreate('util.pmap.PMap', 'math.factorial', range(99))
+	>>> list(pm)                     # results, in order
+	>>> pm.reduce(operator.add)      # or reduced to a single value
+	"""
+	
+	def __init__(self, fn, iterable, workers=None, chunksize=None, **k):
+		"""
+		Pass the module.function path of a function taking one argument,
+		and an iterable of arguments. Optional:
+		 * workers   : number of worker processes (default: cpu count)
+		 * chunksize : items sent to a worker at once (default: len of
+		               the iterable divided by four per worker, if it
+		               has a len, else PMAP_CHUNK)
+		
+		Kwargs:
+		 * ordered   : if False, results come as chunks are completed
+		 * retries   : times to retry a chunk whose worker crashed
+		 * timeout   : seconds to wait for each chunk's results
+		 * pool      : a `util.process.ProcessPool` to take workers from
+		 * codec     : control channel codec (see `util.frameq`)
+		"""
+		self.__fn = fn
+		self.__workers = workers or os.cpu_count() or 1
+		if not chunksize:
+			try:
+				n = len(iterable)
+				chunksize = max(1, -(-n // (self.__workers*4)))
+			except TypeError:
+				chunksize = PMAP_CHUNK
+		
+		self.__chunksize = chunksize
+		self.__iter = iter(iterable)
+		self.__ordered = k.get('ordered', True)
+		self.__retries = k.get('retries', PMAP_RETRY)
+		self.__timeout = k.get('timeout', PMAP_TIMEOUT)
+		self.__pool = k.get('pool')
+		self.__codec = k.get('codec', PMAP_CODEC)
+		
+		self.__lock = thread.allocate_lock()
+		self.__plock = thread.allocate_lock()
+		self.__results = Queue()
+		self.__retry = []
+		self.__count = 0
+		self.__stopped = False
+		self.__started = False
+	
+	
+	@property
+	def workers(self):
+		"""Maximum number of worker processes."""
+		return self.__workers
+	
+	@property
+	def chunksize(self):
+		"""Number of items sent to a worker at once."""
+		return self.__chunksize
+	
+	
+	#
+	# ITER
+	#
+	def __iter__(self):
+		if self.__started:
+			raise PMapError("err-pmap-iter", xdata(
+					reason="results-already-iterated"
+				))
+		self.__started = True
+		
+		running = self.__workers
+		for i in range(running):
+			trix.start(self.__work)
+		
+		try:
+			done = {}
+			nxt = 0
+			while running:
+				idx, ok, r = self.__results.get()
+				if idx is None:
+					running -= 1
+				elif not ok:
+					raise r
+				elif not self.__ordered:
+					for x in r:
+						yield x
+				else:
+					done[idx] = r
+					while nxt in done:
+						for x in done.pop(nxt):
+							yield x
+						nxt += 1
+		finally:
+			# workers finish their current chunk, then exit
+			self.__stopped = True
+	
+	
+	#
+	# REDUCE
+	#
+	def reduce(self, fn, *initial):
+		"""
+		Reduce results as they arrive, by calling `fn(value, result)`;
+		Pass an initial value, or the first result is used.
+		"""
+		return functools.reduce(fn, self, *initial)
+	
+	
+	#
+	# WORKER THREADS
+	#
+	def __work(self):
+		p = None
+		try:
+			job = self.__next()
+			while job:
+				idx, items, tries = job
+				p = p or self.__launch()
+				r = self.__map(p, items)
+				if r is None:
+					#
+					# The worker crashed (or timed out); Replace it, and retry
+					# the chunk unless it's failed too often already.
+					#
+					self.__stop(p)
+					p = None
+					if tries >= self.__retries:
+						raise PMapError("err-pmap-fail", xdata(
+								reason="worker-failed", fn=self.__fn, chunk=idx,
+								tries=tries+1
+							))
+					with self.__lock:
+						self.__retry.append((idx, items, tries+1))
+				
+				elif r.get('error'):
+					raise PMapError("err-pmap-fail", xdata(
+							reason="function-failed", chunk=idx, reply=r
+						))
+				else:
+					self.__results.put((idx, True, r['reply']))
+				
+				job = self.__next()
+		
+		except BaseException as ex:
+			self.__stopped = True
+			self.__results.put((-1, False, ex))
+		
+		finally:
+			if p:
+				self.__stop(p)
+			self.__results.put((None, True, None))
+	
+	
+	def __next(self):
+		# Return the next (index, items, tries) job, or None when done.
+		with self.__lock:
+			if self.__stopped:
+				return None
+			if self.__retry:
+				return self.__retry.pop(0)
+			items = list(itertools.islice(self.__iter, self.__chunksize))
+			if items:
+				self.__count += 1
+				return (self.__count-1, items, 0)
+	
+	
+	def __launch(self):
+		#
+		# Create workers one at a time; Their first creation loads (via
+		# trix.create) modules that are not safe to load from several
+		# threads at once.
+		#
+		with self.__plock:
+			if self.__pool:
+				p = self.__pool.process(PMAP_MAPPER, self.__fn)
+			else:
+				p = Process(PMAP_MAPPER, self.__fn, framed=self.__codec)
+			p.launch('run')
+		
+		# wait for it to connect back (framing the channel, if it can)
+		if not p.query('ping', PMAP_START):
+			self.__stop(p)
+			raise PMapError("err-pmap-fail", xdata(
+					reason="worker-start-fail", fn=self.__fn
+				))
+		return p
+	
+	
+	def __map(self, p, items):
+		if p.frames:
+			return p.query(['map', items], self.__timeout)
+		cmd = "map %s" % JCompact().format(items)
+		return p.query(cmd, self.__timeout)
+	
+	
+	def __stop(self, p):
+		try:
+			p.stop()
+		except Exception:
+			try:
+				p.shutdown()
+			except Exception:
+				pass
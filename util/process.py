@@ -8,7 +8,8 @@ from .. import * # trix, sys
 from ..fmt import JCompact
 from .runner import Runner
 from .xqueue import *
-import subprocess
+from concurrent import futures
+import subprocess, select, gc, itertools, threading
 
 
 class ProcessError(Exception): pass
@@ -20,6 +21,9 @@ except:
 
 
 PROC_IO_TIMEOUT = 0.01
+PROC_STOPWAIT = 1.1
+PROC_POOLSIZE = 2
+PROC_ZYGOTE = trix.innerpath('util.process.Zygote')
 
 
 #
@@ -71,6 +75,33 @@ class Process(Runner):
 		
 		rk = trix.kpop(k, 'encoding errors sleep')
 		
+		#
+		# FRAMED CONTROL CHANNEL
+		#  - Pass kwarg `framed` as a codec name (see util.frameq) to 
+		#    switch the control socket to length-prefixed frames when 
+		#    first queried. Replies then carry request ids, so several
+		#    threads may query at once.
+		#
+		self.__framed = k.pop('framed', None)
+		self.__frames = None
+		self.__rids = itertools.count(1)
+		self.__replies = {}
+		self.__rcond = threading.Condition()
+		self.__reading = False
+		
+		#
+		# SHARED MEMORY RING
+		#  - Pass kwarg `ring` as a size in bytes (or True, for the default
+		#    size) to give the remote Runner a `util.shmring.ShmRing` for
+		#    bulk results. It's created at launch; read it via `ring`.
+		#
+		self.__ringsize = k.pop('ring', None)
+		self.__ring = None
+		
+		# text queries are answered in order, so ask one at a time
+		self.__qlock = thread.allocate_lock()
+		self.__ready = False
+		
 		# DEBUG INFO
 		ID = "%s.%s:%i" % (__name__, type(self).__name__, trix.pid())
 		#trix.log("%s.%s:%i" % (__name__, type(self).__name__, trix.pid()))
@@ -87,8 +118,10 @@ class Process(Runner):
 		#  - If encoding-related errors arise, it may be necessary to
 		#    add some (more) complication to this class or to __main__. 
 		#    For now, keep fingers crossed.
+		#  - Remaining kwargs (and those in `rk`) go to the remote object.
 		#
-		k = dict(encoding=self.ENCODE)
+		k = dict(k, **rk)
+		k.setdefault('encoding', self.ENCODE)
 		
 		#
 		# RUNNER KWARGS
@@ -144,6 +177,16 @@ class Process(Runner):
 		# This should only be set after `launch()` is called.
 		#self.__ctimeout = None
 		
+		#
+		# PROCESS POOL
+		#  - A Process taken from a ProcessPool already has a running,
+		#    connected remote interpreter (a Zygote); `launch()` sends it
+		#    the object spec, and `stop()` returns it to the pool.
+		#
+		self.__pool = None
+		self.__pooled = False
+		self.__prun = False
+		
 		# keep an eye on self.stop() for a while
 		self.__stoplog = []
 		self.__exitcode = None
@@ -202,6 +245,14 @@ class Process(Runner):
 		"""Time limit for remote process to connect. Default: 5 min."""
 		return self.__ctime
 	
+	@property
+	def ring(self):
+		"""
+		The shared memory ring the remote Runner writes to, if kwarg 
+		`ring` was given; Records are read as memoryviews, without copy.
+		"""
+		return self.__ring
+	
 	
 	
 	# runtime values
@@ -285,13 +336,7 @@ class Process(Runner):
 	# REMOTE STATUS
 	def rstatus(self):
 		"""Return the remote process status as a dict."""
-		self.write('status\r\n')
-		tstart = time.time()
-		tmout = tstart+self.CTOUT
-		while time.time() < tmout:
-			status = self.read().strip()
-			if status:
-				return trix.jparse(status)
+		return self.query('status')
 	
 	
 	# REMOTE DISPLAY
@@ -359,10 +404,11 @@ class Process(Runner):
 						#     csock and chand came online...
 						#
 						self.__write = self._write
+						self.__ready = True
 						try:
 							dk = self.__qsend.get_nowait()
 							while dk:
-								self.writeline(dk[0], **dk[1])
+								self.write(dk[0], **dk[1])
 								dk = self.__qsend.get_nowait()
 						except Empty:
 							pass
@@ -391,27 +437,30 @@ class Process(Runner):
 		## Send 'shutdown' command and wait for remote process to exit.
 		##
 		self.__stoplog.extend(['stoplog', time.time()])#
+		if self.__pooled and self.active and self.__release():
+			self.__stoplog.append('returned to pool')#
+			self.__ringclose()
+			return
+		
 		if self.active:
 			
-			self.__chand.write('shutdown\r\n')
+			if self.__frames:
+				self.__fsend('shutdown')
+			elif self.__chand:
+				self.__chand.write('shutdown\r\n')
 			self.__stoplog.append('shutdown sent')#
 			
 			# wait for process to exit
 			if self.__p:
-				tstart = time.time()
-				tmout = tstart+1.1
-				while time.time() < tmout:
-					self.__exitcode = self.poll()
-					if self.__exitcode == None:
-						time.sleep(0.05)
-					else:
-						self.__exitcode = poll = self.poll()
-						time.sleep(0.05)
-						self.__stoplog.extend([
-								'shutdown success', time.time(), "poll=%s"%str(poll),
-								'active="%s"' % str(self.active)
-							])#
-						break
+				try:
+					self.__p.wait(PROC_STOPWAIT)
+					self.__exitcode = poll = self.poll()
+					self.__stoplog.extend([
+							'shutdown success', time.time(), "poll=%s"%str(poll),
+							'active="%s"' % str(self.active)
+						])#
+				except subprocess.TimeoutExpired:
+					pass
 			
 			#
 			# CHECK PROCESS ENDED
@@ -450,6 +499,7 @@ class Process(Runner):
 			finally:
 				# stop the runner
 				Runner.stop(self)
+				self.__ringclose()
 	
 	
 	
@@ -468,13 +518,29 @@ class Process(Runner):
 			return self.__chand.read()
 	
 	
-	def readline(self):
-		"""Read a line from control socket."""
-		if self.__csock and self.__chand:
-			data = self.__csock.read()
-			if data:
-				self.__chand.handledata(data)
-			return self.__chand.readline()
+	def readline(self, timeout=None):
+		"""
+		Read a line from control socket. If `timeout` is given, wait up
+		to `timeout` seconds for a line to arrive.
+		"""
+		endtime = time.time() + (timeout or 0)
+		while True:
+			line = None
+			if self.__csock and self.__chand and (self.__ready or not timeout):
+				data = self.__csock.read()
+				if data:
+					self.__chand.handledata(data)
+				line = self.__chand.readline()
+			
+			wait = endtime - time.time()
+			if line or (wait <= 0):
+				return line
+			
+			if self.__ready:
+				select.select([self.__csock.socket], [], [], wait)
+			else:
+				# not yet connected back
+				time.sleep(min(wait, PROC_IO_TIMEOUT))
 	
 	
 	def readlines(self):
@@ -504,13 +570,13 @@ class Process(Runner):
 	
 	def writeline(self, data, **k):
 		"""Append CRLF to data and write."""
-		self.write(data+"\r\n", **k)
+		return self.write(data+"\r\n", **k)
 	
 	
 	def _write(self, data, **k):
 		"""Write data to socket."""
 		if self.__csock and self.__chand:
-			self.__csock.write(data, **k)
+			return self.__csock.write(data, **k)
 	
 	
 	def __writeq(self, data, **k):
@@ -533,19 +599,129 @@ class Process(Runner):
 	
 	
 	# query
-	def query(self, cmd):
+	def query(self, cmd, timeout=None):
 		"""
-		Query the remote process; Return result as a dict.
+		Query the remote process; Return result as a dict, or None if
+		no reply comes within `timeout` seconds (default: CTOUT).
 		"""
-		self.writeline(cmd)
-		tstart = time.time()
-		tmout = tstart+self.CTOUT
-		while time.time() < tmout:
-			reply = self.read().strip()
+		timeout = timeout or self.CTOUT
+		if self.__framed and self.__chand and not self.__frames:
+			with self.__qlock:
+				if self.__framed and not self.__frames:
+					self.__framestart()
+		if self.__frames:
+			return self.__freply(self.__fsend(cmd), timeout)
+		
+		with self.__qlock:
+			self.writeline(cmd)
+			reply = self.__readreply(timeout)
 			if reply:
 				return trix.jparse(reply)
 	
 	
+	# a-query
+	def aquery(self, cmd, timeout=None):
+		"""
+		Query the remote process in a new thread; Returns a Future that
+		resolves to the result dict (or to None, on timeout).
+		
+		>>> f = p.aquery('status')
+		>>> f.add_done_callback(lambda f: print(f.result()))
+		>>> await asyncio.wrap_future(p.aquery('status')) # asyncio
+		"""
+		f = futures.Future()
+		def q():
+			if f.set_running_or_notify_cancel():
+				try:
+					f.set_result(self.query(cmd, timeout))
+				except BaseException as ex:
+					f.set_exception(ex)
+		trix.start(q)
+		return f
+	
+	
+	def __readreply(self, timeout):
+		#
+		# Wait up to `timeout` seconds for a non-empty line.
+		#
+		endtime = time.time() + timeout
+		while True:
+			wait = endtime - time.time()
+			line = (self.readline(max(wait, 0)) or '').strip()
+			if line or (wait <= 0):
+				return line
+	
+	
+	
+	#
+	# FRAMED QUERIES
+	#
+	@property
+	def frames(self):
+		"""The FrameQueue, once the control socket is framed."""
+		return self.__frames
+	
+	
+	def __framestart(self):
+		#
+		# Ask the remote Runner to switch to framed mode. If it can't, 
+		# stay with text.
+		#
+		codec = self.__framed
+		self.writeline("frame %s" % codec)
+		reply = self.__readreply(self.CTOUT)
+		if reply and (trix.jparse(reply).get('reply') == codec):
+			self.__frames = trix.ncreate('util.frameq.FrameQueue', codec)
+		else:
+			self.__framed = None
+	
+	
+	def __fsend(self, q):
+		# send framed query `q`; return its request id
+		rid = next(self.__rids)
+		self.__csock.send(self.__frames.frame(rid, q))
+		return rid
+	
+	
+	def __freply(self, rid, timeout):
+		#
+		# Wait for the reply to request `rid`. One waiting thread at a
+		# time reads the socket, storing any replies it gets; The others
+		# wait to be notified.
+		#
+		endtime = time.time() + timeout
+		with self.__rcond:
+			while rid not in self.__replies:
+				wait = endtime - time.time()
+				if wait <= 0:
+					return None
+				
+				if self.__reading:
+					self.__rcond.wait(wait)
+					continue
+				
+				self.__reading = True
+				self.__rcond.release()
+				try:
+					select.select([self.__csock.socket], [], [], wait)
+					data = self.__csock.recv(self.__csock.buflen)
+				finally:
+					self.__rcond.acquire()
+					self.__reading = False
+				
+				if data == b'':
+					# the remote process has closed the socket (or died)
+					self.__rcond.notify_all()
+					return None
+				
+				self.__frames.feed(data)
+				for r, reply in self.__frames:
+					self.__replies[r] = reply
+				self.__rcond.notify_all()
+			
+			return self.__replies.pop(rid)
+	
+	
 	
 	#
 	# READ-O (Standard Output Queue)
@@ -582,6 +758,33 @@ class Process(Runner):
 		Returns `self`.
 		"""
 		
+		#
+		# SHARED MEMORY RING
+		#  - Created here, so its name goes to the remote Runner (as
+		#    kwarg RING) with the rest of the launch spec.
+		#
+		if self.__ringsize and not self.__ring:
+			rk = {} if self.__ringsize is True else dict(size=self.__ringsize)
+			self.__ring = trix.ncreate('util.shmring.ShmRing', **rk)
+			self.__krgs['RING'] = self.__ring.name
+		
+		if self.__pooled and (self.__cpath != PROC_ZYGOTE):
+			#
+			# POOLED LAUNCH
+			#  - The remote process is already running; send it the spec.
+			#    (If it's not yet connected back, this is queued until it
+			#    is.)
+			#
+			if self.__prun:
+				raise Exception('err-launch-fail', xdata(
+						detail="process-already-launched", cpath=self.__cpath,
+						DEBUG="Launch may be called only once per Process"
+					))
+			cargs = [self.__cpath, self.__args, self.__krgs, run, a, k]
+			self.writeline("launch %s" % JCompact().compact(cargs).decode())
+			self.__prun = True
+			return self
+		
 		if self.__p:
 			raise Exception('err-launch-fail', xdata(
 					detail="process-already-launched", p=self.__p,
@@ -669,6 +872,65 @@ class Process(Runner):
 	
 	
 	
+	#
+	# POOL SUPPORT
+	#
+	def _assign(self, pool, cpath, a, k):
+		#
+		# Called by ProcessPool to give this idle Zygote's Process a new
+		# object to launch, or (with `pool` None) to detach it from the
+		# pool so it can be stopped.
+		#
+		self.__pool = pool
+		self.__pooled = pool is not None
+		self.__cpath = cpath
+		self.__args = a
+		self.__krgs = k
+	
+	
+	def __release(self):
+		#
+		# Shut down the launched object and wait for the Zygote to say 
+		# it's ready again, then give this Process back to the pool.
+		#
+		if self.__prun:
+			if self.__frames:
+				#
+				# The Zygote only speaks text; anything after the framed
+				# reply to 'shutdown' is passed on to the line handler.
+				#
+				self.__freply(self.__fsend('shutdown'), self.CTOUT)
+				rest = self.__frames.rest()
+				self.__frames = None
+				if rest:
+					self.__chand.handledata(self.decode(rest))
+			else:
+				self.writeline('shutdown')
+			tmout = time.time()+self.CTOUT
+			ready = False
+			while (not ready) and (time.time() < tmout):
+				line = self.__readreply(tmout - time.time())
+				ready = line == ZYGOTE_READY
+			if not ready:
+				return False
+		
+		self.__prun = False
+		self.__cpath = PROC_ZYGOTE
+		self.__args = ()
+		self.__krgs = {}
+		return self.__pool.release(self)
+	
+	
+	def __ringclose(self):
+		# the remote process is done with the ring; remove it
+		if self.__ring:
+			try:
+				self.__ring.close()
+			except BufferError:
+				trix.log("err-ring-close", "views-unreleased", xdata())
+			self.__ring = None
+	
+	
 	def __stdeo(self, TException=None):
 		#
 		# STDOUT/STDERR
@@ -767,3 +1029,223 @@ class Process(Runner):
 
 
 
+
+
+
+#
+#
+# ZYGOTE
+#
+#
+ZYGOTE_READY = "zygote-ready"
+
+class Zygote(object):
+	"""
+	A warm interpreter, launched by ProcessPool with trix already
+	imported. It waits on its control socket for a "launch" line, then
+	creates the object that line describes - passing it the control
+	socket as kwarg CSOCK - and calls its run method, if any. When that
+	returns, it writes ZYGOTE_READY and waits for the next.
+	"""
+	
+	def __init__(self, CPORT, **k):
+		self.__csock = trix.ncreate('util.sock.sockcon.sockcon', CPORT)
+		self.__csock.writeline("%i" % trix.pid())
+		self.__lineq = trix.ncreate('util.lineq.LineQueue')
+		self.__jformat = trix.ncreate('fmt.JCompact')
+	
+	
+	def run(self):
+		"""Launch objects as requested until shut down."""
+		while True:
+			q = self.__readline()
+			if q is None:
+				return # the controlling process has gone
+			
+			q = q.strip()
+			if q == 'shutdown':
+				self.__reply(q, 'shutdown')
+				return
+			elif q == 'ping':
+				self.__reply(q, 'pong')
+			elif q == 'status':
+				self.__reply(q, dict(zygote=trix.pid()))
+			elif q.startswith('launch '):
+				self.__launch(q[7:])
+				self.__csock.writeline(ZYGOTE_READY)
+			elif q:
+				self.__reply(q, None, 'unknown-query')
+	
+	
+	def __launch(self, spec):
+		ca = trix.jparse(self.__jformat.expand(spec).decode('UTF8'))
+		cpath, a, k, run, ra, rk = ca
+		k['CSOCK'] = self.__csock
+		k['CLINEQ'] = self.__lineq # lines that followed the launch line
+		obj = trix.create(cpath, *a, **k)
+		if run:
+			getattr(obj, run)(*ra, **rk)
+		
+		# release the object's resources before the next launch
+		del(obj)
+		gc.collect()
+	
+	
+	def __readline(self):
+		#
+		# Wait for a complete line; Return None if the socket closes.
+		#
+		while True:
+			q = self.__lineq.readline()
+			if q:
+				return q
+			select.select([self.__csock.socket], [], [], 1.0)
+			data = self.__csock.recv(self.__csock.buflen)
+			if data:
+				self.__lineq.feed(data.decode(DEF_ENCODE))
+			elif data is not None:
+				return None
+	
+	
+	def __reply(self, q, reply, error=None):
+		r = dict(query=q, reply=reply)
+		if error:
+			r['error'] = error
+		self.__csock.writeline(self.__jformat(r))
+
+
+
+
+
+
+#
+#
+# PROCESS POOL
+#
+#
+class ProcessPool(object):
+	"""
+	Keeps `size` warm interpreters running so that Process objects 
+	launch without the cost of starting python and importing trix.
+	
+	>>> pool = trix.ncreate('util.process.ProcessPool', 4)
+	>>> p = pool.process("trix.net.server.Server", 0).launch('run')
+	>>> p.stop() # the interpreter goes back to the pool
+	>>> pool.shutdown()
+	"""
+	
+	def __init__(self, size=PROC_POOLSIZE, **k):
+		"""
+		Pass the number of interpreters to keep ready, and any kwargs
+		for their Process objects (eg, encoding, sleep).
+		"""
+		self.__size = size
+		self.__k = k
+		self.__idle = []
+		self.__lock = thread.allocate_lock()
+		self.__launched = 0
+		self.__reused = 0
+		self.fill()
+	
+	
+	@property
+	def size(self):
+		"""Number of warm interpreters to keep ready."""
+		return self.__size
+	
+	@property
+	def idle(self):
+		"""Number of warm interpreters ready now."""
+		return len(self.__idle)
+	
+	
+	def status(self):
+		"""Return a status dict."""
+		return dict(
+			size=self.__size, idle=len(self.__idle), 
+			launched=self.__launched, reused=self.__reused
+		)
+	
+	
+	#
+	# PROCESS
+	#
+	def process(self, cpath, *a, **k):
+		"""
+		Like `trix.process()`, but the returned Process object's remote
+		interpreter is already running. Call its `launch()` method as 
+		usual.
+		"""
+		p = None
+		with self.__lock:
+			while self.__idle and not p:
+				p = self.__idle.pop(0)
+				if not p.active:
+					p = None
+		
+		p = p or self.__zygote()
+		p._assign(self, cpath, a, k)
+		
+		# replace it in the background
+		trix.start(self.fill)
+		return p
+	
+	
+	#
+	# FILL
+	#
+	def fill(self):
+		"""Launch interpreters until `size` are ready."""
+		while True:
+			with self.__lock:
+				if len(self.__idle) >= self.__size:
+					return
+			p = self.__zygote()
+			with self.__lock:
+				self.__idle.append(p)
+	
+	
+	#
+	# RELEASE
+	#
+	def release(self, p):
+		"""
+		Return a Process to the pool; Returns False if it isn't wanted,
+		in which case the caller should stop it. Returned processes are
+		reused first; any surplus idle interpreters are stopped.
+		"""
+		with self.__lock:
+			if not (p.active and self.__size):
+				return False
+			self.__idle.insert(0, p)
+			self.__reused += 1
+			surplus = self.__idle[self.__size:]
+			del(self.__idle[self.__size:])
+		
+		if surplus:
+			trix.start(self.__stop, surplus)
+		return True
+	
+	
+	#
+	# SHUTDOWN
+	#
+	def shutdown(self):
+		"""Stop all idle interpreters."""
+		with self.__lock:
+			idle, self.__idle = self.__idle, []
+			self.__size = 0
+		self.__stop(idle)
+	
+	
+	def __stop(self, plist):
+		for p in plist:
+			p._assign(None, PROC_ZYGOTE, (), {})
+			p.shutdown()
+	
+	
+	def __zygote(self):
+		self.__launched += 1
+		p = Process(PROC_ZYGOTE, **self.__k).launch('run')
+		p._assign(self, PROC_ZYGOTE, (), {})
+		return p
@@ -0,0 +1,170 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from .runner import *
+import functools
+
+
+class Reactor(Runner):
+	"""
+	Run many runners on a single thread. Each runner attached (with
+	`Runner.attach()`) registers its file objects with the reactor's
+	selector; The reactor calls a runner's `step()` only when one of
+	them is ready, when its timers are due or something is posted to
+	it or - if it registers nothing - every `sleep` seconds.
+	
+	>>> r = trix.ncreate('util.reactor.Reactor').starts()
+	>>> for i in range(100):
+	...   trix.ncreate('net.server.Server', 0, selector=1).attach(r).start()
+	"""
+	
+	def __init__(self, config=None, **k):
+		"""Pass config and/or kwargs, as for Runner."""
+		self.__runners = []
+		self.__ready = set()
+		self.__fobjs = {}   # runner -> registered file objects
+		self.__parked = {}  # runner -> registrations of stopped runners
+		self.__lock = thread.allocate_lock()
+		k['evented'] = True
+		Runner.__init__(self, config, **k)
+	
+	
+	@property
+	def runners(self):
+		"""A list of the runners being stepped."""
+		with self.__lock:
+			return list(self.__runners)
+	
+	
+	#
+	# ADD/REMOVE
+	#
+	def add(self, runner):
+		"""
+		Start stepping `runner`; Called by an attached runner's `start`
+		method.
+		"""
+		with self.__lock:
+			if runner not in self.__runners:
+				self.__runners.append(runner)
+			parked = self.__parked.pop(runner, [])
+		
+		for fileobj, events, data in parked:
+			try:
+				self.selector.register(fileobj, events, data)
+			except (ValueError, OSError):
+				self.__fobjs.get(runner, set()).discard(fileobj) # closed
+		self.wake()
+	
+	
+	def remove(self, runner):
+		"""
+		Stop stepping `runner`; Called by an attached runner's `stop`
+		method. Its file objects are set aside until it's added again.
+		"""
+		with self.__lock:
+			if runner in self.__runners:
+				self.__runners.remove(runner)
+			self.__ready.discard(runner)
+		
+		parked = []
+		for fileobj in self.__fobjs.get(runner, ()):
+			try:
+				key = self.selector.unregister(fileobj)
+				parked.append((fileobj, key.events, key.data))
+			except (KeyError, ValueError):
+				pass
+		if parked:
+			self.__parked[runner] = parked
+	
+	
+	#
+	# REGISTER
+	#  - When given `runner`, its callbacks are wrapped so that runner
+	#    is stepped after the event is handled.
+	#
+	def register(self, fileobj, fn, events=selectors.EVENT_READ,
+			runner=None
+		):
+		"""Register `fileobj` (for `runner`, if given)."""
+		if runner is not None:
+			self.__fobjs.setdefault(runner, set()).add(fileobj)
+			fn = functools.partial(self.__event, runner, fn)
+		return Runner.register(self, fileobj, fn, events)
+	
+	
+	def modify(self, fileobj, events, fn=None):
+		"""Change the events (and, optionally, callback) of `fileobj`."""
+		data = self.selector.get_key(fileobj).data
+		if fn and isinstance(data, functools.partial):
+			fn = functools.partial(self.__event, data.args[0], fn)
+		return Runner.modify(self, fileobj, events, fn)
+	
+	
+	def unregister(self, fileobj):
+		"""Stop watching `fileobj`."""
+		for runner, fobjs in self.__fobjs.items():
+			if fileobj in fobjs:
+				fobjs.discard(fileobj)
+				if runner in self.__parked:
+					self.__parked[runner] = [
+						x for x in self.__parked[runner] if x[0] != fileobj
+					]
+					return
+				break
+		return Runner.unregister(self, fileobj)
+	
+	
+	def __event(self, runner, fn, fileobj, events):
+		fn(fileobj, events)
+		self.__ready.add(runner)
+	
+	
+	#
+	# IO
+	#
+	def io(self):
+		"""Step each runner that's had events or is due."""
+		ready, self.__ready = self.__ready, set()
+		for r in self.runners:
+			if (r in ready) or (r.waittime() == 0):
+				try:
+					r.step()
+				except Exception as ex:
+					trix.log("err-reactor-step", r, type(ex), ex.args, xdata())
+	
+	
+	def waittime(self):
+		"""Seconds until the first runner is due; None if none is."""
+		t = Runner.waittime(self)
+		for r in self.runners:
+			w = r.waittime()
+			if (w is not None) and ((t is None) or (w < t)):
+				t = w
+		return t
+	
+	
+	#
+	# STOP
+	#
+	def stop(self):
+		"""Stop each runner, then the reactor itself."""
+		for r in self.runners:
+			try:
+				r.stop()
+			except Exception as ex:
+				trix.log("err-reactor-stop", r, type(ex), ex.args, xdata())
+		Runner.stop(self)
+	
+	
+	#
+	# STATUS
+	#
+	def status(self):
+		"""Return a status dict."""
+		r = Runner.status(self)
+		r['runners'] = len(self.runners)
+		return r
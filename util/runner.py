@@ -7,6 +7,8 @@
 from .output import * # trix, enchelp, sys
 from ..util.xthread import *
 from ..util.stream.buffer import *
+from .runstats import RunStats
+import selectors, socket, collections
 
 DEF_SLEEP = 0.1
 
@@ -43,12 +45,32 @@ class Runner(Output):
 		self.__csock = None
 		self.__cport = None
 		self.__lineq = None
+		self.__frames = None
+		self.__frameto = None
+		self.__ring = None
 		self.__jformat = trix.ncreate('fmt.JCompact')
 		
+		# timed callbacks - see `after()` and `every()`
+		self.__timers = None
+		
+		# event waiting - see `register()`, `wake()`, and `post()`
+		self.__selector = None
+		self.__wakers = None
+		self.__posted = collections.deque()
+		self.__loopid = None
+		self.__reactor = None
+		self.__nreg = 0
+		self.__cwatch = False
+		self.__laststep = 0
+		
+		# instrumentation - see `stats` and the 'profile' query
+		self.__stats = None
+		self.__profile = None
+		
 		# each subclass of Output must track its own pause status
 		self.__pausestate = self.paused()
 		
-		try:
+		if config is None:
 			#
 			# CONFIG
 			#  - If this object is a Runner subclass that's already set a 
@@ -56,14 +78,11 @@ class Runner(Output):
 			#    into `config`.
 			#
 			config = self.config
-		except:
-			#
-			#  - If not, we'll need to create the config from args/kwargs.
-			#    Creating a config dict, then - regardless of whether 
-			#    `config` is from an existing self.config property - update
-			#    it with `k` (directly below).
-			#
-			config = config or {}
+		#
+		#  - Otherwise, the config given is used. Regardless of whether 
+		#    `config` is from an existing self.config property, update
+		#    it with `k` (directly below).
+		#
 		
 		#
 		# UPDATE CONFIG WITH `k`
@@ -96,16 +115,33 @@ class Runner(Output):
 		# running and communication
 		#
 		self.__sleep = self.config.get('sleep', DEF_SLEEP)
+		self.__maxwait = self.config.get('maxwait')
+		if self.config.get('stats', True):
+			self.__stats = RunStats()
+		if self.config.get('evented'):
+			self.__selector = selectors.DefaultSelector()
+			self.__evented()
 		
 		# Let kwargs set the "name" property; otherwise name is generated
 		# on request of property `self.name`.
 		if 'name' in self.config:
 			self.__name = str(self.config['name'])
 		
+		#
+		# If CSOCK is given, it's a control socket that's already been
+		# connected (eg, by `util.process.Zygote`) to the calling process.
+		# A CLINEQ given with it holds any lines already received.
+		#
+		if "CSOCK" in self.config:
+			self.__lineq = self.config.pop("CLINEQ", None) or trix.ncreate(
+					'util.lineq.LineQueue'
+				)
+			self.__csock = self.config.pop("CSOCK")
+		
 		#
 		# If CPORT is defined in config, connect to calling process.
 		#
-		if "CPORT" in self.config:
+		elif "CPORT" in self.config:
 			#
 			# Set up for communication via socket connection.
 			#
@@ -118,6 +154,16 @@ class Runner(Output):
 				trix.log("csock-write-pid", trix.pid(), type(ex), ex.args)
 				self.__csock = None
 				self.__lineq = None
+		
+		#
+		# If RING is given, it names a shared memory ring (see module 
+		# `util.shmring`) through which to pass bulk results back to the
+		# calling process.
+		#
+		if "RING" in self.config:
+			self.__ring = trix.ncreate(
+					'util.shmring.ShmRing', self.config.pop("RING")
+				)
 	
 	
 	
@@ -235,6 +281,42 @@ class Runner(Output):
 			self.__config = {}
 			return self.__config
 	
+	@property
+	def timers(self):
+		"""
+		The `util.timers.Timers` object holding this runner's timed 
+		callbacks; Due callbacks are called each pass through the loop.
+		"""
+		try:
+			if self.__timers is None:
+				self.__timers = trix.ncreate('util.timers.Timers')
+		except AttributeError:
+			self.__timers = trix.ncreate('util.timers.Timers')
+		return self.__timers
+	
+	@property
+	def selector(self):
+		"""
+		The `selectors` object this runner waits on, once anything has
+		been registered; otherwise None.
+		"""
+		try:
+			if self.__reactor:
+				return self.__reactor.selector
+			return self.__selector
+		except AttributeError:
+			self.__selector = None
+			return self.__selector
+	
+	@property
+	def reactor(self):
+		"""The `util.reactor.Reactor` this runner's attached to, if any."""
+		try:
+			return self.__reactor
+		except AttributeError:
+			self.__reactor = None
+			return self.__reactor
+	
 	@property
 	def csock(self):
 		"""
@@ -247,6 +329,19 @@ class Runner(Output):
 			self.__csock = None
 			return self.__csock
 	
+	@property
+	def ring(self):
+		"""
+		The `util.shmring.ShmRing` shared with the calling Process, if
+		it was launched with kwarg `ring`; otherwise None. Write bulk
+		results to it with its `write()` or `put()` methods.
+		"""
+		try:
+			return self.__ring
+		except:
+			self.__ring = None
+			return self.__ring
+	
 	
 	
 	# ---- orisc -----
@@ -285,32 +380,34 @@ class Runner(Output):
 		if not self.active:
 			self.open()
 		
+		# an attached runner is run by its reactor
+		if self.__reactor:
+			return self.start()
+		
 		# mark object as running
 		self.__running = True
+		self.__loopid = thread.get_ident()
 		
-		# Call self.cio() only in cases where event loop if a control 
-		xio = [self.io]
-		if self.csock:
-			xio.append(self.cio)
+		#
+		# If this runner waits on a selector, its control socket (if 
+		# any) is watched rather than polled.
+		#
+		if self.__selector and self.csock:
+			self.__evented()
 		
 		while self.__running:
 			try:
-				# call io method (and self.cio if applicable)
-				for fn in xio:
-					fn()
+				self.step()
 				
-				# manage pause-state
-				ps = self.paused()
-				if self.__pausestate != ps:
-					self.__pausestate = ps
-					if ps:
-						self.on_pause()
-					else:
-						self.flushbuffer()
-						self.on_resume()
-				
-				# sleep a little, now that we're out of the lock
-				time.sleep(self.sleep)
+				# wait for events, or sleep a little
+				if self.__selector:
+					self.__select(self.waittime())
+				elif self.__stats:
+					t = time.perf_counter()
+					time.sleep(self.sleep)
+					self.__lag(time.perf_counter() - t, self.sleep)
+				else:
+					time.sleep(self.sleep)
 			
 			except KeyboardInterrupt:
 				pass
@@ -321,6 +418,76 @@ class Runner(Output):
 			self.__csock = None
 		 
 	
+	# ----------------------------------------------------------------
+	#
+	# STEP
+	#
+	# ----------------------------------------------------------------
+	def step(self):
+		"""
+		Make one pass through the run loop, without waiting: make any
+		posted calls, call `io()` (and `cio()`, if the control socket is
+		polled), call due timers, and handle pause-state changes.
+		"""
+		prof = self.__profon()
+		try:
+			self.__step()
+		finally:
+			if prof:
+				prof.disable()
+	
+	
+	def __step(self):
+		while self.__posted:
+			fn, a = self.__posted.popleft()
+			try:
+				fn(*a)
+			except Exception as ex:
+				trix.log("err-runner-post", fn, type(ex), ex.args, xdata())
+		
+		# call io method (and self.cio if applicable)
+		stats = self.__stats
+		if stats:
+			t = time.perf_counter()
+			self.io()
+			stats.add('io', time.perf_counter() - t)
+		else:
+			self.io()
+		
+		if self.__csock and not self.__cwatch:
+			self.__cio()
+		
+		# call any timed callbacks that are due
+		if self.__timers:
+			self.__timers.run()
+		
+		# manage pause-state
+		ps = self.paused()
+		if self.__pausestate != ps:
+			self.__pausestate = ps
+			if ps:
+				self.on_pause()
+			else:
+				self.flushbuffer()
+				self.on_resume()
+		
+		self.__laststep = time.time()
+	
+	
+	def waittime(self):
+		"""
+		Seconds until this runner needs its next `step()` if no events 
+		arrive first; None, to wait for events indefinitely. A runner 
+		with nothing registered steps every `sleep` seconds.
+		"""
+		if self.__posted:
+			return 0
+		if self.__selector or self.__nreg:
+			t = self.__maxwait
+			return self.__timers.timeout(t) if self.__timers else t
+		return max(0.0, self.__laststep + self.sleep - time.time())
+	
+	
 	# ----------------------------------------------------------------
 	#
 	# IO 
@@ -343,6 +510,296 @@ class Runner(Output):
 		pass
 	
 	
+	# ----------------------------------------------------------------
+	#
+	# EVENTS
+	#  - Once a file object is registered (or given config `evented`),
+	#    the run loop stops sleeping and waits on a selector instead; 
+	#    `step()` is called after each wait, which ends when registered
+	#    file object is ready, a timer is due, `wake()` is called, or 
+	#    config `maxwait` seconds (default: None - forever) have passed.
+	#  - Register and unregister from the run loop's thread (eg, from
+	#    `io()` or a callback), or `post()` the call from others.
+	#
+	# ----------------------------------------------------------------
+	def register(self, fileobj, fn, events=selectors.EVENT_READ):
+		"""
+		Call `fn(fileobj, events)` from the run loop whenever `fileobj`
+		(a file descriptor or object with a `fileno()` method) is ready
+		for reading (or the given selectors `events`).
+		"""
+		if self.__reactor:
+			self.__nreg += 1
+			return self.__reactor.register(fileobj, fn, events, self)
+		if not self.__selector:
+			self.__selector = selectors.DefaultSelector()
+			self.__evented()
+		return self.__selector.register(fileobj, events, fn)
+	
+	def modify(self, fileobj, events, fn=None):
+		"""Change the events (and, optionally, callback) of `fileobj`."""
+		if self.__reactor:
+			return self.__reactor.modify(fileobj, events, fn)
+		fn = fn or self.__selector.get_key(fileobj).data
+		return self.__selector.modify(fileobj, events, fn)
+	
+	def unregister(self, fileobj):
+		"""Stop watching `fileobj`."""
+		if self.__reactor:
+			self.__nreg -= 1
+			return self.__reactor.unregister(fileobj)
+		return self.__selector.unregister(fileobj)
+	
+	
+	def wake(self):
+		"""End the run loop's current wait; Safe from any thread."""
+		try:
+			if self.__reactor:
+				self.__reactor.wake()
+			else:
+				self.__wakers[1].send(b'\0')
+		except (TypeError, AttributeError):
+			pass # not waiting on a selector
+		except (BlockingIOError, InterruptedError):
+			pass # already awake
+	
+	
+	def post(self, fn, *a):
+		"""
+		Call `fn(*a)` from the run loop, as soon as possible; Safe from
+		any thread. Use this to queue work for a running runner.
+		"""
+		self.__posted.append((fn, a))
+		self.wake()
+	
+	
+	#
+	# ATTACH
+	#  - An attached runner has no thread (or loop) of its own; Its
+	#    reactor steps it when its file objects are ready, its timers
+	#    are due, or (if nothing's registered) every `sleep` seconds.
+	#
+	def attach(self, reactor):
+		"""
+		Run this runner from `reactor` (a `util.reactor.Reactor`) rather
+		than in a thread of its own. Call before `start()`; Returns self.
+		
+		>>> r = trix.ncreate('util.reactor.Reactor').starts()
+		>>> s = trix.ncreate('net.server.Server', 0, selector=1)
+		>>> s.attach(r).start()
+		"""
+		if self.__running:
+			raise Exception("err-runner-attach", xdata(
+					reason="runner-already-running", runner=type(self)
+				))
+		
+		self.__reactor = reactor
+		
+		# move any existing registrations to the reactor
+		if self.__selector:
+			sel, self.__selector = self.__selector, None
+			wakers, self.__wakers = self.__wakers, None
+			for key in list(sel.get_map().values()):
+				if key.fileobj not in wakers:
+					if key.data == self.__cevent:
+						self.__cwatch = False
+					else:
+						self.register(key.fileobj, key.data, key.events)
+			sel.close()
+			for w in wakers:
+				w.close()
+		return self
+	
+	
+	def __evented(self):
+		#
+		# Set up to wait on the selector: a socket pair lets other 
+		# threads wake the loop, and the control socket (if any) is 
+		# watched rather than polled.
+		#
+		if not (self.__wakers or self.__reactor):
+			self.__wakers = socket.socketpair()
+			for w in self.__wakers:
+				w.setblocking(False)
+			self.__selector.register(self.__wakers[0], 
+					selectors.EVENT_READ, self.__woken
+				)
+		
+		csock = self.csock
+		if csock and self.__running and not self.__cwatch:
+			self.register(csock.socket, self.__cevent)
+			self.__cwatch = True
+			
+			# lines may have been received before now
+			self.__posted.append((self.cio, ()))
+	
+	
+	def __cevent(self, fileobj, events):
+		# the control socket is readable; stop watching it once closed
+		try:
+			if fileobj.recv(1, socket.MSG_PEEK) == b'':
+				self.unregister(fileobj)
+				return
+		except (BlockingIOError, InterruptedError):
+			return
+		self.__cio()
+	
+	
+	def __woken(self, fileobj, events):
+		try:
+			while fileobj.recv(4096):
+				pass
+		except (BlockingIOError, InterruptedError):
+			pass
+	
+	
+	def __select(self, timeout):
+		#
+		# Wait up to `timeout` seconds for events, then call the 
+		# callbacks of ready file objects.
+		#
+		stats = self.__stats
+		if stats:
+			t = time.perf_counter()
+		
+		ready = self.__selector.select(timeout)
+		if not ready:
+			if stats and timeout:
+				self.__lag(time.perf_counter() - t, timeout)
+			return
+		
+		if stats:
+			t = time.perf_counter()
+		
+		prof = self.__profon()
+		try:
+			for key, events in ready:
+				try:
+					key.data(key.fileobj, events)
+				except Exception as ex:
+					trix.log("err-runner-event", key.data, type(ex), ex.args,
+							xdata()
+						)
+		finally:
+			if prof:
+				prof.disable()
+			if stats:
+				stats.add('events', time.perf_counter() - t)
+	
+	
+	
+	# ----------------------------------------------------------------
+	#
+	# INSTRUMENTATION
+	#  - Unless config `stats` is False, each runner keeps histograms
+	#    of the time taken by each `io()` pass, `cio()` call and pass 
+	#    through event callbacks ("events"), and of loop lag - how much
+	#    longer than intended each timed wait or sleep lasted. Server 
+	#    adds "handle" times; Subclasses may add their own.
+	#  - Query 'profile start' to run each step (and event callbacks)
+	#    under cProfile until 'profile stop', which replies with the 
+	#    top entries by cumulative time.
+	#
+	# ----------------------------------------------------------------
+	@property
+	def stats(self):
+		"""This runner's `util.runstats.RunStats`, or None."""
+		return self.__stats
+	
+	@property
+	def profiling(self):
+		"""True while a 'profile start' query is in effect."""
+		return self.__profile is not None
+	
+	
+	def profile(self, start=True):
+		"""
+		Start (or, with `start` False, stop) profiling. When stopping,
+		returns the `cProfile.Profile` object, or None if not profiling.
+		"""
+		if start:
+			if self.__profile is None:
+				import cProfile
+				self.__profile = cProfile.Profile()
+		else:
+			prof, self.__profile = self.__profile, None
+			if prof:
+				prof.disable()
+			return prof
+	
+	
+	def __profon(self):
+		# enable profiling on this (the loop's) thread, if requested
+		prof = self.__profile
+		if prof:
+			try:
+				prof.enable()
+			except ValueError:
+				return None # another profiler is already active
+		return prof
+	
+	
+	def __lag(self, waited, intended):
+		if waited > intended:
+			self.__stats.add('lag', waited - intended)
+	
+	
+	def __profq(self, q):
+		#
+		# Handle 'profile' queries: 'profile start', 'profile stop [n]'
+		# (replies with the top `n` lines, default 25), 'profile dump 
+		# <path>' (writes pstats data), and 'profile' (status).
+		#
+		a = q.split()
+		cmd = a[1] if len(a) > 1 else ''
+		if cmd == 'start':
+			self.profile()
+			return dict(query=q, reply=True)
+		elif cmd == 'stop':
+			prof = self.profile(False)
+			if not prof:
+				return dict(query=q, reply=None, error='not-profiling')
+			import pstats, io
+			out = io.StringIO()
+			n = int(a[2]) if len(a) > 2 else 25
+			pstats.Stats(prof, stream=out).sort_stats('cumulative'
+				).print_stats(n)
+			return dict(query=q, reply=out.getvalue().splitlines())
+		elif (cmd == 'dump') and (len(a) > 2) and self.__profile:
+			self.__profile.dump_stats(a[2])
+			return dict(query=q, reply=a[2])
+		elif not cmd:
+			return dict(query=q, reply=self.profiling)
+	
+	
+	
+	# ----------------------------------------------------------------
+	#
+	# TIMED CALLBACKS
+	#  - Callbacks are called from the run loop (and so from the same
+	#    thread as `io()`), once each pass, after `io()` returns.
+	#
+	# ----------------------------------------------------------------
+	def after(self, seconds, fn, *a):
+		"""Call `fn(*a)` once, after `seconds`; Returns a timer object."""
+		return self.__timed(self.timers.after(seconds, fn, *a))
+	
+	def every(self, interval, fn, *a):
+		"""
+		Call `fn(*a)` every `interval` seconds; Returns a timer object 
+		that may be passed to `self.timers.cancel()`.
+		"""
+		return self.__timed(self.timers.every(interval, fn, *a))
+	
+	def __timed(self, t):
+		# a loop waiting on its selector must recalculate its timeout
+		if self.__reactor or (
+				self.__selector and (thread.get_ident() != self.__loopid)
+			):
+			self.wake()
+		return t
+	
+	
 	# ----------------------------------------------------------------
 	#
 	# STOP
@@ -352,6 +809,10 @@ class Runner(Output):
 		"""Stop the run loop."""
 		self.__running = False
 		self.__threaded = False
+		if self.reactor:
+			self.__reactor.remove(self)
+		elif self.selector:
+			self.wake()
 	
 	
 	# ----------------------------------------------------------------
@@ -384,6 +845,9 @@ class Runner(Output):
 		remote socket controls cport.
 		"""
 		
+		if self.__frames:
+			return self.__fcio()
+		
 		# read the control socket and feed data to the line queue
 		c = self.csock.read()
 		self.__lineq.feed(c)
@@ -401,8 +865,46 @@ class Runner(Output):
 			# write the query back to the caller
 			self.csock.writeline(self.__jformat(r))
 			
+			#
+			# FRAMED MODE
+			#  - After replying to a "frame <codec>" query, all further 
+			#    queries and replies are framed. See `util.frameq`.
+			#
+			if self.__frameto:
+				self.__frames, self.__frameto = self.__frameto, None
+				return
+			
 			# read another line (returns None when done)
 			q = self.__lineq.readline()
+	
+	
+	def __cio(self):
+		stats = self.__stats
+		if stats:
+			t = time.perf_counter()
+			self.cio()
+			stats.add('cio', time.perf_counter() - t)
+		else:
+			self.cio()
+	
+	
+	def __fcio(self):
+		#
+		# Framed cio; Each query's reply carries the query's request id,
+		# so a controlling process may have several queries waiting.
+		#
+		self.__frames.feed(self.csock.recv(self.csock.buflen))
+		for rid, q in self.__frames:
+			r = self.query(q)
+			if not r:
+				r = dict(query=q, reply=None, error='unknown-query')
+			try:
+				data = self.__frames.frame(rid, r)
+			except Exception as ex:
+				data = self.__frames.frame(rid, dict(query=q, reply=None,
+						error='reply-encode-fail', xargs=[str(a) for a in ex.args]
+					))
+			self.csock.send(data)
 		
 	
 	# QUERY
@@ -420,11 +922,26 @@ class Runner(Output):
 				return dict(query=q, reply='pong')
 			elif q == 'status':
 				return dict(query=q, reply=self.status())
+			elif q == 'stats':
+				r = self.__stats.dict() if self.__stats else None
+				return dict(query=q, reply=r)
+			elif q == 'stats reset':
+				if self.__stats:
+					self.__stats.reset()
+				return dict(query=q, reply=bool(self.__stats))
+			elif (q == 'profile') or q.startswith('profile '):
+				return self.__profq(q)
 			elif q == 'shutdown':
 				# stop, returning the new status
 				self.stop()
 				r = dict(query=q, reply=self.status())
 				return r
+			elif q.startswith('frame ') and self.csock:
+				# switch the control socket to framed mode (after replying)
+				self.__frameto = trix.ncreate(
+						'util.frameq.FrameQueue', q[6:].strip()
+					)
+				return dict(query=q, reply=self.__frameto.codec)
 	
 	
 	# ---- callbacks -----
@@ -440,7 +957,19 @@ class Runner(Output):
 	
 	# START
 	def start(self):
-		"""Start running in a new thread."""
+		"""
+		Start running in a new thread or, if attached to a reactor, let
+		the reactor start stepping this runner.
+		"""
+		if self.reactor:
+			if not self.active:
+				self.open()
+			self.__running = True
+			if self.csock:
+				self.__evented()
+			self.__reactor.add(self)
+			return
+		
 		try:
 			trix.start(self.run)
 			self.__threaded = True
@@ -482,6 +1011,9 @@ class Runner(Output):
 			sleep    = self.sleep,
 			config   = self.config,
 			cport    = self.__cport,
+			ring     = self.ring.name if self.ring else None,
+			stats    = self.__stats.dict() if self.__stats else None,
+			profiling = self.profiling,
 			
 			paused   = self.paused()
 		)
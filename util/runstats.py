@@ -0,0 +1,120 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from .. import *
+
+
+HIST_BUCKETS = 32  # from under 1 microsecond to over an hour
+
+
+#
+# HISTOGRAM
+#
+class Histogram(object):
+	"""
+	Counts of durations, in power-of-two buckets of microseconds. The
+	first counts durations under one microsecond, the last those over
+	2**(HIST_BUCKETS-2) microseconds.
+	"""
+	
+	__slots__ = ['counts', 'count', 'total', 'max']
+	
+	def __init__(self):
+		self.counts = [0] * HIST_BUCKETS
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+	
+	@property
+	def mean(self):
+		"""Mean duration, in seconds."""
+		return self.total / self.count if self.count else 0.0
+	
+	
+	def add(self, seconds):
+		"""Count a duration of `seconds`."""
+		i = int(seconds * 1000000).bit_length()
+		self.counts[min(i, HIST_BUCKETS-1)] += 1
+		self.count += 1
+		self.total += seconds
+		if seconds > self.max:
+			self.max = seconds
+	
+	
+	def percentile(self, p):
+		"""
+		Return the upper bound, in seconds, of the bucket holding the
+		`p`th percentile duration (eg, 99); An estimate, within 2x.
+		"""
+		n = self.count * p / 100.0
+		seen = 0
+		for i, c in enumerate(self.counts):
+			seen += c
+			if c and (seen >= n):
+				return min((1 << i) / 1000000.0, self.max)
+		return self.max
+	
+	
+	def dict(self):
+		"""Return a dict of (JSON-compatible) results."""
+		return dict(
+				count = self.count,
+				total = self.total,
+				mean  = self.mean,
+				max   = self.max,
+				p50   = self.percentile(50),
+				p99   = self.percentile(99),
+				buckets = {
+					"<%ius" % (1 << i) : c for i, c in enumerate(self.counts) if c
+				}
+			)
+
+
+
+
+#
+# RUN STATS
+#
+class RunStats(object):
+	"""
+	Named duration histograms, as kept by each Runner. Updates from
+	several threads aren't locked, so counts are only approximate when
+	they're made at once.
+	
+	>>> s = RunStats()
+	>>> s.add('io', 0.00012)
+	>>> s.dict()
+	"""
+	
+	def __init__(self):
+		self.reset()
+	
+	
+	def reset(self):
+		"""Discard all results."""
+		self.__hist = {}
+		self.__since = time.time()
+	
+	
+	def add(self, name, seconds):
+		"""Add a duration of `seconds` to histogram `name`."""
+		try:
+			self.__hist[name].add(seconds)
+		except KeyError:
+			self.__hist.setdefault(name, Histogram()).add(seconds)
+	
+	
+	def histogram(self, name):
+		"""Return the Histogram `name`, or None."""
+		return self.__hist.get(name)
+	
+	
+	def dict(self):
+		"""Return a dict of (JSON-compatible) results."""
+		return dict(
+				since  = self.__since,
+				times  = {k : h.dict() for k, h in list(self.__hist.items())}
+			)
@@ -0,0 +1,255 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from .. import *
+from .frameq import FRAME_CODECS
+import struct
+
+try:
+	from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+	shared_memory = None
+
+
+RING_SIZE = 2**24     # default data capacity (16M)
+RING_CODEC = 'marshal'
+RING_WAIT = 0.001     # writer's sleep while the ring is full
+
+#
+# LAYOUT
+#  - Capacity, head (total bytes written) and tail (total bytes read)
+#    each sit on their own 64-byte line, followed by the data area.
+#  - Each record is a 4-byte length and the record's bytes. A record
+#    never wraps; a WRAP length (or too little room for a length)
+#    means the next record starts back at offset zero.
+#
+RING_Q = struct.Struct('=Q')
+RING_REC = struct.Struct('=I')
+RING_CAP, RING_HEAD, RING_TAIL, RING_DATA = 0, 64, 128, 192
+RING_WRAP = 0xFFFFFFFF
+
+# names of rings created by this process
+_owned = set()
+
+
+class ShmRing(object):
+	"""
+	A single-writer, single-reader ring of byte records in shared
+	memory. One process creates it and passes `name` to the other,
+	which attaches. Records are read as memoryviews of the shared
+	memory itself, so nothing is copied.
+	
+	>>> r = ShmRing(size=2**20)          # parent
+	>>> w = ShmRing(r.name)              # child
+	>>> w.write(b"raw bytes")
+	>>> w.put({'a': [1, 2, 3]})          # encoded by `codec`
+	>>> mv = r.peek(); r.advance()       # zero-copy read
+	>>> r.get()
+	"""
+	
+	def __init__(self, name=None, size=RING_SIZE, codec=RING_CODEC):
+		"""
+		Pass `name` to attach to an existing ring; otherwise a new ring
+		with `size` bytes of capacity is created (and removed on close).
+		The `codec` (a util.frameq FRAME_CODECS key) is used by `put()`
+		and `get()`.
+		"""
+		if shared_memory is None:
+			raise NotImplementedError("err-ring-unsupported", xdata(
+					reason="multiprocessing.shared_memory-unavailable"
+				))
+		
+		self.__encode, self.__decode = FRAME_CODECS[codec]
+		self.__owner = not name
+		if self.__owner:
+			self.__shm = shared_memory.SharedMemory(
+					create=True, size=RING_DATA+size
+				)
+			self.__shm.buf[:RING_DATA] = bytes(RING_DATA)
+			RING_Q.pack_into(self.__shm.buf, RING_CAP, size)
+			_owned.add(self.__shm.name)
+		else:
+			self.__shm = self.__attach(name)
+		
+		self.__buf = self.__shm.buf
+		self.__cap = RING_Q.unpack_from(self.__buf, RING_CAP)[0]
+		self.__next = None
+	
+	
+	def __attach(self, name):
+		#
+		# Only the creating process may remove the memory; keep this
+		# process's resource tracker from doing so when it exits. (If 
+		# this process created it, the tracker already knows.)
+		#
+		try:
+			return shared_memory.SharedMemory(name=name, track=False)
+		except TypeError:
+			shm = shared_memory.SharedMemory(name=name)
+			if shm.name not in _owned:
+				try:
+					resource_tracker.unregister(shm._name, 'shared_memory')
+				except Exception:
+					pass
+			return shm
+	
+	
+	@property
+	def name(self):
+		"""The shared memory name; pass it to the other process."""
+		return self.__shm.name
+	
+	@property
+	def capacity(self):
+		"""Bytes available for records (and their lengths)."""
+		return self.__cap
+	
+	@property
+	def pending(self):
+		"""Bytes written but not yet read."""
+		return self.__get(RING_HEAD) - self.__get(RING_TAIL)
+	
+	
+	#
+	# WRITE
+	#
+	def write(self, data, timeout=None):
+		"""
+		Append a record of bytes-like `data`. If the ring is full, wait
+		up to `timeout` seconds (forever, if None) for the reader; Return
+		True if written, False on timeout.
+		"""
+		n = len(data)
+		need = RING_REC.size + n
+		if need > self.__cap:
+			raise ValueError("err-ring-write", xdata(
+					reason="record-too-large", size=n, capacity=self.__cap
+				))
+		
+		endtime = None if timeout is None else time.time() + timeout
+		head = self.__get(RING_HEAD)
+		pos = head % self.__cap
+		skip = 0 if (self.__cap - pos >= need) else self.__cap - pos
+		while (head + skip + need) - self.__get(RING_TAIL) > self.__cap:
+			if (endtime is not None) and (time.time() >= endtime):
+				return False
+			time.sleep(RING_WAIT)
+		
+		if skip:
+			if skip >= RING_REC.size:
+				RING_REC.pack_into(self.__buf, RING_DATA+pos, RING_WRAP)
+			pos = 0
+		
+		at = RING_DATA + pos
+		RING_REC.pack_into(self.__buf, at, n)
+		self.__buf[at+RING_REC.size:at+need] = data
+		
+		# publish the record only once it's complete
+		self.__set(RING_HEAD, head + skip + need)
+		return True
+	
+	
+	def put(self, obj, timeout=None):
+		"""Encode `obj` with this ring's codec and `write()` it."""
+		return self.write(self.__encode(obj), timeout)
+	
+	
+	#
+	# READ
+	#
+	def peek(self):
+		"""
+		Return the next record as a memoryview of the shared memory, or
+		None if there's none. Call `advance()` when done with it; after
+		that, the writer may overwrite it.
+		"""
+		tail = self.__get(RING_TAIL)
+		if tail == self.__get(RING_HEAD):
+			return None
+		
+		pos = tail % self.__cap
+		if self.__cap - pos < RING_REC.size:
+			tail += self.__cap - pos
+			pos = 0
+		
+		n = RING_REC.unpack_from(self.__buf, RING_DATA+pos)[0]
+		if n == RING_WRAP:
+			tail += self.__cap - pos
+			pos = 0
+			n = RING_REC.unpack_from(self.__buf, RING_DATA)[0]
+		
+		at = RING_DATA + pos + RING_REC.size
+		self.__next = tail + RING_REC.size + n
+		return self.__buf[at:at+n]
+	
+	
+	def advance(self):
+		"""Free the record last returned by `peek()`."""
+		if self.__next is not None:
+			self.__set(RING_TAIL, self.__next)
+			self.__next = None
+	
+	
+	def read(self):
+		"""Return the next record as bytes, or None if there's none."""
+		mv = self.peek()
+		if mv is not None:
+			try:
+				return bytes(mv)
+			finally:
+				mv.release()
+				self.advance()
+	
+	
+	def get(self):
+		"""
+		Return the next record decoded by this ring's codec; Raises
+		IndexError if there's none.
+		"""
+		mv = self.peek()
+		if mv is None:
+			raise IndexError("err-ring-empty")
+		try:
+			return self.__decode(mv)
+		finally:
+			mv.release()
+			self.advance()
+	
+	
+	def records(self):
+		"""
+		Generate each waiting record as a memoryview. Each is freed when
+		the next is requested, so release (or copy) it before then.
+		"""
+		mv = self.peek()
+		while mv is not None:
+			yield mv
+			self.advance()
+			mv = self.peek()
+	
+	
+	#
+	# CLOSE
+	#
+	def close(self):
+		"""
+		Detach from the shared memory; The creator also removes it. All
+		memoryviews returned by `peek()` must be released first.
+		"""
+		if self.__shm:
+			shm, self.__shm = self.__shm, None
+			self.__buf = None
+			shm.close()
+			if self.__owner:
+				_owned.discard(shm.name)
+				shm.unlink()
+	
+	
+	def __get(self, offset):
+		return RING_Q.unpack_from(self.__buf, offset)[0]
+	
+	def __set(self, offset, value):
+		RING_Q.pack_into(self.__buf, offset, value)
@@ -17,6 +17,10 @@ class sockserv(sockurl, sockprop):
 		 - Anything parsable by urlinfo may be given as the config.
 		 - Include server params (eg, opts, backlog, etc...).
 		 - Socket params 'family', 'type', and 'proto' are honored. 
+		 - Pass reuseport=True to set SO_REUSEPORT, so that several
+		   processes may listen on the same port.
+		 - Pass listen=False to bind (eg, to reserve a port) without
+		   listening for connections.
 		"""
 		
 		#
@@ -104,9 +108,16 @@ class sockserv(sockurl, sockprop):
 		s.settimeout(c.get('timeout', SOCK_TIMEOUT))
 		
 		# SOCKET OPTIONS
-		opts = c.get('options', [])
+		opts = list(c.get('options', []))
 		if c.get('reuse', True):
 			opts.append((socket.SOL_SOCKET, socket.SO_REUSEADDR, 1))
+		if c.get('reuseport'):
+			try:
+				opts.append((socket.SOL_SOCKET, socket.SO_REUSEPORT, 1))
+			except AttributeError:
+				raise ValueError("err-listen-fail", xdata(
+						reason="reuseport-unsupported", platform=sys.platform
+					))
 		
 		for opt in opts:
 			s.setsockopt(*opt)
@@ -118,7 +129,8 @@ class sockserv(sockurl, sockprop):
 		))
 		
 		# LISTEN (for incoming connections)
-		s.listen(c.get('backlog', socket.SOMAXCONN))
+		if c.get('listen', True):
+			s.listen(c.get('backlog', socket.SOMAXCONN))
 		
 		# store, for deletion when object deconstructs
 		return s
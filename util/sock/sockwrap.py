@@ -9,7 +9,8 @@ from ._sockconf import *
 from ..enchelp import *
 from ._sockprop import *
 from ... import * # trix
-import socket, select
+from collections import deque
+import socket, select, os
 
 
 class SockError(OSError): pass
@@ -21,6 +22,9 @@ class SockFatal(SockError): pass
 # I don't really know how to guess the best values for general use.
 #
 DEF_BUFFER = 4096       
+DEF_HIGHWATER = 2**20   # buffered writes; pause reading above this
+DEF_SENDTIMEOUT = 30    # max wait for the peer to accept sent data
+DEF_FILECHUNK = 2**16   # file bytes read per send, without os.sendfile
 
 
 class sockwrap(sockconf, sockprop, EncodingHelper):
@@ -64,6 +68,26 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 		self.__buflen = self.config.get('buflen', DEF_BUFFER)
 		self.__newl = self.config.get('newl', DEF_NEWL)
 		
+		#
+		# OUTBOUND BUFFER
+		#  - Data the socket won't yet accept waits here. By default, 
+		#    `send()` waits (up to `sendtimeout`) until it's all sent;
+		#    with config `wbuffer` True, it returns at once and whatever
+		#    runs this object (eg, a Server) must call `flush()` when 
+		#    the socket is writable.
+		#
+		self.__wbuffer = self.config.get('wbuffer', False)
+		self.__highwater = self.config.get('highwater', DEF_HIGHWATER)
+		self.__sendtimeout = self.config.get('sendtimeout', DEF_SENDTIMEOUT)
+		self.__wq = deque()
+		self.__wlen = 0
+		self.__wlock = thread.allocate_lock()
+		self.__wclose = False
+		
+		# byte counts, for instrumentation
+		self.bytesin = 0
+		self.bytesout = 0
+		
 		# init encoding
 		k.setdefault('encoding', DEF_ENCODE)
 		EncodingHelper.__init__(self, config, **k)
@@ -97,6 +121,26 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 		"""New-line character set; Eg, '\n', '\r', '\r\n'."""
 		return self.__newl
 	
+	@property
+	def wbuffer(self):
+		"""True if `send()` buffers data rather than waiting to send."""
+		return self.__wbuffer
+	
+	@property
+	def pending(self):
+		"""Number of bytes buffered, waiting to be sent."""
+		return self.__wlen
+	
+	@property
+	def highwater(self):
+		"""Buffered byte count above which reading should pause."""
+		return self.__highwater
+	
+	@property
+	def full(self):
+		"""True while buffered data is at or above `highwater`."""
+		return self.__wlen >= self.__highwater
+	
 	
 	
 	# WRITE
@@ -110,7 +154,7 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 	# WRITELINE
 	def writeline(self, text, **k):
 		"""Write text, appending `self.newl` line ending."""
-		self.write("%s%s" % (text, self.newl), **k)
+		return self.write("%s%s" % (text, self.newl), **k)
 	
 	# READ
 	def read (self, sz=None, **k):
@@ -137,7 +181,13 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 	#
 	def send(self, data):
 		"""
-		Send `data` bytes.
+		Send `data` bytes; Returns the number of bytes accepted, which
+		is always all of them. If `self.wbuffer` is True, bytes that the
+		socket can't take immediately are buffered to be sent by calls
+		to `flush()`; otherwise, wait until all are sent.
+		
+		Bytes objects are buffered without copying, so don't change the
+		content of a memoryview or bytearray once it's been sent.
 		
 		ERRORS (and how to handle them):
 		 * socket.timeout : In the event of socket.timeout errors, retry
@@ -157,7 +207,15 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 			
 			if data:
 				try:
-					return self.socket.send(data)
+					with self.__wlock:
+						self.__wq.append(memoryview(data))
+						self.__wlen += len(data)
+						self.__flush()
+					if not self.__wbuffer:
+						self.drain()
+					return len(data)
+				except SockError:
+					raise
 				except (socket.timeout, socket.error) as ex:
 					raise SockError('err-send-fail', xdata(
 						reason='send-error', python=str(ex)
@@ -175,6 +233,127 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 			pass
 	
 	
+	#
+	# SEND FILE
+	#
+	def queuefile(self, f, offset=0, count=None):
+		"""
+		Send `count` bytes (default: the rest) of open binary file `f`, 
+		starting at `offset`, after any data already buffered. The file
+		is sent as the socket takes it - by `os.sendfile()`, where it's
+		available - so with `self.wbuffer` True, this returns at once and
+		`flush()` sends the file. The file is closed when it's sent, or
+		when the socket is shut down.
+		"""
+		if count is None:
+			count = os.fstat(f.fileno()).st_size - offset
+		if count <= 0:
+			f.close()
+			return 0
+		
+		with self.__wlock:
+			self.__wq.append(sockfile(f, offset, count))
+			self.__wlen += count
+			self.__flush()
+		if not self.__wbuffer:
+			self.drain()
+		return count
+	
+	
+	#
+	# FLUSH
+	#
+	def flush(self):
+		"""
+		Send as much buffered data as the socket will take without 
+		waiting; Returns the number of bytes still buffered.
+		"""
+		try:
+			with self.__wlock:
+				return self.__flush()
+		except socket.error as ex:
+			raise SockError('err-send-fail', xdata(
+				reason='send-error', python=str(ex)
+			))
+	
+	
+	#
+	# DRAIN
+	#
+	def drain(self, timeout=None):
+		"""
+		Wait until all buffered data is sent. Raises SockError if the
+		peer doesn't accept it within `timeout` (default: the config's
+		`sendtimeout` value, DEF_SENDTIMEOUT).
+		"""
+		timeout = self.__sendtimeout if timeout is None else timeout
+		endtime = time.time() + timeout
+		while self.flush():
+			wait = endtime - time.time()
+			R,W,X = select.select([], [self.socket], [], max(0, wait))
+			if (not W) and (wait <= 0):
+				raise SockError('err-send-fail', xdata(
+						reason='send-timeout', pending=self.__wlen, 
+						timeout=timeout
+					))
+	
+	
+	#
+	# FINISH
+	#
+	def finish(self):
+		"""Shut down the sending side once all buffered data is sent."""
+		with self.__wlock:
+			self.__wclose = True
+			self.__flush()
+	
+	
+	def __flush(self):
+		#
+		# Send buffered chunks until done or the socket's full. Callers
+		# must hold the lock.
+		#
+		s = self.socket
+		while self.__wq:
+			v = self.__wq[0]
+			try:
+				n = v.send(s) if isinstance(v, sockfile) else s.send(v)
+			except (socket.timeout, BlockingIOError, InterruptedError):
+				break
+			self.__wlen -= n
+			self.bytesout += n
+			if isinstance(v, sockfile):
+				if v.count:
+					continue # until the socket's full
+			elif n < len(v):
+				self.__wq[0] = v[n:]
+				break
+			self.__wq.popleft()
+		
+		if self.__wclose and not self.__wq:
+			self.__wclose = False
+			try:
+				s.shutdown(socket.SHUT_WR)
+			except socket.error:
+				pass
+		
+		return self.__wlen
+	
+	
+	#
+	# SHUTDOWN
+	#
+	def shutdown(self):
+		"""Shutdown the socket; Unsent data is dropped."""
+		with self.__wlock:
+			for v in self.__wq:
+				if isinstance(v, sockfile):
+					v.close()
+			self.__wq.clear()
+			self.__wlen = 0
+		sockprop.shutdown(self)
+	
+	
 	#
 	# RECV
 	#
@@ -206,7 +385,9 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 				
 				# receive
 				if R:
-					return s.recv(buflen)
+					data = s.recv(buflen)
+					self.bytesin += len(data)
+					return data
 				if X:
 					raise SIOError(x)
 			
@@ -268,3 +449,64 @@ class sockwrap(sockconf, sockprop, EncodingHelper):
 					raise SockFatal(*ARGS)
 				else:
 					raise SockError(*ARGS)
+
+
+
+#
+# SOCK-FILE
+#
+class sockfile(object):
+	"""A file segment queued by `sockwrap.queuefile()`."""
+	
+	def __init__(self, f, offset, count):
+		self.file = f
+		self.offset = offset
+		self.count = count
+		self.__buf = None
+	
+	def __len__(self):
+		return self.count
+	
+	def send(self, s):
+		"""
+		Send what socket `s` will take without waiting, returning the
+		number of bytes sent. The file is closed once it's all sent.
+		"""
+		#
+		# The zero-copy os.sendfile() can't be used on SSL sockets (it
+		# would bypass encryption); read the file and send that instead.
+		#
+		if self.__buf is None:
+			self.__buf = b'' if (not hasattr(os, 'sendfile')) or isinstance(
+					s, trix.module('ssl').SSLSocket
+				) else False
+		
+		if self.__buf is False:
+			n = os.sendfile(s.fileno(), self.file.fileno(), self.offset, 
+					self.count
+				)
+		else:
+			if not self.__buf:
+				self.file.seek(self.offset)
+				self.__buf = memoryview(self.file.read(
+						min(self.count, DEF_FILECHUNK)
+					))
+			n = s.send(self.__buf) if self.__buf else 0
+			self.__buf = self.__buf[n:]
+		
+		if not n:
+			self.close()
+			raise SockError('err-send-fail', xdata(
+					reason='file-truncated', path=self.file.name, 
+					remaining=self.count
+				))
+		
+		self.offset += n
+		self.count -= n
+		if not self.count:
+			self.close()
+		return n
+	
+	def close(self):
+		"""Close the file."""
+		self.file.close()
@@ -0,0 +1,151 @@
+#
+# Copyright 2018 justworx
+# This file is part of the trix project, distributed under the terms
+# of the GNU Affero General Public License.
+#
+
+from .. import *
+import heapq, itertools
+
+
+#
+# TIMER
+#
+class timer(object):
+	"""A single scheduled callback, as returned by `Timers` methods."""
+	
+	__slots__ = ['when', 'seq', 'fn', 'a', 'interval']
+	
+	def __init__(self, when, seq, fn, a, interval=None):
+		self.when = when
+		self.seq = seq
+		self.fn = fn
+		self.a = a
+		self.interval = interval
+	
+	def __lt__(self, t):
+		return (self.when, self.seq) < (t.when, t.seq)
+	
+	@property
+	def active(self):
+		"""True until this timer is cancelled (or, if not periodic, run)."""
+		return self.fn is not None
+	
+	def cancel(self):
+		"""Cancel this timer. It's dropped when its time comes."""
+		self.fn = None
+		self.a = None
+
+
+
+
+#
+# TIMERS
+#
+class Timers(object):
+	"""
+	A heap of timed callbacks. Call `run()` regularly (eg, once each
+	pass through a Runner loop) to call those that are due. The cost
+	of each call is proportional to the number of timers that are due,
+	not the number scheduled.
+	"""
+	
+	def __init__(self):
+		self.__heap = []
+		self.__seq = itertools.count()
+		self.__lock = thread.allocate_lock()
+		self.__cancelled = 0
+	
+	def __len__(self):
+		return len(self.__heap)
+	
+	
+	#
+	# SCHEDULE
+	#
+	def at(self, when, fn, *a):
+		"""Call `fn(*a)` at time `when` (as given by `time.time()`)."""
+		return self.__push(timer(when, next(self.__seq), fn, a))
+	
+	def after(self, seconds, fn, *a):
+		"""Call `fn(*a)` once, after `seconds`."""
+		return self.at(time.time() + seconds, fn, *a)
+	
+	def every(self, interval, fn, *a):
+		"""Call `fn(*a)` every `interval` seconds until cancelled."""
+		return self.__push(timer(
+				time.time()+interval, next(self.__seq), fn, a, interval
+			))
+	
+	
+	#
+	# CANCEL
+	#
+	def cancel(self, t):
+		"""
+		Cancel timer `t`. Cancelled timers stay in the heap until they'd
+		have been due, so it's compacted when they make up most of it.
+		"""
+		t.cancel()
+		with self.__lock:
+			self.__cancelled += 1
+			if (self.__cancelled > 64) and (
+					self.__cancelled*2 > len(self.__heap)
+				):
+				self.__heap = [x for x in self.__heap if x.fn is not None]
+				heapq.heapify(self.__heap)
+				self.__cancelled = 0
+	
+	
+	#
+	# TIMEOUT
+	#
+	def timeout(self, maxwait=None):
+		"""
+		Return seconds until the next timer is due (zero if overdue),
+		limited to `maxwait`. If there are no timers, return `maxwait`.
+		"""
+		with self.__lock:
+			if not self.__heap:
+				return maxwait
+			t = max(0.0, self.__heap[0].when - time.time())
+		return t if maxwait is None else min(t, maxwait)
+	
+	
+	#
+	# RUN
+	#
+	def run(self):
+		"""Call each timer that's due; Return the number called."""
+		now = time.time()
+		due = []
+		with self.__lock:
+			heap = self.__heap
+			while heap and (heap[0].when <= now):
+				t = heapq.heappop(heap)
+				if t.fn is not None:
+					due.append(t)
+					if t.interval:
+						# periodic; next interval starts now
+						t.when = now + t.interval
+						t.seq = next(self.__seq)
+						heapq.heappush(heap, t)
+		
+		for t in due:
+			fn, a = t.fn, t.a
+			if fn is None:
+				continue # cancelled by an earlier callback
+			if not t.interval:
+				t.cancel()
+			try:
+				fn(*a)
+			except Exception as ex:
+				trix.log("err-timer-fail", fn, type(ex), ex.args, xdata())
+		
+		return len(due)
+	
+	
+	def __push(self, t):
+		with self.__lock:
+			heapq.heappush(self.__heap, t)
+		return t
@@ -144,6 +144,10 @@ class Bot(Client):
 				#
 				self.connect(connid, config)
 				
+				# plugin updates are driven by this runner's timers
+				conn = self[connid]
+				conn.pi_timer = self.every(conn.pi_interval, conn.pluginupdate)
+				
 				Client.open(self)
 		
 		except Exception as ex:
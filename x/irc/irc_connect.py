@@ -46,6 +46,7 @@ class IRCConnect(Connect):
 		# runtime values
 		self.pi_update = time.time()
 		self.pi_interval = config.get('pi_interval', PLUG_UPDT)
+		self.pi_timer = None # set when a Runner's timer calls update
 		
 		# plugin management - runtime add/remove
 		self.pm_add = []
@@ -195,8 +196,12 @@ class IRCConnect(Connect):
 		#
 		# PLUGINS	- - - - - - - - - - - - - - - - - - - - - - - - - - -
 		#  - every now-n-then, call the plugins' `update` method
+		#  - If a Runner timer has been set to call `pluginupdate()`, it
+		#    takes care of this.
 		#
-		if time.time() > (self.pi_update + self.pi_interval):
+		if (self.pi_timer is None) and (
+				time.time() > (self.pi_update + self.pi_interval)
+			):
 			self.__handle_plugin_update()
 		
 		#
@@ -213,6 +218,15 @@ class IRCConnect(Connect):
 	
 	
 	
+	#
+	# PLUGIN UPDATE
+	#
+	def pluginupdate(self):
+		"""Call each plugin's `update` method."""
+		self.__handle_plugin_update()
+	
+	
+	
 	#
 	# PING
 	#
@@ -230,6 +244,10 @@ class IRCConnect(Connect):
 		"""
 		Send a QUIT message and shutdown the connection.
 		"""
+		if self.pi_timer:
+			self.pi_timer.cancel()
+			self.pi_timer = None
+		
 		try:
 			self.writeline("QUIT %s" % msg)
 			